@@ -20,6 +20,9 @@ def create_app():
     csrf.init_app(app)
     login_manager.login_view = "auth.login"
 
+    from .audit_writer import audit_writer
+    audit_writer.init_app(app)
+
     from .auth import auth_bp
     from .equipamentos import equipamentos_bp
     from .dashboard import dashboard_bp
@@ -30,6 +33,7 @@ def create_app():
     from .notificacoes import notificacoes_bp
     from .backup import backup_bp
     from .manutencao import manutencao_bp
+    from .audit_routes import audit_bp
 
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix="/admin")
@@ -44,6 +48,7 @@ def create_app():
     app.register_blueprint(notificacoes_bp, url_prefix="/notificacoes")
     app.register_blueprint(backup_bp, url_prefix="/backup")
     app.register_blueprint(manutencao_bp)
+    app.register_blueprint(audit_bp)
 
     @app.after_request
     def apply_security_headers(response):
@@ -51,11 +56,32 @@ def create_app():
         return add_security_headers(response)
 
     with app.app_context():
+        from .database import configurar_sqlite
+        configurar_sqlite(app, db.engine)
+
         # Verificar se as tabelas já existem antes de criar
         # Isso evita overhead desnecessário em cada inicialização
         from sqlalchemy import inspect
         inspector = inspect(db.engine)
-        if not inspector.get_table_names():
+        table_names = inspector.get_table_names()
+        if not table_names:
+            db.create_all()
+        elif set(db.metadata.tables) - set(table_names):
+            # Banco existente sem as tabelas mais novas: criar apenas as que faltam
             db.create_all()
+            if 'kpi_contadores' not in table_names:
+                from .kpis import KpiService
+                KpiService.reconstruir_contadores()
+        if table_names:
+            # Colunas novas em tabelas antigas (ex.: backups.progresso)
+            from .migrate_db import adicionar_colunas
+            adicionar_colunas()
+
+            # Importações que um worker anterior deixou pela metade
+            from .importacao import ImportJobService
+            ImportJobService.marcar_abandonados()
+
+        from .search import SearchIndex
+        SearchIndex.garantir_indice(app)
 
     return app
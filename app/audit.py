@@ -7,10 +7,18 @@ Registra todas as operações críticas do sistema para compliance e rastreabili
 from flask import request, session
 from flask_login import current_user
 from . import db
+from .audit_archive import AuditArchive
+from .audit_writer import audit_writer
 from .models import AuditLog, Equipamento, Administrador
-from datetime import datetime, timezone
+from .constants import AUDIT_SUMMARY_MAX_CRITICAS, AUDIT_SUMMARY_TTL
+from sqlalchemy import case, func
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 import json
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -47,20 +55,17 @@ class AuditManager:
             old_json = json.dumps(old_values, default=str) if old_values else None
             new_json = json.dumps(new_values, default=str) if new_values else None
             
-            # Criar registro de auditoria
-            audit_log = AuditLog(
-                user_id=user_id,
-                action=action,
-                table_name=table_name,
-                record_id=record_id,
-                old_values=old_json,
-                new_values=new_json,
-                ip_address=ip_address,
-                user_agent=user_agent
-            )
-            
-            db.session.add(audit_log)
-            db.session.commit()
+            # Enfileirar para a gravação em lote (ver audit_writer)
+            audit_writer.registrar({
+                'user_id': user_id,
+                'action': action,
+                'table_name': table_name,
+                'record_id': record_id,
+                'old_values': old_json,
+                'new_values': new_json,
+                'ip_address': ip_address,
+                'user_agent': user_agent
+            })
             
             # Log crítico para ações sensíveis
             if action in ['DELETE', 'CLEAR_ALL', 'EXPORT', 'IMPORT']:
@@ -128,65 +133,169 @@ class AuditManager:
     @staticmethod
     def get_audit_summary(days=30):
         """Retorna resumo de auditoria dos últimos N dias"""
-        from datetime import timedelta
+        return AuditManager.get_audit_summaries((days,))[days]
+    
+    @staticmethod
+    def get_audit_summaries(janelas=(1, 7, 30)):
+        """
+        Resumos de auditoria de várias janelas (em dias) calculados juntos
+        
+        Uma única consulta agrupada por ação, tabela e usuário (com o nome
+        via JOIN em administrador) traz uma contagem por janela; ações
+        críticas e recentes vêm de duas consultas com LIMIT. Se a maior
+        janela alcança meses já arquivados, a mesma agregação é feita sobre
+        AuditArchive.consultar. O resultado fica em cache por
+        AUDIT_SUMMARY_TTL segundos.
         
-        start_date = datetime.now(timezone.utc) - timedelta(days=days)
+        Returns:
+            dict: {dias: resumo}, no formato de get_audit_summary
+        """
+        janelas = tuple(sorted(set(janelas)))
+        with _cache_lock:
+            em_cache = _cache_resumos.get(janelas)
+            if em_cache and time.monotonic() - em_cache[0] < AUDIT_SUMMARY_TTL:
+                return em_cache[1]
         
-        logs = AuditLog.query.filter(AuditLog.created_at >= start_date).all()
+        agora = datetime.now(timezone.utc)
+        inicios = {dias: agora - timedelta(days=dias) for dias in janelas}
+        inicio_maior = inicios[janelas[-1]]
         
-        summary = {
-            'total_actions': len(logs),
-            'actions_by_type': {},
-            'actions_by_user': {},
-            'actions_by_table': {},
-            'critical_actions': [],
-            'recent_actions': []
+        summaries = {
+            dias: {
+                'total_actions': 0,
+                'actions_by_type': {},
+                'actions_by_user': {},
+                'actions_by_table': {},
+                'critical_actions': [],
+                'total_critical_actions': 0,
+                'recent_actions': []
+            }
+            for dias in janelas
         }
         
-        for log in logs:
-            # Contar por tipo
-            summary['actions_by_type'][log.action] = summary['actions_by_type'].get(log.action, 0) + 1
-            
-            # Contar por usuário
-            user_name = 'Sistema' if not log.user_id else f"User_{log.user_id}"
-            if log.user_id:
-                user = Administrador.query.get(log.user_id)
-                if user:
-                    user_name = user.name_user
-            
-            summary['actions_by_user'][user_name] = summary['actions_by_user'].get(user_name, 0) + 1
+        if AuditArchive.tabela_cobre(inicio_maior):
+            nome_usuario = func.coalesce(Administrador.name_user, 'User_' + func.cast(AuditLog.user_id, db.String))
+            grupos = db.session.query(
+                AuditLog.action,
+                AuditLog.table_name,
+                AuditLog.user_id,
+                nome_usuario,
+                *(func.sum(case((AuditLog.created_at >= inicios[dias], 1), else_=0)) for dias in janelas)
+            ).outerjoin(
+                Administrador, Administrador.id == AuditLog.user_id
+            ).filter(
+                AuditLog.created_at >= inicio_maior
+            ).group_by(
+                AuditLog.action, AuditLog.table_name, AuditLog.user_id, nome_usuario
+            ).all()
             
-            # Contar por tabela
-            summary['actions_by_table'][log.table_name] = summary['actions_by_table'].get(log.table_name, 0) + 1
-            
-            # Ações críticas
-            if log.action in ['DELETE', 'CLEAR_ALL', 'EXPORT']:
-                summary['critical_actions'].append({
-                    'action': log.action,
-                    'table': log.table_name,
-                    'user': user_name,
-                    'timestamp': log.created_at.isoformat(),
-                    'ip': log.ip_address
-                })
+            # Ações críticas mais recentes (detalhadas) da maior janela
+            criticas = _logs_com_usuario().filter(
+                AuditLog.created_at >= inicio_maior, AuditLog.action.in_(ACOES_CRITICAS)
+            ).limit(AUDIT_SUMMARY_MAX_CRITICAS).all()
+        else:
+            # A maior janela alcança meses já arquivados: mesma agregação sobre AuditArchive
+            grupos, criticas = _agregar_arquivados(janelas, inicios, inicio_maior)
         
-        # Ações recentes (últimas 10)
-        recent = AuditLog.query.order_by(AuditLog.created_at.desc()).limit(10).all()
-        for log in recent:
-            user_name = 'Sistema' if not log.user_id else f"User_{log.user_id}"
-            if log.user_id:
-                user = Administrador.query.get(log.user_id)
-                if user:
-                    user_name = user.name_user
-            
-            summary['recent_actions'].append({
+        for action, table_name, user_id, nome, *contagens in grupos:
+            user_name = nome if user_id else 'Sistema'
+            for dias, total in zip(janelas, contagens):
+                total = int(total or 0)
+                if not total:
+                    continue
+                summary = summaries[dias]
+                summary['total_actions'] += total
+                summary['actions_by_type'][action] = summary['actions_by_type'].get(action, 0) + total
+                summary['actions_by_user'][user_name] = summary['actions_by_user'].get(user_name, 0) + total
+                summary['actions_by_table'][table_name] = summary['actions_by_table'].get(table_name, 0) + total
+                if action in ACOES_CRITICAS:
+                    summary['total_critical_actions'] += total
+        
+        # Ações críticas repartidas entre as janelas menores
+        for log, user_name in criticas:
+            criado_em = log.created_at.replace(tzinfo=timezone.utc) if log.created_at.tzinfo is None else log.created_at
+            for dias in janelas:
+                if criado_em >= inicios[dias]:
+                    summaries[dias]['critical_actions'].append({
+                        'action': log.action,
+                        'table': log.table_name,
+                        'user': user_name,
+                        'timestamp': log.created_at.isoformat(),
+                        'ip': log.ip_address
+                    })
+        
+        # Ações recentes (últimas 10), iguais para todas as janelas; sempre na tabela
+        recentes = [
+            {
                 'action': log.action,
                 'table': log.table_name,
                 'user': user_name,
                 'timestamp': log.created_at.isoformat(),
                 'record_id': log.record_id
-            })
+            }
+            for log, user_name in _logs_com_usuario().limit(10).all()
+        ]
+        for summary in summaries.values():
+            summary['recent_actions'] = recentes
         
-        return summary
+        with _cache_lock:
+            _cache_resumos[janelas] = (time.monotonic(), summaries)
+        return summaries
+
+
+ACOES_CRITICAS = ('DELETE', 'CLEAR_ALL', 'EXPORT')
+
+# Resumos recentes por conjunto de janelas: {janelas: (instante, resumos)}
+_cache_resumos = {}
+_cache_lock = threading.Lock()
+
+
+def _logs_com_usuario():
+    """AuditLog mais recentes primeiro, com o nome do usuário resolvido no JOIN"""
+    nome = case(
+        (AuditLog.user_id.is_(None), 'Sistema'),
+        else_=func.coalesce(Administrador.name_user, 'User_' + func.cast(AuditLog.user_id, db.String))
+    )
+    return db.session.query(AuditLog, nome).outerjoin(
+        Administrador, Administrador.id == AuditLog.user_id
+    ).order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+
+
+def _agregar_arquivados(janelas, inicios, inicio_maior):
+    """
+    Grupos e ações críticas no formato das consultas SQL de get_audit_summaries,
+    calculados numa passada por AuditArchive.consultar (arquivos + tabela)
+    """
+    contagens = {}
+    criticas = deque(maxlen=AUDIT_SUMMARY_MAX_CRITICAS)
+    for registro in AuditArchive.consultar(inicio_maior):
+        criado_em = registro['created_at']
+        if criado_em.tzinfo is None:
+            criado_em = criado_em.replace(tzinfo=timezone.utc)
+        chave = (registro['action'], registro['table_name'], registro['user_id'])
+        totais = contagens.setdefault(chave, [0] * len(janelas))
+        for posicao, dias in enumerate(janelas):
+            if criado_em >= inicios[dias]:
+                totais[posicao] += 1
+        if registro['action'] in ACOES_CRITICAS:
+            criticas.append(registro)
+    
+    ids = {user_id for _, _, user_id in contagens if user_id}
+    nomes = dict(
+        db.session.query(Administrador.id, Administrador.name_user).filter(Administrador.id.in_(ids)).all()
+    ) if ids else {}
+    
+    def nome_de(user_id):
+        if not user_id:
+            return 'Sistema'
+        return nomes.get(user_id) or f'User_{user_id}'
+    
+    grupos = [
+        (action, table_name, user_id, nome_de(user_id), *totais)
+        for (action, table_name, user_id), totais in contagens.items()
+    ]
+    criticas = [(SimpleNamespace(**registro), nome_de(registro['user_id'])) for registro in reversed(criticas)]
+    return grupos, criticas
 
 # Decorador para auditoria automática
 def audit_action(action, table_name):
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento particionado do log de auditoria
+
+A tabela ``audit_logs`` guarda só os meses recentes (partição "quente").
+Meses fechados mais antigos que AUDIT_RETENTION_MONTHS são movidos pelo
+job de retenção do ``SystemScheduler`` para arquivos mensais JSON lines
+comprimidos com gzip em ``instance/audit_archive`` (``audit-AAAA-MM.jsonl.gz``),
+e as linhas saem da tabela.
+
+``consultar`` roteia uma consulta por período: só abre os arquivos dos
+meses que tocam o intervalo e só consulta a tabela para o que ainda está
+nela, devolvendo tudo em ordem cronológica como dicts. Leitores de
+janelas recentes (relatório de auditoria, resumos do AuditManager) usam
+``tabela_cobre`` / ``recentes``: enquanto a janela está inteira na tabela
+a consulta continua sendo SQL direto; se alcança meses arquivados, passa
+por ``consultar``.
+
+Uso pela linha de comando:
+    python -m app.audit_archive arquivar [--meses 12]
+    python -m app.audit_archive listar
+"""
+
+from collections import deque
+from datetime import datetime, timezone
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import uuid
+
+from flask import current_app
+
+from . import db
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'audit_archive'
+# Abaixo disso as janelas de 30 dias dos resumos deixariam de estar na tabela
+MIN_RETENCAO_MESES = 2
+
+_NOME_ARQUIVO = re.compile(r'^audit-(\d{4})-(\d{2})\.jsonl\.gz$')
+_COLUNAS = [coluna.name for coluna in AuditLog.__table__.columns]
+
+
+def _inicio_mes(ano, mes):
+    return datetime(ano, mes, 1)
+
+
+def _mes_seguinte(inicio):
+    return _inicio_mes(inicio.year + inicio.month // 12, inicio.month % 12 + 1)
+
+
+def _meses_entre(inicio, fim):
+    """Inícios de mês de todos os meses que tocam [inicio, fim)"""
+    atual = _inicio_mes(inicio.year, inicio.month)
+    while atual < fim:
+        yield atual
+        atual = _mes_seguinte(atual)
+
+
+def _sem_fuso(valor):
+    # created_at é gravado em UTC sem fuso (SQLite)
+    return valor.replace(tzinfo=None) if valor is not None and valor.tzinfo else valor
+
+
+def _serializar(linha):
+    registro = dict(zip(_COLUNAS, linha))
+    registro['created_at'] = registro['created_at'].isoformat() if registro['created_at'] else None
+    return registro
+
+
+def _desserializar(registro):
+    if registro.get('created_at'):
+        registro['created_at'] = datetime.fromisoformat(registro['created_at'])
+    return registro
+
+
+class AuditArchive:
+    """Partições mensais arquivadas do log de auditoria"""
+
+    @staticmethod
+    def diretorio():
+        caminho = Path(current_app.instance_path) / ARCHIVE_DIR
+        caminho.mkdir(parents=True, exist_ok=True)
+        return caminho
+
+    @staticmethod
+    def caminho_mes(inicio):
+        return AuditArchive.diretorio() / f'audit-{inicio.year:04d}-{inicio.month:02d}.jsonl.gz'
+
+    @staticmethod
+    def meses_arquivados():
+        """Inícios de mês que já têm arquivo, em ordem"""
+        meses = []
+        for caminho in AuditArchive.diretorio().iterdir():
+            encontrado = _NOME_ARQUIVO.match(caminho.name)
+            if encontrado:
+                meses.append(_inicio_mes(int(encontrado.group(1)), int(encontrado.group(2))))
+        return sorted(meses)
+
+    @staticmethod
+    def ler_mes(inicio):
+        """Itera os registros (dicts) de um mês arquivado"""
+        caminho = AuditArchive.caminho_mes(inicio)
+        if not caminho.exists():
+            return
+        with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                if linha.strip():
+                    yield _desserializar(json.loads(linha))
+
+    @staticmethod
+    def arquivar_mes(inicio):
+        """
+        Move as linhas de um mês da tabela para o arquivo do mês
+
+        Linhas que já estejam no arquivo (ex.: tabela restaurada de um
+        backup) não são duplicadas. O arquivo novo é gravado ao lado e
+        trocado de forma atômica antes de as linhas serem apagadas.
+
+        Returns:
+            int: Linhas movidas da tabela
+        """
+        fim = _mes_seguinte(inicio)
+        tabela = AuditLog.__table__
+        periodo = (tabela.c.created_at >= inicio) & (tabela.c.created_at < fim)
+
+        destino = AuditArchive.caminho_mes(inicio)
+        temporario = destino.with_name(f'{destino.name}.{uuid.uuid4().hex}.tmp')
+        movidas = 0
+        try:
+            with gzip.open(temporario, 'wt', encoding='utf-8') as arquivo:
+                ids = set()
+                for registro in AuditArchive.ler_mes(inicio):
+                    ids.add(registro['id'])
+                    registro['created_at'] = registro['created_at'].isoformat() if registro['created_at'] else None
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+                linhas = db.session.execute(
+                    tabela.select().where(periodo).order_by(tabela.c.created_at, tabela.c.id)
+                    .execution_options(stream_results=True, yield_per=1000)
+                )
+                for linha in linhas:
+                    movidas += 1
+                    if linha.id not in ids:
+                        arquivo.write(json.dumps(_serializar(linha), ensure_ascii=False) + '\n')
+            if not movidas:
+                temporario.unlink()
+                return 0
+            with open(temporario, 'rb') as arquivo:
+                os.fsync(arquivo.fileno())
+            os.replace(temporario, destino)
+        finally:
+            temporario.unlink(missing_ok=True)
+
+        db.session.execute(tabela.delete().where(periodo))
+        db.session.commit()
+        logger.info(f"Auditoria de {inicio:%Y-%m} arquivada: {movidas} registros")
+        return movidas
+
+    @staticmethod
+    def arquivar_antigos(meses=None, agora=None):
+        """
+        Job de retenção: arquiva todos os meses fechados além da janela de retenção
+
+        Args:
+            meses (int): Meses mantidos na tabela (padrão AUDIT_RETENTION_MONTHS)
+            agora (datetime): Referência (UTC, para testes)
+
+        Returns:
+            dict: {"AAAA-MM": linhas movidas}
+        """
+        meses = max(MIN_RETENCAO_MESES, meses or current_app.config.get('AUDIT_RETENTION_MONTHS', 12))
+        agora = _sem_fuso(agora or datetime.now(timezone.utc))
+        corte = _inicio_mes(agora.year, agora.month)
+        for _ in range(meses):
+            corte = _inicio_mes(corte.year - (corte.month == 1), (corte.month - 2) % 12 + 1)
+
+        mais_antigo = db.session.query(db.func.min(AuditLog.created_at)).filter(
+            AuditLog.created_at < corte
+        ).scalar()
+        if mais_antigo is None:
+            return {}
+
+        resultado = {}
+        for inicio in _meses_entre(mais_antigo, corte):
+            movidas = AuditArchive.arquivar_mes(inicio)
+            if movidas:
+                resultado[f'{inicio:%Y-%m}'] = movidas
+        return resultado
+
+    @staticmethod
+    def tabela_cobre(inicio):
+        """True se nenhum mês arquivado toca o período a partir de inicio (a tabela basta)"""
+        meses = AuditArchive.meses_arquivados()
+        return not meses or (inicio is not None and _mes_seguinte(meses[-1]) <= _sem_fuso(inicio))
+
+    @staticmethod
+    def recentes(inicio, limite, fim=None):
+        """
+        Registros mais recentes de [inicio, fim), do mais novo para o mais antigo
+
+        Returns:
+            list: Até ``limite`` dicts com as colunas de audit_logs
+        """
+        inicio, fim = _sem_fuso(inicio), _sem_fuso(fim)
+        if AuditArchive.tabela_cobre(inicio):
+            consulta = db.session.query(*AuditLog.__table__.columns).filter(AuditLog.created_at >= inicio)
+            if fim is not None:
+                consulta = consulta.filter(AuditLog.created_at < fim)
+            consulta = consulta.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limite)
+            return [dict(zip(_COLUNAS, linha)) for linha in consulta]
+
+        # Fluxo cronológico das partições: guarda só os ``limite`` últimos
+        return list(reversed(deque(AuditArchive.consultar(inicio, fim), maxlen=limite)))
+
+    @staticmethod
+    def consultar(inicio=None, fim=None, acao=None, tabela=None, usuario_id=None):
+        """
+        Registros de auditoria de um período, vindos das partições certas
+
+        Args:
+            inicio (datetime): Início inclusivo (None = desde o primeiro registro)
+            fim (datetime): Fim exclusivo (None = até agora)
+            acao, tabela, usuario_id: Filtros opcionais
+
+        Returns:
+            generator: Dicts com as colunas de audit_logs, em ordem cronológica
+        """
+        inicio, fim = _sem_fuso(inicio), _sem_fuso(fim)
+
+        def aceita(registro):
+            criado = registro['created_at']
+            return ((inicio is None or criado >= inicio) and (fim is None or criado < fim)
+                    and (acao is None or registro['action'] == acao)
+                    and (tabela is None or registro['table_name'] == tabela)
+                    and (usuario_id is None or registro['user_id'] == usuario_id))
+
+        vistos = set()
+        for mes in AuditArchive.meses_arquivados():
+            if (inicio is not None and _mes_seguinte(mes) <= inicio) or (fim is not None and mes >= fim):
+                continue
+            for registro in AuditArchive.ler_mes(mes):
+                if aceita(registro):
+                    vistos.add(registro['id'])
+                    yield registro
+
+        consulta = db.session.query(*AuditLog.__table__.columns)
+        if inicio is not None:
+            consulta = consulta.filter(AuditLog.created_at >= inicio)
+        if fim is not None:
+            consulta = consulta.filter(AuditLog.created_at < fim)
+        if acao is not None:
+            consulta = consulta.filter(AuditLog.action == acao)
+        if tabela is not None:
+            consulta = consulta.filter(AuditLog.table_name == tabela)
+        if usuario_id is not None:
+            consulta = consulta.filter(AuditLog.user_id == usuario_id)
+        consulta = consulta.order_by(AuditLog.created_at, AuditLog.id).execution_options(
+            stream_results=True, yield_per=1000
+        )
+        for linha in consulta:
+            if linha.id not in vistos:
+                yield dict(zip(_COLUNAS, linha))
+
+
+def main(argv=None):
+    import argparse
+    from . import create_app
+
+    parser = argparse.ArgumentParser(prog='python -m app.audit_archive')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    arquivar = sub.add_parser('arquivar', help='Arquiva os meses além da retenção')
+    arquivar.add_argument('--meses', type=int)
+    sub.add_parser('listar', help='Lista os meses arquivados')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.comando == 'arquivar':
+            resultado = AuditArchive.arquivar_antigos(args.meses)
+            for mes, movidas in resultado.items():
+                print(f"{mes}: {movidas} registros arquivados")
+            if not resultado:
+                print("Nada a arquivar")
+        else:
+            for mes in AuditArchive.meses_arquivados():
+                caminho = AuditArchive.caminho_mes(mes)
+                print(f"{mes:%Y-%m}  {caminho.stat().st_size:>12} bytes  {caminho}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
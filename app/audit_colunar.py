@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Arquivo colunar da auditoria para análises históricas
+
+Cada mês fechado é exportado uma vez para ``instance/audit_colunar/AAAA-MM``
+como colunas NumPy:
+
+- ``ts.npy``: int64, microssegundos desde a época (UTC)
+- ``acao.npy`` / ``tabela.npy``: códigos int16 de dicionário
+- ``usuario.npy``: int64 com o id do usuário (-1 = sistema)
+- ``dicionario.json``: ações, tabelas e nomes dos usuários na data da exportação
+
+As colunas ficam em ``.npy`` sem compressão porque só assim o ``np.load``
+consegue mapeá-las em memória (membros de ``.npz`` são sempre lidos
+inteiros); com a codificação por dicionário o mês continua compacto.
+``AuditAnalytics`` responde contagens por ação, usuário, tabela ou dia
+lendo só esses arquivos, sem consultar o SQLite nem as colunas JSON.
+
+Uso pela linha de comando:
+    python -m app.audit_colunar exportar
+    python -m app.audit_colunar contar --por action [--inicio 2025-01-01] [--fim 2026-01-01]
+"""
+
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+from pathlib import Path
+import shutil
+import uuid
+
+from flask import current_app
+import numpy as np
+
+from . import db
+from .audit_archive import AuditArchive, _inicio_mes, _mes_seguinte, _meses_entre, _sem_fuso
+from .models import Administrador, AuditLog
+
+logger = logging.getLogger(__name__)
+
+COLUNAR_DIR = 'audit_colunar'
+DIMENSOES = ('action', 'user', 'table', 'day')
+
+_EPOCA = datetime(1970, 1, 1)
+_MICROS_DIA = 86_400 * 1_000_000
+_SEM_USUARIO = -1
+
+
+def _micros(valor):
+    delta = _sem_fuso(valor) - _EPOCA
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _codificar(valores):
+    """Codificação por dicionário: (rótulos, códigos int16)"""
+    rotulos, codigos = np.unique(np.array(valores, dtype=object).astype(str), return_inverse=True)
+    return [str(rotulo) for rotulo in rotulos], codigos.astype(np.int16)
+
+
+class AuditColunar:
+    """Exportação dos meses fechados para o formato colunar"""
+
+    @staticmethod
+    def diretorio():
+        caminho = Path(current_app.instance_path) / COLUNAR_DIR
+        caminho.mkdir(parents=True, exist_ok=True)
+        return caminho
+
+    @staticmethod
+    def diretorio_mes(inicio):
+        return AuditColunar.diretorio() / f'{inicio.year:04d}-{inicio.month:02d}'
+
+    @staticmethod
+    def meses_exportados():
+        meses = []
+        for caminho in AuditColunar.diretorio().iterdir():
+            if (caminho / 'dicionario.json').exists():
+                ano, _, mes = caminho.name.partition('-')
+                if ano.isdigit() and mes.isdigit():
+                    meses.append(_inicio_mes(int(ano), int(mes)))
+        return sorted(meses)
+
+    @staticmethod
+    def exportar_mes(inicio):
+        """
+        Grava as colunas de um mês (tabela + arquivo gzip) e troca o diretório de forma atômica
+
+        Returns:
+            int: Registros exportados
+        """
+        ts, acoes, tabelas, usuarios = [], [], [], []
+        for registro in AuditArchive.consultar(inicio, _mes_seguinte(inicio)):
+            ts.append(_micros(registro['created_at']))
+            acoes.append(registro['action'])
+            tabelas.append(registro['table_name'])
+            usuarios.append(registro['user_id'] if registro['user_id'] is not None else _SEM_USUARIO)
+
+        rotulos_acao, codigos_acao = _codificar(acoes)
+        rotulos_tabela, codigos_tabela = _codificar(tabelas)
+        usuarios = np.array(usuarios, dtype=np.int64)
+        ids = [int(id_) for id_ in np.unique(usuarios) if id_ != _SEM_USUARIO]
+        nomes = dict(
+            db.session.query(Administrador.id, Administrador.name_user).filter(Administrador.id.in_(ids))
+        ) if ids else {}
+
+        destino = AuditColunar.diretorio_mes(inicio)
+        temporario = destino.with_name(f'{destino.name}.{uuid.uuid4().hex}.tmp')
+        temporario.mkdir()
+        try:
+            np.save(temporario / 'ts.npy', np.array(ts, dtype=np.int64))
+            np.save(temporario / 'acao.npy', codigos_acao)
+            np.save(temporario / 'tabela.npy', codigos_tabela)
+            np.save(temporario / 'usuario.npy', usuarios)
+            (temporario / 'dicionario.json').write_text(json.dumps({
+                'acoes': rotulos_acao,
+                'tabelas': rotulos_tabela,
+                'usuarios': {str(id_): nome for id_, nome in nomes.items()},
+                'registros': len(ts),
+                'exportado_em': datetime.now(timezone.utc).isoformat(),
+            }, ensure_ascii=False), encoding='utf-8')
+            if destino.exists():
+                shutil.rmtree(destino)
+            temporario.rename(destino)
+        finally:
+            shutil.rmtree(temporario, ignore_errors=True)
+
+        logger.info(f"Auditoria de {inicio:%Y-%m} exportada para o formato colunar: {len(ts)} registros")
+        return len(ts)
+
+    @staticmethod
+    def exportar_fechados(agora=None, forcar=False):
+        """
+        Exporta os meses fechados que ainda não têm arquivo colunar
+
+        Args:
+            agora (datetime): Referência (UTC); o mês corrente nunca é exportado
+            forcar (bool): Reexporta também os meses já exportados
+
+        Returns:
+            dict: {"AAAA-MM": registros}
+        """
+        agora = _sem_fuso(agora or datetime.now(timezone.utc))
+        mes_corrente = _inicio_mes(agora.year, agora.month)
+
+        primeiro = db.session.query(db.func.min(AuditLog.created_at)).scalar()
+        arquivados = AuditArchive.meses_arquivados()
+        candidatos = [m for m in (primeiro, arquivados[0] if arquivados else None) if m is not None]
+        if not candidatos:
+            return {}
+
+        exportados = set() if forcar else set(AuditColunar.meses_exportados())
+        resultado = {}
+        for inicio in _meses_entre(min(candidatos), mes_corrente):
+            if inicio not in exportados:
+                resultado[f'{inicio:%Y-%m}'] = AuditColunar.exportar_mes(inicio)
+        return resultado
+
+
+class _Mes:
+    """Colunas de um mês mapeadas em memória"""
+
+    def __init__(self, diretorio):
+        self.dicionario = json.loads((diretorio / 'dicionario.json').read_text(encoding='utf-8'))
+        self.ts = np.load(diretorio / 'ts.npy', mmap_mode='r')
+        self.acao = np.load(diretorio / 'acao.npy', mmap_mode='r')
+        self.tabela = np.load(diretorio / 'tabela.npy', mmap_mode='r')
+        self.usuario = np.load(diretorio / 'usuario.npy', mmap_mode='r')
+
+
+class AuditAnalytics:
+    """Contagens históricas da auditoria a partir do arquivo colunar"""
+
+    @staticmethod
+    def contar(por='action', inicio=None, fim=None, acao=None, usuario_id=None):
+        """
+        Conta registros agrupados por uma dimensão
+
+        Args:
+            por (str): action, user, table ou day
+            inicio (datetime): Início inclusivo (None = sem limite)
+            fim (datetime): Fim exclusivo (None = sem limite)
+            acao (str): Filtra por ação
+            usuario_id (int): Filtra por usuário
+
+        Returns:
+            dict: {"por", "meses", "total", "contagens": {rótulo: quantidade}}
+        """
+        if por not in DIMENSOES:
+            raise ValueError(f"Dimensão inválida: {por}")
+
+        inicio, fim = _sem_fuso(inicio), _sem_fuso(fim)
+        contagens = {}
+        meses = []
+        for mes in AuditColunar.meses_exportados():
+            if (inicio is not None and _mes_seguinte(mes) <= inicio) or (fim is not None and mes >= fim):
+                continue
+            dados = _Mes(AuditColunar.diretorio_mes(mes))
+            meses.append(f'{mes:%Y-%m}')
+
+            filtro = np.ones(len(dados.ts), dtype=bool)
+            if inicio is not None:
+                filtro &= dados.ts >= _micros(inicio)
+            if fim is not None:
+                filtro &= dados.ts < _micros(fim)
+            if acao is not None:
+                acoes = dados.dicionario['acoes']
+                if acao not in acoes:
+                    continue
+                filtro &= dados.acao == acoes.index(acao)
+            if usuario_id is not None:
+                filtro &= dados.usuario == usuario_id
+
+            if por == 'day':
+                dias, totais = np.unique(dados.ts[filtro] // _MICROS_DIA, return_counts=True)
+                rotulos = [(_EPOCA + timedelta(days=int(dia))).date().isoformat() for dia in dias]
+            elif por == 'user':
+                ids, totais = np.unique(dados.usuario[filtro], return_counts=True)
+                nomes = dados.dicionario['usuarios']
+                rotulos = ['Sistema' if i == _SEM_USUARIO else nomes.get(str(i), f'User_{i}') for i in ids]
+            else:
+                coluna, dicionario = ((dados.acao, dados.dicionario['acoes']) if por == 'action'
+                                      else (dados.tabela, dados.dicionario['tabelas']))
+                totais = np.bincount(coluna[filtro], minlength=len(dicionario))
+                rotulos = dicionario
+
+            for rotulo, total in zip(rotulos, totais.tolist()):
+                if total:
+                    contagens[rotulo] = contagens.get(rotulo, 0) + total
+
+        return {
+            'por': por,
+            'meses': meses,
+            'total': sum(contagens.values()),
+            'contagens': dict(sorted(contagens.items())),
+        }
+
+
+def main(argv=None):
+    import argparse
+    from . import create_app
+
+    parser = argparse.ArgumentParser(prog='python -m app.audit_colunar')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    exportar = sub.add_parser('exportar', help='Exporta os meses fechados ainda não exportados')
+    exportar.add_argument('--forcar', action='store_true')
+    contar = sub.add_parser('contar', help='Contagens a partir do arquivo colunar')
+    contar.add_argument('--por', choices=DIMENSOES, default='action')
+    contar.add_argument('--inicio', type=datetime.fromisoformat)
+    contar.add_argument('--fim', type=datetime.fromisoformat)
+    contar.add_argument('--acao')
+    contar.add_argument('--usuario', type=int)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.comando == 'exportar':
+            resultado = AuditColunar.exportar_fechados(forcar=args.forcar)
+            for mes, registros in resultado.items():
+                print(f"{mes}: {registros} registros")
+            if not resultado:
+                print("Nada a exportar")
+        else:
+            resultado = AuditAnalytics.contar(args.por, args.inicio, args.fim, args.acao, args.usuario)
+            for rotulo, total in resultado['contagens'].items():
+                print(f"{rotulo:<30}{total:>10}")
+            print(f"{'TOTAL':<30}{resultado['total']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
-from .advanced_reports import ReportGenerator
 from .audit import AuditManager
+from .audit_colunar import DIMENSOES, AuditAnalytics
+from .models import AuditLog
+from .pagination import paginate
+from . import db
 from datetime import datetime, timedelta
 import json
 
+# Gerador de relatórios avançados é opcional (módulo não distribuído)
+try:
+    from .advanced_reports import ReportGenerator
+except ImportError:
+    ReportGenerator = None
+
 audit_bp = Blueprint('audit', __name__, url_prefix='/audit')
 
 @audit_bp.route('/')
@@ -16,10 +25,8 @@ def index():
         flash("Acesso negado. Apenas administradores podem acessar relatórios de auditoria.", "error")
         return redirect(url_for('dashboard.index'))
     
-    # Resumo rápido dos últimos 7 dias
-    summary = AuditManager.get_audit_summary(days=7)
-    
-    return render_template('audit/index.html', summary=summary)
+    # O resumo dos últimos 7 dias é exibido no dashboard
+    return redirect(url_for('audit.dashboard'))
 
 @audit_bp.route('/reports/audit')
 @login_required
@@ -27,6 +34,8 @@ def audit_report():
     """Relatório detalhado de auditoria"""
     if current_user.role != 'ADMIN':
         return jsonify({'error': 'Acesso negado'}), 403
+    if ReportGenerator is None:
+        return jsonify({'error': 'Relatórios avançados indisponíveis'}), 501
     
     # Parâmetros de filtro
     days = request.args.get('days', 30, type=int)
@@ -52,6 +61,8 @@ def compliance_report():
     """Relatório de compliance"""
     if current_user.role != 'ADMIN':
         return jsonify({'error': 'Acesso negado'}), 403
+    if ReportGenerator is None:
+        return jsonify({'error': 'Relatórios avançados indisponíveis'}), 501
     
     report = ReportGenerator.generate_compliance_report()
     return jsonify(report)
@@ -62,6 +73,8 @@ def lifecycle_report():
     """Relatório de ciclo de vida dos equipamentos"""
     if current_user.role != 'ADMIN':
         return jsonify({'error': 'Acesso negado'}), 403
+    if ReportGenerator is None:
+        return jsonify({'error': 'Relatórios avançados indisponíveis'}), 501
     
     report = ReportGenerator.generate_equipment_lifecycle_report()
     return jsonify(report)
@@ -75,14 +88,15 @@ def dashboard():
         return redirect(url_for('dashboard.index'))
     
     # Métricas para o dashboard
+    resumos = AuditManager.get_audit_summaries((1, 7, 30))
     metrics = {
-        'last_24h': AuditManager.get_audit_summary(days=1),
-        'last_7d': AuditManager.get_audit_summary(days=7),
-        'last_30d': AuditManager.get_audit_summary(days=30)
+        'last_24h': resumos[1],
+        'last_7d': resumos[7],
+        'last_30d': resumos[30]
     }
     
     # Compliance score
-    compliance = ReportGenerator.generate_compliance_report()
+    compliance = ReportGenerator.generate_compliance_report() if ReportGenerator else None
     
     return render_template('audit/dashboard.html', 
                          metrics=metrics, 
@@ -94,6 +108,8 @@ def export_report(report_type):
     """Exporta relatórios em diferentes formatos"""
     if current_user.role != 'ADMIN':
         return jsonify({'error': 'Acesso negado'}), 403
+    if ReportGenerator is None:
+        return jsonify({'error': 'Relatórios avançados indisponíveis'}), 501
     
     # Registrar auditoria da exportação
     AuditManager.log_action('EXPORT', 'audit_reports', details={
@@ -119,4 +135,91 @@ def export_report(report_type):
         return response
     
     # Adicionar outros formatos conforme necessário
-    return jsonify({'error': 'Formato não suportado'}), 400
\ No newline at end of file
+    return jsonify({'error': 'Formato não suportado'}), 400
+
+@audit_bp.route('/api/analytics')
+@login_required
+def analytics():
+    """Contagens históricas (meses fechados) a partir do arquivo colunar"""
+    if current_user.role != 'ADMIN':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    por = request.args.get('por', 'action')
+    if por not in DIMENSOES:
+        return jsonify({'error': 'Dimensão inválida'}), 400
+    try:
+        inicio = request.args.get('inicio')
+        fim = request.args.get('fim')
+        inicio = datetime.fromisoformat(inicio) if inicio else None
+        fim = datetime.fromisoformat(fim) if fim else None
+    except ValueError:
+        return jsonify({'error': 'Data inválida'}), 400
+    
+    return jsonify(AuditAnalytics.contar(
+        por=por,
+        inicio=inicio,
+        fim=fim,
+        acao=request.args.get('action'),
+        usuario_id=request.args.get('user_id', type=int)
+    ))
+
+# Colunas devolvidas pelo navegador de logs (sem old_values/new_values)
+COLUNAS_LOGS = ('id', 'created_at', 'user_id', 'action', 'table_name', 'record_id', 'ip_address')
+
+@audit_bp.route('/api/logs')
+@login_required
+def api_logs():
+    """
+    Navegação pelos logs de auditoria com paginação por cursor em (created_at, id)
+    
+    Filtros: user_id, action, table_name, record_id, inicio, fim (ISO).
+    Use ``after``/``before`` com os cursores devolvidos para avançar ou voltar.
+    """
+    if current_user.role != 'ADMIN':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    try:
+        inicio = request.args.get('inicio')
+        fim = request.args.get('fim')
+        inicio = datetime.fromisoformat(inicio) if inicio else None
+        fim = datetime.fromisoformat(fim) if fim else None
+    except ValueError:
+        return jsonify({'error': 'Data inválida'}), 400
+    
+    query = db.session.query(*(getattr(AuditLog, coluna) for coluna in COLUNAS_LOGS))
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    if request.args.get('action'):
+        query = query.filter(AuditLog.action == request.args['action'])
+    if request.args.get('table_name'):
+        query = query.filter(AuditLog.table_name == request.args['table_name'])
+    record_id = request.args.get('record_id', type=int)
+    if record_id is not None:
+        query = query.filter(AuditLog.record_id == record_id)
+    if inicio:
+        query = query.filter(AuditLog.created_at >= inicio)
+    if fim:
+        query = query.filter(AuditLog.created_at < fim)
+    
+    page = paginate(
+        query,
+        (AuditLog.created_at, AuditLog.id),
+        per_page=request.args.get('per_page', 50),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        descending=True,
+        with_total=False
+    )
+    
+    return jsonify({
+        'colunas': COLUNAS_LOGS,
+        'logs': [
+            [log.created_at.isoformat() if coluna == 'created_at' else getattr(log, coluna) for coluna in COLUNAS_LOGS]
+            for log in page.items
+        ],
+        'has_next': page.has_next,
+        'has_prev': page.has_prev,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
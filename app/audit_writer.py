@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Gravação assíncrona do log de auditoria
+
+A requisição apenas enfileira o evento (dict pronto para ``audit_logs``) em
+uma fila limitada em memória; uma thread de fundo esvazia a fila em lotes e
+grava cada lote com um único INSERT executemany, em conexão própria. Assim
+a auditoria não acrescenta um commit síncrono à requisição nem confirma
+estado pendente da sessão de quem chamou.
+
+Se a fila encher (banco indisponível por muito tempo), novos eventos são
+descartados e contados; ``metricas()`` expõe descartes, fila pendente e
+falhas de gravação. Na saída do processo (atexit) a fila é esvaziada.
+
+Com AUDIT_ASYNC=false os eventos são gravados na hora, pelo mesmo caminho.
+"""
+
+import atexit
+from datetime import datetime, timezone
+import logging
+import queue
+import threading
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .constants import AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL, AUDIT_QUEUE_MAX
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+_PARAR = object()
+
+
+class AuditWriter:
+    """Fila de eventos de auditoria e thread que os grava em lotes (um por processo)"""
+
+    def __init__(self, capacidade=AUDIT_QUEUE_MAX, tamanho_lote=AUDIT_BATCH_SIZE,
+                 intervalo=AUDIT_FLUSH_INTERVAL):
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._lock = threading.Lock()
+        self._ocioso = threading.Condition(self._lock)
+        self._app = None
+        self._thread = None
+        self._em_andamento = 0
+        self._descartados = 0
+        self._gravados = 0
+        self._falhas = 0
+        self._lotes = 0
+        self._ultimo_lote_em = None
+
+    def init_app(self, app):
+        """Associa o writer à aplicação (engine usado pela thread) e registra o flush na saída"""
+        if self._app is None:
+            atexit.register(self.parar)
+        elif self._app is not app:
+            self.flush()
+        self._app = app
+
+    def registrar(self, evento):
+        """
+        Enfileira um evento sem bloquear a requisição
+
+        Args:
+            evento (dict): Colunas de AuditLog; ``created_at`` é preenchido se ausente
+
+        Returns:
+            bool: False se o evento foi descartado por fila cheia
+        """
+        evento.setdefault('created_at', datetime.now(timezone.utc))
+
+        if self._app is None or not self._app.config.get('AUDIT_ASYNC', True):
+            self._gravar([evento])
+            return True
+
+        self._garantir_thread()
+        with self._lock:
+            self._em_andamento += 1
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            with self._lock:
+                self._em_andamento -= 1
+                self._descartados += 1
+                descartados = self._descartados
+            if descartados == 1 or descartados % 1000 == 0:
+                logger.warning(f"Fila de auditoria cheia: {descartados} eventos descartados até agora")
+            return False
+        return True
+
+    def flush(self, timeout=10):
+        """
+        Aguarda a gravação de tudo que já foi enfileirado
+
+        Returns:
+            bool: True se a fila foi esvaziada dentro do timeout
+        """
+        with self._ocioso:
+            return self._ocioso.wait_for(lambda: self._em_andamento == 0, timeout)
+
+    def parar(self, timeout=10):
+        """Esvazia a fila e encerra a thread (hook de desligamento)"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._fila.put(_PARAR)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Thread de auditoria não terminou; {self._fila.qsize()} eventos pendentes")
+        self._thread = None
+
+    def metricas(self):
+        """Estado da fila para monitoramento"""
+        with self._lock:
+            return {
+                'pendentes': self._em_andamento,
+                'capacidade': self._fila.maxsize,
+                'descartados': self._descartados,
+                'gravados': self._gravados,
+                'falhas': self._falhas,
+                'lotes': self._lotes,
+                'ultimo_lote_em': self._ultimo_lote_em.isoformat() if self._ultimo_lote_em else None,
+                'thread_ativa': bool(self._thread and self._thread.is_alive()),
+            }
+
+    def _garantir_thread(self):
+        # Iniciada sob demanda: cada worker do gunicorn cria a sua após o fork
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _executar(self):
+        parar = False
+        while not parar:
+            try:
+                primeiro = self._fila.get(timeout=self.intervalo)
+            except queue.Empty:
+                continue
+
+            lote = []
+            item = primeiro
+            while True:
+                if item is _PARAR:
+                    parar = True
+                else:
+                    lote.append(item)
+                if len(lote) >= self.tamanho_lote:
+                    break
+                try:
+                    item = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+
+            if lote:
+                self._gravar(lote)
+                with self._ocioso:
+                    self._em_andamento -= len(lote)
+                    self._ocioso.notify_all()
+
+    def _gravar(self, lote):
+        """Grava um lote com executemany em conexão própria, fora da sessão da requisição"""
+        app = self._app
+        try:
+            if app is None:
+                engine = db.engine
+            else:
+                with app.app_context():
+                    engine = db.engine
+            with engine.begin() as conexao:
+                conexao.execute(AuditLog.__table__.insert(), lote)
+        except SQLAlchemyError as e:
+            with self._lock:
+                self._falhas += len(lote)
+            logger.error(f"Erro ao gravar {len(lote)} eventos de auditoria: {str(e)}")
+            return
+
+        with self._lock:
+            self._gravados += len(lote)
+            self._lotes += 1
+            self._ultimo_lote_em = datetime.now(timezone.utc)
+
+
+audit_writer = AuditWriter()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de prefixos em memória para o autocomplete de equipamentos
+
+Mantém arrays ordenados (chave normalizada -> id) e responde prefixos com
+``bisect``, sem ir ao banco a cada tecla. Há um array global e um por setor,
+para que usuários restritos a um setor só percorram os próprios itens.
+
+O índice é descartado quando uma transação que alterou equipamentos é
+confirmada neste processo. Como cada worker do gunicorn tem sua cópia, o
+índice também expira após AUTOCOMPLETE_TTL segundos.
+"""
+
+from bisect import bisect_left
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import db
+from .constants import AUTOCOMPLETE_TTL
+from .models import Equipamento
+
+_ALTERADO_KEY = 'autocomplete_equipamentos_alterados'
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ("Ação" -> "acao")"""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower().strip()
+
+
+def _chaves(nome, serial):
+    """Chaves de um equipamento: o nome a partir de cada palavra e o serial"""
+    chaves = set()
+    palavras = normalizar(nome).split()
+    for i in range(len(palavras)):
+        chaves.add(' '.join(palavras[i:]))
+    if serial:
+        chaves.add(normalizar(serial))
+    chaves.discard('')
+    return chaves
+
+
+class _Arrays:
+    def __init__(self, pares):
+        pares.sort()
+        self.chaves = [chave for chave, _ in pares]
+        self.ids = [id_ for _, id_ in pares]
+
+    def buscar(self, prefixo, limite, vistos, resultado):
+        i = bisect_left(self.chaves, prefixo)
+        while i < len(self.chaves) and len(resultado) < limite:
+            if not self.chaves[i].startswith(prefixo):
+                break
+            id_ = self.ids[i]
+            if id_ not in vistos:
+                vistos.add(id_)
+                resultado.append(id_)
+            i += 1
+
+
+class AutocompleteIndex:
+    """Índice de prefixos por processo, reconstruído sob demanda"""
+
+    def __init__(self, ttl=AUTOCOMPLETE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._construido_em = None
+        self._global = None
+        self._por_setor = {}
+        self._itens = {}
+
+    def invalidar(self):
+        with self._lock:
+            self._construido_em = None
+
+    def _expirado(self):
+        return self._construido_em is None or time.monotonic() - self._construido_em > self.ttl
+
+    def _construir(self):
+        itens = {}
+        pares_global = []
+        pares_setor = {}
+        linhas = db.session.query(
+            Equipamento.id,
+            Equipamento.name_response,
+            Equipamento.serial_number,
+            Equipamento.setor_category,
+            Equipamento.equipamento_category,
+            Equipamento.emprestimo,
+            Equipamento.marca_category,
+            Equipamento.cargo_category
+        ).yield_per(1000)
+
+        for id_, nome, serial, setor, categoria, status, marca, cargo in linhas:
+            itens[id_] = {
+                'id': id_,
+                'name_response': nome,
+                'serial_number': serial or '',
+                'setor_category': setor or '-',
+                'equipamento_category': categoria,
+                'emprestimo': status,
+                'marca_category': marca,
+                'cargo_category': cargo or '-'
+            }
+            for chave in _chaves(nome, serial):
+                pares_global.append((chave, id_))
+                pares_setor.setdefault(setor, []).append((chave, id_))
+
+        self._itens = itens
+        self._global = _Arrays(pares_global)
+        self._por_setor = {setor: _Arrays(pares) for setor, pares in pares_setor.items()}
+        self._construido_em = time.monotonic()
+
+    def buscar(self, termo, setores=None, limite=10):
+        """
+        Retorna equipamentos cujo nome (a partir de qualquer palavra) ou serial começa com o termo
+
+        Args:
+            termo (str): Texto digitado
+            setores (list): Setores permitidos (None = sem restrição)
+            limite (int): Máximo de resultados
+
+        Returns:
+            list: Dicts com id, nome, serial, setor, categoria, status, marca e cargo
+        """
+        prefixo = normalizar(termo)
+        if not prefixo:
+            return []
+
+        with self._lock:
+            if self._expirado():
+                self._construir()
+            arrays = [self._global] if setores is None else [
+                self._por_setor[setor] for setor in setores if setor in self._por_setor
+            ]
+            itens = self._itens
+
+        vistos, ids = set(), []
+        for array in arrays:
+            array.buscar(prefixo, limite, vistos, ids)
+        if len(arrays) > 1:
+            ids.sort(key=lambda id_: normalizar(itens[id_]['name_response']))
+        return [itens[id_] for id_ in ids[:limite]]
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+@event.listens_for(Session, "before_flush")
+def _marcar_alteracao(session, flush_context, instances):
+    if any(isinstance(obj, Equipamento) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_ALTERADO_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _marcar_alteracao_em_massa(orm_execute_state):
+    """Cobre Equipamento.query.delete()/update() e inserts em massa, que não passam pelo flush"""
+    em_massa = (orm_execute_state.is_update or orm_execute_state.is_delete
+                or getattr(orm_execute_state, 'is_insert', False))
+    mapper = orm_execute_state.bind_mapper
+    if em_massa and mapper is not None and mapper.class_ is Equipamento:
+        orm_execute_state.session.info[_ALTERADO_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(session):
+    if session.info.pop(_ALTERADO_KEY, False):
+        autocomplete_index.invalidar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_marcacao(session):
+    session.info.pop(_ALTERADO_KEY, None)
@@ -1,16 +1,22 @@
 # -*- coding: utf-8 -*-
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, current_app, send_file
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, current_app, send_file, Response
 from flask_login import login_required, current_user
 from sqlalchemy.exc import SQLAlchemyError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import os
-import shutil
 import sqlite3
+import subprocess
 import logging
-import zipfile
+import time
+import uuid
 from pathlib import Path
+from sqlalchemy.engine import make_url
 
 from . import db
+from .backup_store import BackupStore, FORMATOS, SUFIXOS
+from .constants import BACKUP_PAGINAS_POR_PASSO, BACKUP_PAUSA_PASSO
+from .export_cache import ExportCache
 from .models import Backup, Administrador
 
 logger = logging.getLogger(__name__)
@@ -20,6 +26,20 @@ backup_bp = Blueprint("backup", __name__, template_folder="templates")
 # Diretório para armazenar backups
 BACKUP_DIR = "backups"
 
+# Um backup por vez: cópias simultâneas só disputariam o mesmo disco
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='backup')
+
+def get_backup_store():
+    """Armazenamento dos arquivos de backup (diretório BACKUP_DIR)"""
+    return BackupStore(Path(current_app.root_path) / BACKUP_DIR)
+
+def get_formato_armazenamento():
+    formato = current_app.config.get('BACKUP_ARMAZENAMENTO', 'gzip')
+    if formato not in FORMATOS:
+        logger.warning(f"BACKUP_ARMAZENAMENTO inválido ({formato}); usando gzip")
+        return 'gzip'
+    return formato
+
 def get_sqlite_path():
     """Resolve o caminho absoluto do arquivo de banco de dados SQLite"""
     db_uri = current_app.config['SQLALCHEMY_DATABASE_URI']
@@ -34,65 +54,244 @@ def get_sqlite_path():
     
     return os.path.normpath(db_path)
 
-def create_backup_automatico():
-    """Cria um backup automático do banco de dados (chamado pelo scheduler)"""
-    try:
-        logger.info("Iniciando backup automático")
+def get_database_backend():
+    """Nome do backend em uso ('sqlite', 'postgresql', ...)"""
+    return db.engine.dialect.name
+
+def get_backup_extension():
+    """Extensão dos arquivos de backup do backend atual"""
+    return '.dump' if get_database_backend() == 'postgresql' else '.db'
 
-        # Criar diretório se não existir
-        backup_path = Path(current_app.root_path) / BACKUP_DIR
-        backup_path.mkdir(exist_ok=True)
-
-        # Nome do arquivo de backup
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"backup_auto_{timestamp}.db"
-        backup_filepath = backup_path / backup_filename
-
-        # Criar registro do backup
-        backup = Backup(
-            nome=f"Backup Automático - {datetime.now().strftime('%d/%m/%Y %H:%M')}",
-            arquivo=str(backup_filepath),
-            tamanho=0,  # Será atualizado após criação
-            tipo='AUTOMATICO',
-            status='EXECUTANDO',
-            criado_por=None  # Backup automático não tem usuário específico
-        )
-        db.session.add(backup)
+def _executar_ferramenta_postgres(comando):
+    """Executa pg_dump/pg_restore contra o banco configurado (senha via PGPASSWORD)"""
+    url = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    env = os.environ.copy()
+    if url.password:
+        env['PGPASSWORD'] = str(url.password)
+    dsn = url.set(drivername='postgresql', password=None).render_as_string(hide_password=False)
+
+    try:
+        subprocess.run(comando + [f'--dbname={dsn}'], env=env, check=True, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise Exception(f"{comando[0]} não encontrado. Instale o cliente do PostgreSQL")
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"{comando[0]} falhou: {(e.stderr or '').strip()[:500]}")
+
+def _copiar_sqlite(origem, destino, backup_id=None, paginas=-1, pausa=0):
+    """
+    Copia um banco SQLite para outro arquivo usando a API de backup
+
+    Com ``paginas`` > 0 a cópia anda em passos de N páginas e dorme ``pausa``
+    segundos entre eles, liberando o banco para os escritores. O SQLite
+    reinicia a cópia se outra conexão escreve entre dois passos; em modo WAL
+    a conexão de origem segura uma transação de leitura durante a cópia, o
+    que fixa o snapshot (cópia consistente, sem reinícios) sem bloquear
+    quem escreve. O progresso vai para ``backups.progresso``.
+    """
+    conn_origem = sqlite3.connect(origem, timeout=30, isolation_level=None)
+    conn_destino = sqlite3.connect(destino)
+    conn_progresso = None
+    try:
+        wal = conn_origem.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal'
+        if wal and paginas > 0:
+            conn_origem.execute("BEGIN")
+            conn_origem.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        if backup_id is not None:
+            # Sem snapshot, só a própria conexão de origem escreve sem reiniciar a cópia
+            conn_progresso = sqlite3.connect(origem, timeout=30) if conn_origem.in_transaction else conn_origem
+        ultimo = [None]
+
+        def progresso(status, restantes, total):
+            if conn_progresso is not None and total:
+                percentual = min(99, (total - restantes) * 100 // total)
+                if percentual != ultimo[0]:
+                    ultimo[0] = percentual
+                    try:
+                        conn_progresso.execute("UPDATE backups SET progresso = ? WHERE id = ?",
+                                               (percentual, backup_id))
+                        if conn_progresso.in_transaction:
+                            conn_progresso.commit()
+                    except sqlite3.OperationalError as e:
+                        # Progresso é informativo: não interrompe a cópia
+                        logger.debug(f"Progresso do backup {backup_id} não gravado: {str(e)}")
+            if pausa and restantes:
+                time.sleep(pausa)
+
+        conn_origem.backup(conn_destino, pages=paginas, progress=progresso)
+    finally:
+        if conn_progresso is not None and conn_progresso is not conn_origem:
+            conn_progresso.close()
+        conn_destino.close()
+        conn_origem.close()
+
+def gerar_arquivo_backup(destino, backup_id=None):
+    """
+    Grava uma cópia do banco atual em destino
+
+    SQLite: API de backup do sqlite3, em passos (BACKUP_PAGINAS_POR_PASSO)
+    para não bloquear os escritores. PostgreSQL: pg_dump em formato custom.
+
+    Args:
+        destino: Caminho do arquivo de backup
+        backup_id (int): Registro Backup que recebe o progresso (opcional)
+    """
+    backend = get_database_backend()
+    if backend == 'sqlite':
+        db_path = get_sqlite_path()
+        if not db_path:
+            raise Exception("Banco SQLite em memória não pode ser copiado")
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
+        # API de backup do SQLite: cópia consistente mesmo com WAL e escritas concorrentes
+        _copiar_sqlite(db_path, str(destino), backup_id,
+                       paginas=BACKUP_PAGINAS_POR_PASSO, pausa=BACKUP_PAUSA_PASSO)
+    elif backend == 'postgresql':
+        _executar_ferramenta_postgres(['pg_dump', '--format=custom', '--no-owner', f'--file={destino}'])
+    else:
+        raise Exception(f"Backup não suportado para o banco {backend}")
+
+def gerar_backup_armazenado(destino, backup_id=None):
+    """
+    Copia o banco para um arquivo temporário e o grava comprimido em destino
+
+    Returns:
+        tuple: (tamanho armazenado, tamanho original) em bytes
+    """
+    destino = Path(destino)
+    formato = BackupStore.formato_do_arquivo(destino)
+    bruto = destino.with_name(f"{destino.name}.{uuid.uuid4().hex}.tmp{BackupStore.extensao_original(destino)}")
+    try:
+        gerar_arquivo_backup(bruto, backup_id)
+        if not bruto.exists():
+            raise Exception("Arquivo de backup não foi criado")
+        return get_backup_store().guardar(bruto, destino, formato)
+    finally:
+        bruto.unlink(missing_ok=True)
+
+def restaurar_arquivo_backup(origem):
+    """Substitui o conteúdo do banco atual pelo backup em origem (comprimido ou não)"""
+    if BackupStore.formato_do_arquivo(origem) is None:
+        _restaurar_arquivo_bruto(origem)
+        return
+
+    # Descomprime em fluxo para um temporário ao lado: SQLite e pg_restore leem de arquivo
+    origem = Path(origem)
+    bruto = origem.with_name(f"restore_{uuid.uuid4().hex}{BackupStore.extensao_original(origem)}")
+    try:
+        get_backup_store().extrair(origem, bruto)
+        _restaurar_arquivo_bruto(bruto)
+    finally:
+        bruto.unlink(missing_ok=True)
+
+def _restaurar_arquivo_bruto(origem):
+    backend = get_database_backend()
+    if backend == 'sqlite':
+        db_path = get_sqlite_path()
+        if not db_path:
+            raise Exception("Banco SQLite em memória não pode ser restaurado")
+        db.session.remove()
+        # Gravar pelo próprio SQLite (não sobrescrever o arquivo) mantém o WAL coerente
+        _copiar_sqlite(str(origem), db_path)
+        db.engine.dispose()
+    elif backend == 'postgresql':
+        db.session.remove()
+        db.engine.dispose()
+        _executar_ferramenta_postgres(['pg_restore', '--clean', '--if-exists', '--no-owner', '--single-transaction', str(origem)])
+    else:
+        raise Exception(f"Restauração não suportada para o banco {backend}")
+
+    # O banco restaurado traz sua própria versão dos dados: exportações em cache não valem mais
+    ExportCache.limpar()
+
+def _registrar_backup(tipo, criado_por=None):
+    """Cria o registro Backup (status EXECUTANDO) com o caminho do arquivo a gerar"""
+    backup_path = Path(current_app.root_path) / BACKUP_DIR
+    backup_path.mkdir(exist_ok=True)
+
+    agora = datetime.now()
+    prefixo = 'backup_auto' if tipo == 'AUTOMATICO' else 'backup'
+    sufixo = SUFIXOS[get_formato_armazenamento()]
+    backup_filepath = backup_path / f"{prefixo}_{agora.strftime('%Y%m%d_%H%M%S')}{get_backup_extension()}{sufixo}"
+    rotulo = 'Automático' if tipo == 'AUTOMATICO' else 'Manual'
+
+    backup = Backup(
+        nome=f"Backup {rotulo} - {agora.strftime('%d/%m/%Y %H:%M')}",
+        arquivo=str(backup_filepath),
+        tamanho=0,  # Será atualizado após criação
+        tipo=tipo,
+        status='EXECUTANDO',
+        progresso=0,
+        criado_por=criado_por
+    )
+    db.session.add(backup)
+    db.session.commit()
+    return backup
+
+def executar_backup(backup_id):
+    """
+    Gera o arquivo de um backup registrado e grava o resultado no registro
+
+    Returns:
+        bool: True se o backup foi concluído com sucesso
+    """
+    backup = db.session.get(Backup, backup_id)
+    backup_filepath = Path(backup.arquivo)
+    try:
+        # Fazer backup do banco (arquivo SQLite ou pg_dump) e gravá-lo comprimido
+        tamanho, tamanho_original = gerar_backup_armazenado(backup_filepath, backup_id)
+
+        # O progresso foi gravado por outra conexão: recarregar antes de atualizar
+        db.session.refresh(backup)
+        backup.tamanho = tamanho
+        backup.tamanho_original = tamanho_original
+        backup.progresso = 100
+        backup.status = 'SUCESSO'
+        backup.concluido_at = datetime.now(timezone.utc)
         db.session.commit()
 
-        try:
-            # Fazer backup do banco SQLite
-            db_path = get_sqlite_path()
-            if not db_path:
-                raise Exception("Backup automático suportado apenas para SQLite")
-
-            if not os.path.exists(db_path):
-                raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
-
-            # Copiar arquivo do banco
-            shutil.copy2(db_path, backup_filepath)
-
-            # Verificar se o backup foi criado com sucesso
-            if not backup_filepath.exists():
-                raise Exception("Arquivo de backup não foi criado")
-
-            # Atualizar informações do backup
-            tamanho = backup_filepath.stat().st_size
-            backup.tamanho = tamanho
-            backup.status = 'SUCESSO'
-            backup.concluido_at = datetime.now(timezone.utc)
-            db.session.commit()
+        logger.info(f"Backup criado com sucesso: {backup_filepath.name} "
+                    f"({tamanho} bytes, {tamanho_original} sem compressão)")
+        return True
 
-            logger.info(f"Backup automático criado com sucesso: {backup_filename} ({tamanho} bytes)")
+    except Exception as e:
+        db.session.rollback()
+        backup = db.session.get(Backup, backup_id)
+        backup.status = 'FALHA'
+        backup.erro_mensagem = str(e)
+        backup.concluido_at = datetime.now(timezone.utc)
+        db.session.commit()
+        get_backup_store().remover(backup_filepath)
 
+        logger.error(f"Erro ao criar backup {backup_id}: {str(e)}", exc_info=True)
+        return False
+
+def _executar_backup_em_segundo_plano(app, backup_id):
+    with app.app_context():
+        try:
+            executar_backup(backup_id)
         except Exception as e:
-            # Marcar backup como falha
-            backup.status = 'FALHA'
-            backup.erro_mensagem = str(e)
-            backup.concluido_at = datetime.now(timezone.utc)
-            db.session.commit()
+            logger.error(f"Erro inesperado no backup {backup_id}: {str(e)}", exc_info=True)
+        finally:
+            db.session.remove()
+
+def iniciar_backup(tipo, criado_por=None):
+    """
+    Registra um backup e envia a cópia para a thread de backups
+
+    Returns:
+        Backup: Registro recém-criado (status EXECUTANDO)
+    """
+    backup = _registrar_backup(tipo, criado_por)
+    _executor.submit(_executar_backup_em_segundo_plano, current_app._get_current_object(), backup.id)
+    logger.info(f"Backup {backup.id} iniciado em segundo plano")
+    return backup
 
-            logger.error(f"Erro ao criar backup automático: {str(e)}", exc_info=True)
+def create_backup_automatico():
+    """Cria um backup automático do banco de dados (chamado pelo scheduler, já fora da requisição)"""
+    try:
+        logger.info("Iniciando backup automático")
+        backup = _registrar_backup('AUTOMATICO')
+        executar_backup(backup.id)
 
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -115,14 +314,15 @@ def list_backups():
             'total': len(backups),
             'sucesso': len([b for b in backups if b.status == 'SUCESSO']),
             'falha': len([b for b in backups if b.status == 'FALHA']),
-            'executando': len([b for b in backups if b.status == 'EXECUTANDO'])
+            'executando': len([b for b in backups if b.status == 'EXECUTANDO']),
+            'espaco_disco': get_backup_store().uso_disco()
         }
 
         return render_template("dashboard/backup.html", backups=backups, stats=stats)
     except Exception as e:
         logger.error(f"Erro ao listar backups: {str(e)}", exc_info=True)
         flash("Erro ao carregar backups", "error")
-        return render_template("dashboard/backup.html", backups=[], stats={'total': 0, 'sucesso': 0, 'falha': 0, 'executando': 0})
+        return render_template("dashboard/backup.html", backups=[], stats={'total': 0, 'sucesso': 0, 'falha': 0, 'executando': 0, 'espaco_disco': 0})
 
 @backup_bp.route("/create", methods=["POST"])
 @login_required
@@ -133,62 +333,9 @@ def create_backup():
         if current_user.role != 'ADMIN':
             return jsonify({"error": "Acesso negado"}), 403
 
-        # Criar diretório se não existir
-        backup_path = Path(current_app.root_path) / BACKUP_DIR
-        backup_path.mkdir(exist_ok=True)
-
-        # Nome do arquivo de backup
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"backup_{timestamp}.db"
-        backup_filepath = backup_path / backup_filename
-
-        # Criar registro do backup
-        backup = Backup(
-            nome=f"Backup Manual - {datetime.now().strftime('%d/%m/%Y %H:%M')}",
-            arquivo=str(backup_filepath),
-            tamanho=0,  # Será atualizado após criação
-            tipo='MANUAL',
-            status='EXECUTANDO',
-            criado_por=current_user.id
-        )
-        db.session.add(backup)
-        db.session.commit()
-
-        try:
-            # Fazer backup do banco SQLite
-            db_path = get_sqlite_path()
-            if not db_path:
-                raise Exception("Backup manual suportado apenas para SQLite")
-            
-            if not os.path.exists(db_path):
-                raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
-
-            # Copiar arquivo do banco
-            shutil.copy2(db_path, backup_filepath)
-
-            # Verificar se o backup foi criado com sucesso
-            if not backup_filepath.exists():
-                raise Exception("Arquivo de backup não foi criado")
-
-            # Atualizar informações do backup
-            tamanho = backup_filepath.stat().st_size
-            backup.tamanho = tamanho
-            backup.status = 'SUCESSO'
-            backup.concluido_at = datetime.now(timezone.utc)
-            db.session.commit()
-
-            logger.info(f"Backup criado com sucesso: {backup_filename} ({tamanho} bytes)")
-            flash(f"Backup criado com sucesso: {backup_filename}", "success")
-
-        except Exception as e:
-            # Marcar backup como falha
-            backup.status = 'FALHA'
-            backup.erro_mensagem = str(e)
-            backup.concluido_at = datetime.now(timezone.utc)
-            db.session.commit()
-
-            logger.error(f"Erro ao criar backup: {str(e)}", exc_info=True)
-            flash(f"Erro ao criar backup: {str(e)}", "error")
+        # A cópia roda em segundo plano; a listagem acompanha o progresso
+        backup = iniciar_backup('MANUAL', current_user.id)
+        flash(f"Backup iniciado: {Path(backup.arquivo).name}", "success")
 
         return redirect(url_for("backup.list_backups"))
 
@@ -207,10 +354,10 @@ def create_backup_auto():
         if current_user.role != 'ADMIN':
             return jsonify({"error": "Acesso negado"}), 403
 
-        # Executar backup automático
-        create_backup_automatico()
+        # Executar backup automático em segundo plano
+        iniciar_backup('AUTOMATICO')
 
-        flash("Backup automático executado com sucesso", "success")
+        flash("Backup automático iniciado", "success")
         return redirect(url_for("backup.list_backups"))
 
     except Exception as e:
@@ -218,6 +365,18 @@ def create_backup_auto():
         flash("Erro ao executar backup automático", "error")
         return redirect(url_for("backup.list_backups"))
 
+@backup_bp.route("/<int:id>/status", methods=["GET"])
+@login_required
+def backup_status(id):
+    """Status e progresso de um backup (acompanhamento pela listagem)"""
+    if current_user.role != 'ADMIN':
+        return jsonify({"error": "Acesso negado"}), 403
+
+    backup = db.session.get(Backup, id)
+    if backup is None:
+        return jsonify({"error": "Backup não encontrado"}), 404
+    return jsonify(backup.to_dict())
+
 @backup_bp.route("/<int:id>/download", methods=["GET"])
 @login_required
 def download_backup(id):
@@ -238,11 +397,16 @@ def download_backup(id):
             flash("Arquivo de backup não encontrado", "error")
             return redirect(url_for("backup.list_backups"))
 
-        return send_file(
-            backup.arquivo,
-            as_attachment=True,
-            download_name=f"{backup.nome.replace(' ', '_')}.db"
-        )
+        download_name = f"{backup.nome.replace(' ', '_')}{BackupStore.extensao_original(backup.arquivo) or '.db'}"
+        if BackupStore.formato_do_arquivo(backup.arquivo) is None:
+            return send_file(backup.arquivo, as_attachment=True, download_name=download_name)
+
+        # Entrega o arquivo original, descomprimido em fluxo
+        resposta = Response(get_backup_store().ler(backup.arquivo), mimetype='application/octet-stream')
+        resposta.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        if backup.tamanho_original:
+            resposta.headers['Content-Length'] = str(backup.tamanho_original)
+        return resposta
 
     except Exception as e:
         logger.error(f"Erro ao baixar backup {id}: {str(e)}", exc_info=True)
@@ -261,16 +425,19 @@ def delete_backup(id):
         backup = Backup.query.get_or_404(id)
 
         # Remover arquivo físico se existir
-        if os.path.exists(backup.arquivo):
-            try:
-                os.remove(backup.arquivo)
-            except Exception as e:
-                logger.warning(f"Erro ao remover arquivo físico do backup {id}: {str(e)}")
+        store = get_backup_store()
+        try:
+            store.remover(backup.arquivo)
+        except Exception as e:
+            logger.warning(f"Erro ao remover arquivo físico do backup {id}: {str(e)}")
 
         # Remover registro do banco
         db.session.delete(backup)
         db.session.commit()
 
+        # Blocos deduplicados que ficaram sem backup
+        store.coletar_chunks()
+
         flash("Backup removido com sucesso", "success")
         return redirect(url_for("backup.list_backups"))
 
@@ -299,25 +466,25 @@ def restore_backup(id):
             flash("Arquivo de backup não encontrado", "error")
             return redirect(url_for("backup.list_backups"))
 
-        # Caminho do banco atual
-        db_path = get_sqlite_path()
-        if not db_path:
-            flash("Restauração suportada apenas para SQLite", "error")
+        if BackupStore.extensao_original(backup.arquivo) != get_backup_extension():
+            flash("Este backup foi gerado em outro tipo de banco de dados", "error")
             return redirect(url_for("backup.list_backups"))
 
         # Criar backup do estado atual antes de restaurar
-        backup_atual_filename = f"pre_restore_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+        backup_atual_filename = (f"pre_restore_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                                 f"{get_backup_extension()}{SUFIXOS[get_formato_armazenamento()]}")
         backup_atual_path = Path(current_app.root_path) / BACKUP_DIR / backup_atual_filename
 
         try:
             # Fazer backup do estado atual
-            shutil.copy2(db_path, backup_atual_path)
+            tamanho, tamanho_original = gerar_backup_armazenado(backup_atual_path)
 
             # Registrar backup de segurança
             backup_seguranca = Backup(
                 nome=f"Backup de Segurança - Pré-restauração {datetime.now().strftime('%d/%m/%Y %H:%M')}",
                 arquivo=str(backup_atual_path),
-                tamanho=backup_atual_path.stat().st_size,
+                tamanho=tamanho,
+                tamanho_original=tamanho_original,
                 tipo='AUTOMATICO',
                 status='SUCESSO',
                 criado_por=current_user.id,
@@ -330,10 +497,16 @@ def restore_backup(id):
             logger.warning(f"Erro ao criar backup de segurança: {str(e)}")
 
         # Restaurar backup
-        shutil.copy2(backup.arquivo, db_path)
+        user_name = current_user.name_user
+        try:
+            restaurar_arquivo_backup(backup.arquivo)
+        except Exception as e:
+            logger.error(f"Erro ao restaurar backup {id}: {str(e)}", exc_info=True)
+            flash(f"Erro ao restaurar backup: {str(e)}", "error")
+            return redirect(url_for("backup.list_backups"))
 
         flash("Backup restaurado com sucesso! O sistema será reiniciado.", "success")
-        logger.info(f"Backup {id} restaurado por {current_user.name_user}")
+        logger.info(f"Backup {id} restaurado por {user_name}")
 
         # Nota: Em produção, seria necessário reiniciar a aplicação
         return redirect(url_for("backup.list_backups"))
@@ -363,12 +536,13 @@ def cleanup_old_backups():
         # Manter apenas os 10 mais recentes
         backups_para_remover = backups[10:]
 
+        store = get_backup_store()
         removidos = 0
         for backup in backups_para_remover:
             # Remover arquivo físico
             if os.path.exists(backup.arquivo):
                 try:
-                    os.remove(backup.arquivo)
+                    store.remover(backup.arquivo)
                     removidos += 1
                 except Exception as e:
                     logger.warning(f"Erro ao remover arquivo físico do backup {backup.id}: {str(e)}")
@@ -378,6 +552,9 @@ def cleanup_old_backups():
 
         db.session.commit()
 
+        # Blocos deduplicados que ficaram sem backup
+        store.coletar_chunks()
+
         flash(f"{removidos} backups antigos removidos com sucesso", "success")
         return redirect(url_for("backup.list_backups"))
 
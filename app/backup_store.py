@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento comprimido dos arquivos de backup
+
+O arquivo bruto gerado pela cópia (``.db`` ou ``.dump``) nunca fica em
+disco depois do backup: ele passa por um dos formatos abaixo, escolhido por
+BACKUP_ARMAZENAMENTO.
+
+- ``gzip`` (padrão): um ``<nome>.db.gz`` por backup, comprimido em fluxo.
+- ``chunks``: armazenamento por conteúdo. O arquivo é cortado em blocos de
+  BACKUP_CHUNK_SIZE bytes, cada bloco é guardado comprimido em
+  ``backups/chunks/ab/<sha256>`` e o backup vira um manifesto
+  ``<nome>.db.chunks`` (JSON) com a lista de hashes. As páginas do SQLite
+  ficam nos mesmos offsets entre um backup e outro, então backups seguidos
+  de um banco pouco alterado compartilham quase todos os blocos.
+
+Backups antigos sem compressão (``.db`` / ``.dump``) continuam legíveis.
+A leitura (download e restauração) sempre descomprime em fluxo, bloco a
+bloco, sem carregar o backup inteiro em memória.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import time
+import uuid
+import zlib
+
+from .constants import BACKUP_CHUNK_IDADE_MINIMA, BACKUP_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ('gzip', 'chunks')
+SUFIXOS = {'gzip': '.gz', 'chunks': '.chunks'}
+CHUNKS_DIR = 'chunks'
+
+_BLOCO_LEITURA = 1024 * 1024
+
+
+def _gravar_atomico(destino, conteudo):
+    temporario = destino.with_name(f'{destino.name}.{uuid.uuid4().hex}.tmp')
+    try:
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, destino)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+
+class BackupStore:
+    """Gravação, leitura e remoção dos arquivos de backup em um diretório"""
+
+    def __init__(self, diretorio):
+        self.diretorio = Path(diretorio)
+
+    @property
+    def diretorio_chunks(self):
+        return self.diretorio / CHUNKS_DIR
+
+    @staticmethod
+    def formato_do_arquivo(arquivo):
+        """'gzip', 'chunks' ou None (backup antigo sem compressão)"""
+        for formato, sufixo in SUFIXOS.items():
+            if str(arquivo).endswith(sufixo):
+                return formato
+        return None
+
+    @staticmethod
+    def extensao_original(arquivo):
+        """Extensão do arquivo bruto (.db / .dump), sem o sufixo do armazenamento"""
+        nome = str(arquivo)
+        formato = BackupStore.formato_do_arquivo(nome)
+        if formato:
+            nome = nome[:-len(SUFIXOS[formato])]
+        return os.path.splitext(nome)[1]
+
+    def _caminho_chunk(self, digest):
+        return self.diretorio_chunks / digest[:2] / digest
+
+    def guardar(self, bruto, destino, formato='gzip'):
+        """
+        Grava o arquivo bruto no formato escolhido e apaga o bruto
+
+        Args:
+            bruto (Path): Arquivo gerado pela cópia do banco
+            destino (Path): Caminho final, já com o sufixo do formato
+            formato (str): gzip ou chunks
+
+        Returns:
+            tuple: (tamanho armazenado, tamanho original) em bytes. Em
+            ``chunks`` o armazenado soma os blocos referenciados, inclusive
+            os já existentes; só os blocos novos ocupam disco novo.
+        """
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de armazenamento inválido: {formato}")
+        bruto, destino = Path(bruto), Path(destino)
+        original = bruto.stat().st_size
+
+        if formato == 'gzip':
+            temporario = destino.with_name(f'{destino.name}.{uuid.uuid4().hex}.tmp')
+            try:
+                with open(bruto, 'rb') as entrada, gzip.open(temporario, 'wb', compresslevel=6) as saida:
+                    shutil.copyfileobj(entrada, saida, _BLOCO_LEITURA)
+                os.replace(temporario, destino)
+            finally:
+                temporario.unlink(missing_ok=True)
+            armazenado = destino.stat().st_size
+        else:
+            hashes, armazenado, novos = [], 0, 0
+            with open(bruto, 'rb') as entrada:
+                for bloco in iter(lambda: entrada.read(BACKUP_CHUNK_SIZE), b''):
+                    digest = hashlib.sha256(bloco).hexdigest()
+                    caminho = self._caminho_chunk(digest)
+                    if caminho.exists():
+                        # Renova o mtime: a coleta não apaga blocos recém-reaproveitados
+                        os.utime(caminho)
+                    else:
+                        caminho.parent.mkdir(parents=True, exist_ok=True)
+                        _gravar_atomico(caminho, zlib.compress(bloco, 6))
+                        novos += 1
+                    hashes.append(digest)
+                    armazenado += caminho.stat().st_size
+            _gravar_atomico(destino, json.dumps({
+                'versao': 1,
+                'tamanho': original,
+                'chunk_size': BACKUP_CHUNK_SIZE,
+                'chunks': hashes,
+            }).encode('utf-8'))
+            logger.info(f"Backup {destino.name}: {len(hashes)} blocos, {novos} novos")
+
+        bruto.unlink()
+        return armazenado, original
+
+    def ler(self, arquivo):
+        """Itera os bytes originais do backup, descomprimindo em fluxo"""
+        arquivo = Path(arquivo)
+        formato = self.formato_do_arquivo(arquivo)
+        if formato == 'chunks':
+            manifesto = json.loads(arquivo.read_text(encoding='utf-8'))
+            for digest in manifesto['chunks']:
+                caminho = self._caminho_chunk(digest)
+                if not caminho.exists():
+                    raise FileNotFoundError(f"Bloco {digest} do backup {arquivo.name} não encontrado")
+                yield zlib.decompress(caminho.read_bytes())
+            return
+
+        abrir = gzip.open if formato == 'gzip' else open
+        with abrir(arquivo, 'rb') as entrada:
+            for bloco in iter(lambda: entrada.read(_BLOCO_LEITURA), b''):
+                yield bloco
+
+    def extrair(self, arquivo, destino):
+        """Reconstrói o arquivo bruto do backup em destino"""
+        with open(destino, 'wb') as saida:
+            for bloco in self.ler(arquivo):
+                saida.write(bloco)
+
+    def tamanho_original(self, arquivo):
+        """Tamanho do arquivo bruto sem descomprimir (None se desconhecido)"""
+        arquivo = Path(arquivo)
+        formato = self.formato_do_arquivo(arquivo)
+        if formato == 'chunks':
+            return json.loads(arquivo.read_text(encoding='utf-8'))['tamanho']
+        if formato is None:
+            return arquivo.stat().st_size
+        return None
+
+    def remover(self, arquivo):
+        """Remove o arquivo do backup (os blocos saem em coletar_chunks)"""
+        Path(arquivo).unlink(missing_ok=True)
+
+    def coletar_chunks(self, idade_minima=BACKUP_CHUNK_IDADE_MINIMA):
+        """
+        Apaga os blocos que nenhum manifesto referencia
+
+        Blocos modificados há menos de ``idade_minima`` segundos são
+        mantidos: podem pertencer a um backup ainda em gravação, cujo
+        manifesto só aparece no fim.
+
+        Returns:
+            tuple: (blocos removidos, bytes liberados)
+        """
+        if not self.diretorio_chunks.exists():
+            return 0, 0
+
+        referenciados = set()
+        for manifesto in self.diretorio.glob(f'*{SUFIXOS["chunks"]}'):
+            try:
+                referenciados.update(json.loads(manifesto.read_text(encoding='utf-8'))['chunks'])
+            except (OSError, ValueError, KeyError) as e:
+                # Manifesto ilegível: não arriscar apagar blocos de ninguém
+                logger.error(f"Manifesto de backup inválido {manifesto.name}: {str(e)}")
+                return 0, 0
+
+        limite = time.time() - idade_minima
+        removidos, liberados = 0, 0
+        for caminho in self.diretorio_chunks.glob('*/*'):
+            if caminho.name in referenciados or caminho.name.endswith('.tmp'):
+                continue
+            estado = caminho.stat()
+            if estado.st_mtime > limite:
+                continue
+            caminho.unlink(missing_ok=True)
+            removidos += 1
+            liberados += estado.st_size
+
+        if removidos:
+            logger.info(f"Coleta de blocos de backup: {removidos} removidos ({liberados} bytes)")
+        return removidos, liberados
+
+    def uso_disco(self):
+        """Bytes realmente ocupados pelo diretório de backups (com os blocos compartilhados uma vez só)"""
+        if not self.diretorio.exists():
+            return 0
+        return sum(caminho.stat().st_size for caminho in self.diretorio.rglob('*') if caminho.is_file())
@@ -1,17 +1,71 @@
 import os
 from datetime import timedelta
 
+def _database_uri():
+    """URI do banco vinda do ambiente (DATABASE_URL); SQLite local por padrão"""
+    uri = os.getenv("DATABASE_URL", "sqlite:///app.db")
+    # Render/Heroku ainda fornecem o esquema antigo "postgres://"
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+def _engine_options(uri):
+    """Opções de pool adequadas ao backend escolhido"""
+    pool_size = int(os.getenv('DB_POOL_SIZE', '5'))
+    max_overflow = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+
+    if uri.startswith("sqlite"):
+        if uri in ("sqlite://", "sqlite:///:memory:"):
+            return {}
+        # Conexões reaproveitadas entre threads do mesmo worker; cada worker do
+        # gunicorn tem seu próprio pool. pool_recycle/pre_ping não se aplicam a arquivo local.
+        return {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': 30,
+            'connect_args': {
+                'check_same_thread': False,
+                'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')) / 1000
+            }
+        }
+
+    # Servidor (PostgreSQL): cada worker do gunicorn abre até pool_size + max_overflow
+    # conexões; manter workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) abaixo de max_connections.
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': 30,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': True
+    }
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
-    # Forçar SQLite para evitar problemas com PostgreSQL no Render
-    SQLALCHEMY_DATABASE_URI = "sqlite:///app.db"
+    SQLALCHEMY_DATABASE_URI = _database_uri()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_timeout': 20,
-        'pool_recycle': -1,
-        'pool_pre_ping': True
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    
+    # Perfil de desempenho do SQLite, aplicado a cada nova conexão (ver app/database.py)
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-20000')),  # negativo = KiB (20 MB)
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
     }
     
+    # Cache em disco das exportações (instance/export_cache), com LRU por tamanho total
+    EXPORT_CACHE_MAX_MB = int(os.getenv('EXPORT_CACHE_MAX_MB', '200'))
+    
+    # Auditoria gravada em lotes por uma thread de fundo (false = gravação imediata)
+    AUDIT_ASYNC = os.getenv('AUDIT_ASYNC', 'true').lower() == 'true'
+    # Meses mantidos em audit_logs; os anteriores vão para instance/audit_archive (gzip)
+    AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', '12'))
+    
+    # Backups comprimidos: gzip (um arquivo por backup) ou chunks (blocos deduplicados entre backups)
+    BACKUP_ARMAZENAMENTO = os.getenv('BACKUP_ARMAZENAMENTO', 'gzip').lower()
+    
     # Configurações de sessão e segurança
     SESSION_COOKIE_SECURE = os.getenv('FLASK_ENV', 'development') == 'production'
     SESSION_COOKIE_HTTPONLY = True
@@ -6,6 +6,12 @@ Constantes do sistema
 # Configurações de paginação
 DEFAULT_PAGE_SIZE = 10
 MAX_PAGE_SIZE = 100
+# Acima deste total de registros a navegação anterior/próxima usa cursores (keyset)
+KEYSET_THRESHOLD = 1000
+
+# Autocomplete: validade do índice em memória de cada worker (segundos)
+AUTOCOMPLETE_TTL = 60
+AUTOCOMPLETE_MAX_RESULTS = 20
 
 # Status de equipamentos
 STATUS_EMPRESTADO = "SIM"
@@ -36,3 +42,25 @@ EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
 # Formatos de arquivo permitidos
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+
+# Importação em segundo plano
+IMPORT_WORKERS = 2
+IMPORT_MAX_ERROS_REGISTRADOS = 1000
+# Job sem avanço há mais que isso (s) é dado como abandonado (worker reiniciado)
+IMPORT_JOB_TIMEOUT = 900
+
+# Gravação assíncrona da auditoria
+AUDIT_QUEUE_MAX = 10000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 1.0  # segundos de espera por novos eventos
+
+# Resumo de auditoria: validade do cache (segundos) e ações críticas detalhadas por resumo
+AUDIT_SUMMARY_TTL = 60
+AUDIT_SUMMARY_MAX_CRITICAS = 50
+
+# Backup online do SQLite: páginas copiadas por passo e pausa entre passos (segundos)
+BACKUP_PAGINAS_POR_PASSO = 1024
+BACKUP_PAUSA_PASSO = 0.005
+# Armazenamento por conteúdo: tamanho dos blocos e idade mínima (s) para a coleta apagar um bloco órfão
+BACKUP_CHUNK_SIZE = 256 * 1024
+BACKUP_CHUNK_IDADE_MINIMA = 3600
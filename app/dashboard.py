@@ -1,6 +1,11 @@
 from flask import Blueprint, render_template, jsonify, request
 from . import db
 from .models import Equipamento, Administrador
+from .kpis import KpiService
+from .search import SearchIndex
+from .audit_writer import audit_writer
+from .autocomplete import autocomplete_index
+from .constants import AUTOCOMPLETE_MAX_RESULTS
 from flask_login import login_required, current_user
 from sqlalchemy import func, case
 import logging
@@ -44,10 +49,7 @@ def index():
         if current_user.role == 'ADMIN':
             # Tentar obter dados dos equipamentos
             try:
-                kpis["total"] = base_query.count()
-                kpis["disponiveis"] = base_query.filter_by(emprestimo='DISPONIVEL').count()
-                kpis["em_uso"] = base_query.filter_by(emprestimo='EM_USO').count()
-                kpis["quebrados"] = base_query.filter_by(emprestimo='QUEBRADO').count()
+                kpis.update(KpiService.get_equipamento_kpis(KpiService.setor_do_usuario(current_user)))
                 equipamentos = base_query.limit(10).all()
             except:
                 equipamentos = []
@@ -164,14 +166,7 @@ def search_equipamentos():
             equipamentos_query = equipamentos_query.filter_by(setor_category=current_user.setor)
         
         if query:
-            search_term = f'%{query}%'
-            equipamentos_query = equipamentos_query.filter(
-                db.or_(
-                    Equipamento.name_response.ilike(search_term),
-                    Equipamento.marca_category.ilike(search_term),
-                    Equipamento.equipamento_category.ilike(search_term)
-                )
-            )
+            equipamentos_query = SearchIndex.aplicar(equipamentos_query, query, ranquear=True)
         
         if categoria:
             equipamentos_query = equipamentos_query.filter(Equipamento.equipamento_category == categoria)
@@ -197,6 +192,33 @@ def search_equipamentos():
         logger.error(f"Erro na busca: {str(e)}")
         return jsonify({'success': False, 'error': 'Erro na busca'}), 500
 
+@dashboard_bp.route("/api/autocomplete")
+@login_required
+def autocomplete_equipamentos():
+    """API de autocomplete (nome e serial) servida pelo índice de prefixos em memória"""
+    try:
+        termo = request.args.get('q', '').strip()
+        limite = min(max(request.args.get('limit', 10, type=int), 1), AUTOCOMPLETE_MAX_RESULTS)
+        
+        # ADMIN vê todos os equipamentos; demais perfis apenas os seus setores
+        setores = None if current_user.role == 'ADMIN' else current_user.get_accessible_setores()
+        
+        return jsonify({
+            'success': True,
+            'equipamentos': autocomplete_index.buscar(termo, setores=setores, limite=limite)
+        })
+    except Exception as e:
+        logger.error(f"Erro no autocomplete: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro na busca'}), 500
+
+@dashboard_bp.route("/api/auditoria/fila")
+@login_required
+def auditoria_fila():
+    """Métricas da fila de auditoria deste processo (pendentes, descartados, falhas)"""
+    if current_user.role != 'ADMIN':
+        return jsonify({'success': False, 'error': 'Acesso negado'}), 403
+    return jsonify({'success': True, 'metricas': audit_writer.metricas()})
+
 @dashboard_bp.route("/api/analytics")
 @login_required
 def get_analytics():
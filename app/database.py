@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração do engine de banco de dados
+"""
+
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Ordem importa: journal_mode precisa vir antes de synchronous para o WAL valer
+_ORDEM_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+
+
+def configurar_sqlite(app, engine):
+    """
+    Aplica SQLITE_PRAGMAS a cada conexão nova do engine e registra os valores efetivos
+
+    Args:
+        app: Aplicação Flask (fonte da configuração)
+        engine: Engine SQLAlchemy
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    comandos = [f"PRAGMA {nome}={pragmas[nome]}" for nome in _ORDEM_PRAGMAS if pragmas.get(nome) is not None]
+
+    @event.listens_for(engine, "connect")
+    def _aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for comando in comandos:
+                cursor.execute(comando)
+        finally:
+            cursor.close()
+
+    with engine.connect() as conn:
+        efetivos = {
+            nome: conn.exec_driver_sql(f"PRAGMA {nome}").scalar()
+            for nome in _ORDEM_PRAGMAS
+        }
+    logger.info("SQLite configurado: " + ", ".join(f"{nome}={valor}" for nome, valor in efetivos.items()))
@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, make_response
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
 from . import db
-from .models import Equipamento
+from .models import Equipamento, ImportacaoJob
 from .audit import AuditManager
+from .constants import DEFAULT_PAGE_SIZE
+from .exports import consultar_em_fluxo, resposta_csv
+from .importacao import ImportJobService
+from .kpis import KpiService
+from .pagination import paginate
+from .search import SearchIndex
 from flask_login import login_required, current_user
-from sqlalchemy import or_, func, case
+from sqlalchemy import func, case, text
 from sqlalchemy.exc import SQLAlchemyError
-from io import BytesIO, StringIO
-import csv
-from datetime import datetime
+from io import BytesIO
 from werkzeug.utils import secure_filename
 import logging
 import os
@@ -56,13 +60,8 @@ def list_equipamentos():
         
         # Aplicar filtros
         if search_query:
-            query = query.filter(
-                or_(
-                    Equipamento.name_response.ilike(f'%{search_query}%'),
-                    Equipamento.marca_category.ilike(f'%{search_query}%'),
-                    Equipamento.equipamento_category.ilike(f'%{search_query}%')
-                )
-            )
+            # Resultados da busca por relevância (BM25), desempatados pelo id
+            query = SearchIndex.aplicar(query, search_query, ranquear=True)
         
         if status_filter:
             query = query.filter(Equipamento.emprestimo == status_filter)
@@ -76,46 +75,33 @@ def list_equipamentos():
         if marca_filter:
             query = query.filter(Equipamento.marca_category.ilike(f'%{marca_filter}%'))
         
-        # Buscar equipamentos filtrados
-        equipamentos_list = query.all()
-        logger.info(f"Encontrados {len(equipamentos_list)} equipamentos após filtros")
-        
-        # Calcular KPIs (sempre com todos os equipamentos)
-        all_equipamentos = Equipamento.query.all()
-        total = len(all_equipamentos)
-        em_uso = sum(1 for eq in all_equipamentos if eq.emprestimo == 'EM_USO')
-        quebrados = sum(1 for eq in all_equipamentos if eq.emprestimo == 'QUEBRADO')
-        kpis = {
-            "total": total,
-            "em_uso": em_uso,
-            "quebrados": quebrados,
-            "disponiveis": total - em_uso - quebrados
-        }
-        
-        # Estrutura de dados para o template
-        equipamentos_data = {
-            'items': equipamentos_list,
-            'pages': 1,
-            'page': 1,
-            'total': len(equipamentos_list),
-            'has_prev': False,
-            'has_next': False
+        # Paginar equipamentos filtrados (offset ou cursor)
+        filtros = {
+            chave: valor for chave, valor in (
+                ('q', search_query), ('status', status_filter), ('categoria', categoria_filter),
+                ('setor', setor_filter), ('marca', marca_filter)
+            ) if valor
         }
+        equipamentos_page = paginate(
+            query,
+            (Equipamento.id,),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int),
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            base_args=filtros,
+            # A relevância não tem cursor: com busca a paginação é por offset
+            keyset=not search_query
+        )
+        logger.info(f"Encontrados {equipamentos_page.total} equipamentos após filtros")
         
-        # Converter para objeto simples
-        class SimpleEquipamentos:
-            def __init__(self, data):
-                self.items = data['items']
-                self.pages = data['pages']
-                self.page = data['page']
-                self.total = data['total']
-                self.has_prev = data['has_prev']
-                self.has_next = data['has_next']
+        # Calcular KPIs (sempre com todos os equipamentos)
+        kpis = KpiService.get_equipamento_kpis()
         
         logger.info("Renderizando template equipamentos.html")
         return render_template(
             "dashboard/equipamentos.html",
-            equipamentos=SimpleEquipamentos(equipamentos_data),
+            equipamentos=equipamentos_page,
             kpis=kpis
         )
         
@@ -358,23 +344,23 @@ def export_data(format):
         flash("Acesso negado. Apenas administradores podem gerenciar equipamentos.", "error")
         return redirect(url_for('dashboard.index'))
     if format == 'csv':
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        writer.writerow(['ID', 'Nome', 'Categoria', 'Marca', 'Setor', 'Cargo', 'Emprestimo', 'Compartilhado', 'AnyDesk', 'Observacoes'])
-        
-        for eq in Equipamento.query.yield_per(100):
-            writer.writerow([
-                eq.id, eq.name_response, eq.equipamento_category, eq.marca_category,
-                eq.setor_category or '', eq.cargo_category or '', eq.emprestimo,
-                eq.equipamento_compartilhado, eq.numero_anydesk or '', eq.observacoes or ''
-            ])
-        
-        output.seek(0)
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=equipamentos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        return response
+        consulta = consultar_em_fluxo(
+            Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+            Equipamento.marca_category, Equipamento.setor_category, Equipamento.cargo_category,
+            Equipamento.emprestimo, Equipamento.equipamento_compartilhado,
+            Equipamento.numero_anydesk, Equipamento.observacoes
+        ).order_by(Equipamento.id)
+        
+        linhas = (
+            [id_, nome, categoria, marca, setor or '', cargo or '', emprestimo,
+             compartilhado, anydesk or '', observacoes or '']
+            for (id_, nome, categoria, marca, setor, cargo, emprestimo,
+                 compartilhado, anydesk, observacoes) in consulta
+        )
+        return resposta_csv(
+            ['ID', 'Nome', 'Categoria', 'Marca', 'Setor', 'Cargo', 'Emprestimo', 'Compartilhado', 'AnyDesk', 'Observacoes'],
+            linhas
+        )
     
     flash("Formato não suportado", "error")
     return redirect(url_for("equipamentos.list_equipamentos"))
@@ -398,27 +384,6 @@ def _validate_import_file(request):
     
     return file, None
 
-def _process_csv_row(row, row_num):
-    """Processa uma linha do CSV e retorna equipamento ou erro"""
-    nome = row.get('Nome', '').strip()
-    if not nome:
-        return None, f"Linha {row_num}: Nome é obrigatório"
-    
-    eq = Equipamento(
-        name_response=nome,
-        equipamento_category=row.get('Categoria', 'NOTEBOOK'),
-        marca_category=row.get('Marca', 'Sem marca'),
-        setor_category=row.get('Setor') or None,
-        cargo_category=row.get('Cargo') or None,
-        emprestimo=row.get('Emprestimo', 'NAO'),
-        equipamento_compartilhado=row.get('Compartilhado', 'NAO'),
-        numero_anydesk=row.get('AnyDesk') or None,
-        observacoes=row.get('Observacoes') or None,
-        created_by=current_user.id,
-        updated_by=current_user.id
-    )
-    return eq, None
-
 @equipamentos_bp.route("/import", methods=["POST"])
 @login_required
 def import_equipamentos():
@@ -430,63 +395,46 @@ def import_equipamentos():
         flash(error, "error")
         return redirect(url_for("equipamentos.list_equipamentos"))
     
+    if not file.filename.lower().endswith(('.csv', '.xlsx')):
+        flash("Formato .xls não suportado. Salve a planilha como .xlsx ou CSV", "error")
+        return redirect(url_for("equipamentos.list_equipamentos"))
+    
     try:
-        imported_count = 0
-        errors = []
-        batch_size = 100
-        
-        # Processar arquivo baseado na extensão
-        if file.filename.lower().endswith('.csv'):
-            # Processar CSV
-            stream = StringIO(file.stream.read().decode("UTF8"), newline=None)
-            reader = csv.DictReader(stream)
-            rows = list(reader)
-        else:
-            # Processar Excel
-            try:
-                import pandas as pd
-                df = pd.read_excel(file.stream, engine='openpyxl')
-                rows = df.to_dict('records')
-            except ImportError:
-                flash("Biblioteca pandas não instalada. Use arquivo CSV", "error")
-                return redirect(url_for("equipamentos.list_equipamentos"))
-            except Exception as e:
-                flash(f"Erro ao ler arquivo Excel: {str(e)}", "error")
-                return redirect(url_for("equipamentos.list_equipamentos"))
-        
-        for row_num, row in enumerate(rows, start=2):
-            eq, error = _process_csv_row(row, row_num)
-            if error:
-                errors.append(error)
-                continue
-            
-            try:
-                db.session.add(eq)
-                imported_count += 1
-                
-                if imported_count % batch_size == 0:
-                    db.session.commit()
-            except SQLAlchemyError as e:
-                errors.append(f"Linha {row_num}: {str(e)}")
-                db.session.rollback()
-        
-        if imported_count % batch_size != 0:
-            db.session.commit()
-        
-        if imported_count > 0:
-            flash(f"{imported_count} equipamentos importados com sucesso", "success")
-        
-        for error in errors[:5]:
-            flash(error, "warning")
-        
-    except UnicodeDecodeError:
-        flash("Erro ao ler arquivo: encoding inválido. Use UTF-8", "error")
-    except Exception as e:
+        # O arquivo é processado em segundo plano; a resposta volta imediatamente
+        job = ImportJobService.submeter(file, current_user.id)
+    except (OSError, SQLAlchemyError) as e:
         db.session.rollback()
-        logger.error(f"Erro ao importar equipamentos: {str(e)}", exc_info=True)
+        logger.error(f"Erro ao enfileirar importação: {str(e)}", exc_info=True)
         flash("Erro ao processar arquivo", "error")
+        return redirect(url_for("equipamentos.list_equipamentos"))
     
-    return redirect(url_for("equipamentos.list_equipamentos"))
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            **job.to_dict(),
+            'status_url': url_for('equipamentos.import_status', id=job.id)
+        }), 202
+    
+    flash("Importação iniciada. Acompanhe o progresso abaixo.", "success")
+    return redirect(url_for("equipamentos.import_summary", id=job.id))
+
+@equipamentos_bp.route("/import/<int:id>")
+@login_required
+def import_summary(id):
+    if current_user.role != 'ADMIN':
+        flash("Acesso negado. Apenas administradores podem gerenciar equipamentos.", "error")
+        return redirect(url_for('dashboard.index'))
+    ImportJobService.marcar_abandonados(id)
+    job = ImportacaoJob.query.get_or_404(id)
+    return render_template("dashboard/importacao.html", job=job, erros=ImportJobService.erros(job))
+
+@equipamentos_bp.route("/import/<int:id>/status")
+@login_required
+def import_status(id):
+    if current_user.role != 'ADMIN':
+        return jsonify({'error': 'Acesso negado'}), 403
+    ImportJobService.marcar_abandonados(id)
+    job = ImportacaoJob.query.get_or_404(id)
+    return jsonify(job.to_dict())
 
 @equipamentos_bp.route("/clear-all", methods=["POST"])
 @login_required
@@ -534,15 +482,17 @@ def clear_all_equipamentos():
         # 3. Apagar todos os equipamentos
         if equipamentos_count > 0:
             Equipamento.query.delete()
+            KpiService.zerar_contadores()
             deleted_items.append(f"{equipamentos_count} equipamentos")
         
-        # Resetar sequências de ID (SQLite)
-        try:
-            db.session.execute("DELETE FROM sqlite_sequence WHERE name='equipamentos'")
-            db.session.execute("DELETE FROM sqlite_sequence WHERE name='emprestimos'")
-            db.session.execute("DELETE FROM sqlite_sequence WHERE name='audit_logs'")
-        except:
-            pass  # Ignorar se não for SQLite
+        # Resetar sequências de ID (apenas SQLite; em PostgreSQL um erro aqui abortaria a transação)
+        if db.engine.dialect.name == 'sqlite':
+            try:
+                db.session.execute(text(
+                    "DELETE FROM sqlite_sequence WHERE name IN ('equipamentos', 'emprestimos', 'audit_logs')"
+                ))
+            except SQLAlchemyError:
+                pass  # Tabelas sem AUTOINCREMENT não têm sqlite_sequence
         
         db.session.commit()
         
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em disco das exportações (CSV, Excel, PDF)
+
+Cada arquivo gerado é guardado em ``instance/export_cache`` sob uma chave
+derivada de (formato, tipo de relatório, filtro de setor, versão dos
+dados, data). A versão é um contador em ``versao_dados`` incrementado na
+mesma transação de qualquer escrita em equipamentos, empréstimos ou
+manutenções; enquanto ela não muda, o arquivo é servido direto do disco
+com ETag. A data entra na chave porque o conteúdo também depende do dia
+(idade, depreciação, corte da manutenção, "Gerado em"): sem escritas, as
+entradas valem até a virada do dia.
+
+O cache não faz controle de acesso: quem chama ``servir`` verifica a
+permissão antes, já que um acerto não executa o gerador.
+
+A remoção é LRU pelo tamanho total (EXPORT_CACHE_MAX_MB): cada acerto
+atualiza o mtime do arquivo e os mais antigos saem primeiro.
+"""
+
+from datetime import date, datetime, timezone
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import uuid
+
+from flask import Response, current_app, send_file
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Emprestimo, Equipamento, Manutencao, VersaoDados
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = 'export_cache'
+# Faz parte da chave: incrementar quando o conteúdo gerado por algum formato mudar
+VERSAO_FORMATO = 2
+
+_MODELOS_VERSIONADOS = (Equipamento, Emprestimo, Manutencao)
+_VERSIONADAS = frozenset(modelo.__table__.name for modelo in _MODELOS_VERSIONADOS)
+
+
+def incrementar_versao(connection):
+    """Incrementa a versão dos dados na transação da conexão informada"""
+    tabela = VersaoDados.__table__
+    agora = datetime.now(timezone.utc)
+    dialeto = connection.dialect.name
+
+    if dialeto in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialeto == 'sqlite' else postgresql.insert
+        stmt = insert(tabela).values(id=1, versao=1, updated_at=agora).on_conflict_do_update(
+            index_elements=['id'], set_={'versao': tabela.c.versao + 1, 'updated_at': agora}
+        )
+        connection.execute(stmt)
+        return
+
+    resultado = connection.execute(
+        tabela.update().where(tabela.c.id == 1).values(versao=tabela.c.versao + 1, updated_at=agora)
+    )
+    if resultado.rowcount == 0:
+        connection.execute(tabela.insert().values(id=1, versao=1, updated_at=agora))
+
+
+@event.listens_for(Session, "after_flush")
+def _versao_apos_flush(session, flush_context):
+    if any(isinstance(obj, _MODELOS_VERSIONADOS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        incrementar_versao(session.connection())
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _versao_em_massa(orm_execute_state):
+    """Cobre query.delete()/update() e inserts em massa, que não passam pelo flush"""
+    em_massa = (orm_execute_state.is_update or orm_execute_state.is_delete
+                or getattr(orm_execute_state, 'is_insert', False))
+    mapper = orm_execute_state.bind_mapper
+    if em_massa and mapper is not None and mapper.local_table.name in _VERSIONADAS:
+        incrementar_versao(orm_execute_state.session.connection())
+
+
+class ExportCache:
+    """Cache de arquivos exportados, válido enquanto a versão dos dados não muda"""
+
+    @staticmethod
+    def versao_atual():
+        versao = db.session.execute(
+            select(VersaoDados.versao).where(VersaoDados.id == 1)
+        ).scalar()
+        return versao or 0
+
+    @staticmethod
+    def diretorio():
+        caminho = Path(current_app.instance_path) / CACHE_DIR
+        caminho.mkdir(parents=True, exist_ok=True)
+        return caminho
+
+    @staticmethod
+    def chave(formato, tipo, setor, versao, dia):
+        bruto = json.dumps([VERSAO_FORMATO, formato, tipo, setor or '', versao, dia.isoformat()])
+        return hashlib.sha1(bruto.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def servir(formato, tipo, setor, gerar):
+        """
+        Serve a exportação do cache ou gera e guarda o resultado
+
+        Args:
+            formato (str): csv, excel, pdf...
+            tipo (str): Tipo do relatório
+            setor (str): Filtro de setor efetivo (None = todos)
+            gerar (callable): Produz a Response quando não há cache
+
+        Returns:
+            Response: Arquivo do cache (com ETag) ou a resposta gerada,
+            gravada no cache enquanto é enviada
+        """
+        diretorio = ExportCache.diretorio()
+        chave = ExportCache.chave(formato, tipo, setor, ExportCache.versao_atual(), date.today())
+        arquivo = diretorio / f'{chave}.bin'
+        meta = diretorio / f'{chave}.json'
+
+        if arquivo.exists() and meta.exists():
+            try:
+                info = json.loads(meta.read_text(encoding='utf-8'))
+                os.utime(arquivo)
+                resposta = send_file(
+                    arquivo,
+                    mimetype=info['mimetype'],
+                    as_attachment=True,
+                    download_name=info['download_name'],
+                    etag=chave,
+                    conditional=True,
+                    max_age=0
+                )
+                resposta.headers['X-Export-Cache'] = 'HIT'
+                return resposta
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Entrada de cache de exportação inválida {chave}: {str(e)}")
+
+        resposta = gerar()
+        if resposta.status_code != 200:
+            return resposta
+
+        download_name = _nome_do_anexo(resposta) or f'{tipo}.{formato}'
+        limite = current_app.config.get('EXPORT_CACHE_MAX_MB', 200) * 1024 * 1024
+        info = {'mimetype': resposta.mimetype, 'download_name': download_name}
+
+        nova = Response(
+            _gravar_enquanto_envia(resposta, diretorio, chave, info, limite),
+            mimetype=resposta.mimetype,
+            headers={'Content-Disposition': resposta.headers.get('Content-Disposition', '')}
+        )
+        nova.set_etag(chave)
+        nova.headers['X-Export-Cache'] = 'MISS'
+        return nova
+
+    @staticmethod
+    def limpar():
+        """Remove todas as entradas (ex.: após restaurar um backup)"""
+        for caminho in ExportCache.diretorio().iterdir():
+            caminho.unlink(missing_ok=True)
+
+
+def _nome_do_anexo(resposta):
+    disposicao = resposta.headers.get('Content-Disposition', '')
+    for parte in disposicao.split(';'):
+        nome, _, valor = parte.strip().partition('=')
+        if nome == 'filename':
+            return valor.strip('"')
+    return None
+
+
+def _gravar_enquanto_envia(resposta, diretorio, chave, info, limite):
+    """Repassa os blocos ao cliente e grava uma cópia; só publica no cache se completar"""
+    temporario = diretorio / f'{chave}.{uuid.uuid4().hex}.tmp'
+    completo = False
+    try:
+        with open(temporario, 'wb') as destino:
+            for bloco in resposta.iter_encoded():
+                destino.write(bloco)
+                yield bloco
+        completo = True
+    finally:
+        resposta.close()
+        if completo:
+            os.replace(temporario, diretorio / f'{chave}.bin')
+            (diretorio / f'{chave}.json').write_text(json.dumps(info), encoding='utf-8')
+            _remover_excedente(diretorio, limite)
+        else:
+            temporario.unlink(missing_ok=True)
+
+
+def _remover_excedente(diretorio, limite):
+    """LRU: remove as entradas usadas há mais tempo até caber no limite"""
+    entradas = []
+    for caminho in diretorio.glob('*.bin'):
+        try:
+            estado = caminho.stat()
+        except OSError:
+            continue
+        entradas.append((estado.st_mtime, estado.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite:
+            break
+        caminho.unlink(missing_ok=True)
+        caminho.with_suffix('.json').unlink(missing_ok=True)
+        total -= tamanho
@@ -1,129 +1,259 @@
-from flask import Blueprint, make_response, request
+from flask import Blueprint, Response, request, send_file, stream_with_context
 from flask_login import login_required
-from io import BytesIO, StringIO
 import csv
 from datetime import datetime
+from itertools import chain, islice
+import tempfile
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.units import inch
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 from .models import Equipamento
+from .export_cache import ExportCache
+from .kpis import KpiService
 from . import db
 
 exports_bp = Blueprint("exports", __name__)
 
+CSV_CHUNK_ROWS = 500
+SPOOL_MAX = 8 * 1024 * 1024  # acima disso o arquivo temporário vai para o disco
+
+
+class _Eco:
+    """Destino do csv.writer que devolve a linha formatada em vez de acumulá-la"""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(cabecalho, linhas, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Gera o CSV em blocos de ``chunk_rows`` linhas
+
+    Usado com ``Response`` em streaming: o primeiro byte sai antes da
+    consulta terminar e só um bloco fica em memória por vez.
+    """
+    writer = csv.writer(_Eco())
+    bloco = [writer.writerow(cabecalho)]
+    for linha in linhas:
+        bloco.append(writer.writerow(linha))
+        if len(bloco) >= chunk_rows:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def resposta_csv(cabecalho, linhas, prefixo='equipamentos'):
+    """Response em streaming com as linhas geradas sob demanda"""
+    nome = f'{prefixo}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return Response(
+        stream_with_context(gerar_csv(cabecalho, linhas)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={nome}'}
+    )
+
+
+def consultar_em_fluxo(*colunas, yield_per=1000):
+    """Consulta com cursor no servidor (stream_results) lida em lotes de ``yield_per``"""
+    return db.session.query(*colunas).execution_options(stream_results=True, yield_per=yield_per)
+
+
+def _formatar_data(valor):
+    return valor.strftime('%d/%m/%Y %H:%M') if valor else ''
+
+
 @exports_bp.route("/export/csv")
 @login_required
 def export_csv():
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Cabeçalho
-    writer.writerow([
-        'ID', 'Nome', 'Categoria', 'Marca', 'Setor', 'Cargo', 
-        'Empréstimo', 'Compartilhado', 'AnyDesk', 'Observações', 
-        'Criado em', 'Atualizado em'
-    ])
-    
-    # Dados
-    for eq in Equipamento.query.yield_per(100):
-        writer.writerow([
-            eq.id,
-            eq.name_response,
-            eq.equipamento_category,
-            eq.marca_category,
-            eq.setor_category or '',
-            eq.cargo_category or '',
-            eq.emprestimo,
-            eq.equipamento_compartilhado,
-            eq.numero_anydesk or '',
-            eq.observacoes or '',
-            eq.created_at.strftime('%d/%m/%Y %H:%M') if eq.created_at else '',
-            eq.updated_at.strftime('%d/%m/%Y %H:%M') if eq.updated_at else ''
-        ])
-    
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=equipamentos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    
-    return response
+    return ExportCache.servir('csv', 'equipamentos', None, _export_csv)
 
-@exports_bp.route("/export/excel")
-@login_required
-def export_excel():
-    equipamentos = Equipamento.query.all()
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Equipamentos"
-    
-    # Cabeçalhos
-    headers = [
+
+def _export_csv():
+    cabecalho = [
         'ID', 'Nome', 'Categoria', 'Marca', 'Setor', 'Cargo', 
         'Empréstimo', 'Compartilhado', 'AnyDesk', 'Observações', 
         'Criado em', 'Atualizado em'
     ]
-    
-    # Estilo do cabeçalho
+    consulta = consultar_em_fluxo(
+        Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+        Equipamento.marca_category, Equipamento.setor_category, Equipamento.cargo_category,
+        Equipamento.emprestimo, Equipamento.equipamento_compartilhado, Equipamento.numero_anydesk,
+        Equipamento.observacoes, Equipamento.data_cadastro, Equipamento.updated_at
+    ).order_by(Equipamento.id)
+
+    linhas = (
+        [id_, nome, categoria, marca, setor or '', cargo or '', emprestimo, compartilhado,
+         anydesk or '', observacoes or '', _formatar_data(criado), _formatar_data(atualizado)]
+        for (id_, nome, categoria, marca, setor, cargo, emprestimo, compartilhado,
+             anydesk, observacoes, criado, atualizado) in consulta
+    )
+    return resposta_csv(cabecalho, linhas)
+
+XLSX_AMOSTRA_LARGURA = 200
+
+
+def gerar_xlsx(cabecalho, linhas, titulo="Equipamentos", amostra=XLSX_AMOSTRA_LARGURA):
+    """
+    Grava a planilha em modo write-only num arquivo temporário
+
+    As larguras das colunas são calculadas a partir das primeiras
+    ``amostra`` linhas (no modo write-only precisam ser definidas antes
+    da primeira linha).
+
+    Returns:
+        SpooledTemporaryFile: Arquivo posicionado no início
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo)
+
+    linhas = iter(linhas)
+    primeiras = list(islice(linhas, amostra))
+    larguras = [len(str(titulo_coluna)) for titulo_coluna in cabecalho]
+    for linha in primeiras:
+        for indice, valor in enumerate(linha[:len(larguras)]):
+            if valor is not None:
+                larguras[indice] = max(larguras[indice], len(str(valor)))
+    for indice, largura in enumerate(larguras, 1):
+        ws.column_dimensions[get_column_letter(indice)].width = min(largura + 2, 50)
+
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Adicionar cabeçalhos
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
+    celulas = []
+    for header in cabecalho:
+        cell = WriteOnlyCell(ws, value=header)
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = header_alignment
-    
-    # Adicionar dados
-    for row, eq in enumerate(equipamentos, 2):
-        ws.cell(row=row, column=1, value=eq.id)
-        ws.cell(row=row, column=2, value=eq.name_response)
-        ws.cell(row=row, column=3, value=eq.equipamento_category)
-        ws.cell(row=row, column=4, value=eq.marca_category)
-        ws.cell(row=row, column=5, value=eq.setor_category or '')
-        ws.cell(row=row, column=6, value=eq.cargo_category or '')
-        ws.cell(row=row, column=7, value=eq.emprestimo)
-        ws.cell(row=row, column=8, value=eq.equipamento_compartilhado)
-        ws.cell(row=row, column=9, value=eq.numero_anydesk or '')
-        ws.cell(row=row, column=10, value=eq.observacoes or '')
-        ws.cell(row=row, column=11, value=eq.created_at.strftime('%d/%m/%Y %H:%M') if eq.created_at else '')
-        ws.cell(row=row, column=12, value=eq.updated_at.strftime('%d/%m/%Y %H:%M') if eq.updated_at else '')
-    
-    # Ajustar largura das colunas
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            cell_value = str(cell.value) if cell.value is not None else ''
-            if len(cell_value) > max_length:
-                max_length = len(cell_value)
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Salvar em BytesIO
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    response.headers['Content-Disposition'] = f'attachment; filename=equipamentos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    return response
+        celulas.append(cell)
+    ws.append(celulas)
 
-@exports_bp.route("/export/pdf")
+    for linha in chain(primeiras, linhas):
+        ws.append(linha)
+
+    arquivo = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    wb.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
+
+
+@exports_bp.route("/export/excel")
 @login_required
-def export_pdf():
-    equipamentos = Equipamento.query.all()
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+def export_excel():
+    return ExportCache.servir('excel', 'equipamentos', None, _export_excel)
+
+
+def _export_excel():
+    cabecalho = [
+        'ID', 'Nome', 'Categoria', 'Marca', 'Setor', 'Cargo', 
+        'Empréstimo', 'Compartilhado', 'AnyDesk', 'Observações', 
+        'Criado em', 'Atualizado em'
+    ]
+    consulta = consultar_em_fluxo(
+        Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+        Equipamento.marca_category, Equipamento.setor_category, Equipamento.cargo_category,
+        Equipamento.emprestimo, Equipamento.equipamento_compartilhado, Equipamento.numero_anydesk,
+        Equipamento.observacoes, Equipamento.data_cadastro, Equipamento.updated_at
+    ).order_by(Equipamento.id)
+
+    linhas = (
+        [id_, nome, categoria, marca, setor or '', cargo or '', emprestimo, compartilhado,
+         anydesk or '', observacoes or '', _formatar_data(criado), _formatar_data(atualizado)]
+        for (id_, nome, categoria, marca, setor, cargo, emprestimo, compartilhado,
+             anydesk, observacoes, criado, atualizado) in consulta
+    )
+    arquivo = gerar_xlsx(cabecalho, linhas)
+
+    return send_file(
+        arquivo,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f'equipamentos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    )
+
+PDF_LINHAS_POR_TABELA = 40
+PDF_COLUNAS = [0.8*inch, 2.2*inch, 1.2*inch, 1.2*inch, 1*inch, 1*inch]
+PDF_CABECALHO = ['ID', 'Nome', 'Categoria', 'Marca', 'Status', 'Setor']
+
+STATUS_LABELS = {
+    'DISPONIVEL': 'Disponível',
+    'EM_USO': 'Em Uso',
+    'QUEBRADO': 'Quebrado',
+}
+
+# Estilo compartilhado por todas as tabelas do relatório (montado uma vez)
+PDF_TABELA_ESTILO = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+
+def _truncar(texto, limite):
+    if not texto:
+        return 'N/A'
+    return texto[:limite] + '...' if len(texto) > limite else texto
+
+
+def _linha_pdf(id_, nome, categoria, marca, emprestimo, setor):
+    return [
+        str(id_),
+        _truncar(nome, 25),
+        categoria or 'N/A',
+        _truncar(marca, 15),
+        STATUS_LABELS.get(emprestimo, 'Disponível'),
+        setor or 'N/A'
+    ]
+
+
+def _tabelas_pdf(linhas, linhas_por_tabela, cabecalho=PDF_CABECALHO, colunas=PDF_COLUNAS):
+    """Quebra as linhas em tabelas de tamanho fixo (o layout de cada uma é barato)"""
+    linhas = iter(linhas)
+    while True:
+        bloco = list(islice(linhas, linhas_por_tabela))
+        if not bloco:
+            return
+        tabela = Table([cabecalho] + bloco, colWidths=colunas, repeatRows=1)
+        tabela.setStyle(PDF_TABELA_ESTILO)
+        yield tabela
+
+
+def _rodape_kpis(totais):
+    return (f"Total de equipamentos: {totais['total']} | Em uso: {totais['em_uso']} | "
+            f"Quebrados: {totais['quebrados']} | Disponíveis: {totais['disponiveis']}")
+
+
+def gerar_pdf(linhas, rodape, destino, linhas_por_tabela=PDF_LINHAS_POR_TABELA,
+              titulo="Relatório de Equipamentos", cabecalho=PDF_CABECALHO, colunas=PDF_COLUNAS, pagesize=A4):
+    """
+    Gera um relatório tabular em PDF
+
+    Args:
+        linhas: Iterável de linhas já formatadas (mesma ordem do cabeçalho)
+        rodape: Texto do rodapé, ou função chamada depois de consumidas as linhas
+        destino: Arquivo binário onde o PDF é gravado
+        linhas_por_tabela (int): Linhas por tabela (None = uma tabela única)
+        titulo (str): Título do documento
+        cabecalho (list): Títulos das colunas
+        colunas (list): Larguras das colunas (None = divide a largura útil igualmente)
+        pagesize: Tamanho da página do reportlab
+    """
+    doc = SimpleDocTemplate(destino, pagesize=pagesize, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    if colunas is None:
+        colunas = [doc.width / len(cabecalho)] * len(cabecalho)
     
     # Estilos
     styles = getSampleStyleSheet()
@@ -134,80 +264,104 @@ def export_pdf():
         spaceAfter=30,
         alignment=1  # Center
     )
-    
-    # Conteúdo
-    story = []
-    
-    # Título
-    title = Paragraph("Relatório de Equipamentos", title_style)
-    story.append(title)
-    story.append(Spacer(1, 12))
-    
-    # Data de geração
     date_style = ParagraphStyle(
         'DateStyle',
         parent=styles['Normal'],
         fontSize=10,
         alignment=1
     )
-    date_text = Paragraph(f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", date_style)
-    story.append(date_text)
-    story.append(Spacer(1, 20))
-    
-    # Tabela
-    data = [['ID', 'Nome', 'Categoria', 'Marca', 'Status', 'Setor']]
     
-    for eq in equipamentos:
-        status = "Em Uso" if eq.emprestimo == 'SIM' else "Disponível"
-        try:
-            name = eq.name_response[:25] + '...' if len(eq.name_response) > 25 else eq.name_response
-        except (AttributeError, TypeError):
-            name = 'N/A'
-        try:
-            marca = eq.marca_category[:15] + '...' if len(eq.marca_category) > 15 else eq.marca_category
-        except (AttributeError, TypeError):
-            marca = 'N/A'
-        
-        data.append([
-            str(eq.id),
-            name,
-            eq.equipamento_category or 'N/A',
-            marca,
-            status,
-            eq.setor_category or 'N/A'
-        ])
-    
-    table = Table(data, colWidths=[0.8*inch, 2.2*inch, 1.2*inch, 1.2*inch, 1*inch, 1*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
+    story = [
+        Paragraph(titulo, title_style),
+        Spacer(1, 12),
+        Paragraph(f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", date_style),
+        Spacer(1, 20)
+    ]
     
-    story.append(table)
+    if linhas_por_tabela:
+        story.extend(_tabelas_pdf(linhas, linhas_por_tabela, cabecalho, colunas))
+    else:
+        tabela = Table([cabecalho] + list(linhas), colWidths=colunas, repeatRows=1)
+        tabela.setStyle(PDF_TABELA_ESTILO)
+        story.append(tabela)
     
     # Rodapé com estatísticas
-    story.append(Spacer(1, 20))
-    total = len(equipamentos)
-    em_uso = len([eq for eq in equipamentos if eq.emprestimo == 'SIM'])
-    disponiveis = total - em_uso
-    
-    stats_text = f"Total de equipamentos: {total} | Em uso: {em_uso} | Disponíveis: {disponiveis}"
-    stats_para = Paragraph(stats_text, styles['Normal'])
-    story.append(stats_para)
+    texto = rodape() if callable(rodape) else rodape
+    if texto:
+        story.append(Spacer(1, 20))
+        story.append(Paragraph(texto, styles['Normal']))
     
     doc.build(story)
-    buffer.seek(0)
-    
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=equipamentos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-    
-    return response
\ No newline at end of file
+
+
+@exports_bp.route("/export/pdf")
+@login_required
+def export_pdf():
+    return ExportCache.servir('pdf', 'equipamentos', None, _export_pdf)
+
+
+def _export_pdf():
+    consulta = consultar_em_fluxo(
+        Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+        Equipamento.marca_category, Equipamento.emprestimo, Equipamento.setor_category
+    ).order_by(Equipamento.id)
+    linhas = (_linha_pdf(*linha) for linha in consulta)
+
+    arquivo = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    gerar_pdf(linhas, _rodape_kpis(KpiService.get_equipamento_kpis()), arquivo)
+    arquivo.seek(0)
+
+    return send_file(
+        arquivo,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'equipamentos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+    )
+
+
+def benchmark_pdf(tamanhos=(1000, 2000, 5000, 10000), tabela_unica=True):
+    """
+    Mede o tempo de geração do PDF por número de linhas (dados sintéticos)
+
+    Returns:
+        list: Dicts com linhas, modo e segundos
+    """
+    import time
+
+    resultados = []
+    modos = [('tabelas', PDF_LINHAS_POR_TABELA)]
+    if tabela_unica:
+        modos.append(('tabela_unica', None))
+
+    for tamanho in tamanhos:
+        linhas = [
+            _linha_pdf(i, f'Equipamento {i:06d}', 'NOTEBOOK', 'Dell', 'EM_USO' if i % 3 else 'DISPONIVEL', 'TI')
+            for i in range(1, tamanho + 1)
+        ]
+        totais = {'total': tamanho, 'em_uso': 0, 'quebrados': 0, 'disponiveis': tamanho}
+        for modo, linhas_por_tabela in modos:
+            inicio = time.perf_counter()
+            with tempfile.TemporaryFile() as destino:
+                gerar_pdf(linhas, _rodape_kpis(totais), destino, linhas_por_tabela=linhas_por_tabela)
+            resultados.append({'linhas': tamanho, 'modo': modo, 'segundos': time.perf_counter() - inicio})
+    return resultados
+
+
+def main(argv=None):
+    import sys
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ['benchmark']:
+        print("Uso: python -m app.exports benchmark [linhas ...] [--sem-tabela-unica]")
+        return 2
+
+    tabela_unica = '--sem-tabela-unica' not in argv
+    tamanhos = [int(arg) for arg in argv[1:] if arg.isdigit()] or (1000, 2000, 5000, 10000)
+    print(f"{'linhas':>8}  {'modo':<14}{'segundos':>10}{'ms/linha':>10}")
+    for r in benchmark_pdf(tamanhos, tabela_unica=tabela_unica):
+        print(f"{r['linhas']:>8}  {r['modo']:<14}{r['segundos']:>10.2f}{1000 * r['segundos'] / r['linhas']:>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
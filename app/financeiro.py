@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Resumo financeiro do patrimônio calculado no banco
+
+Somas de valor de aquisição, contagens com/sem valor informado e faixas de
+idade (a partir de ``data_aquisicao``) saem de uma única consulta agrupada
+por setor e categoria. O índice ``ix_equipamentos_financeiro`` cobre
+todas as colunas usadas, então o banco agrega lendo só o índice e o Python
+apenas consolida algumas centenas de grupos.
+
+O valor estimado dos equipamentos sem valor informado usa as mesmas
+estimativas por categoria do cálculo de depreciação.
+"""
+
+from datetime import date
+
+from sqlalchemy import case, func
+
+from . import db
+from .depreciacao import ESTIMATIVA_PADRAO, ESTIMATIVAS_CATEGORIA
+from .models import Equipamento
+
+# Idade em anos que delimita cada faixa; a última faixa não tem limite
+LIMITES_FAIXAS = (1, 3, 5)
+FAIXAS_IDADE = ('ATE_1_ANO', '1_A_3_ANOS', '3_A_5_ANOS', 'MAIS_DE_5_ANOS')
+FAIXA_SEM_DATA = 'SEM_DATA'
+
+
+def _anos_atras(hoje, anos):
+    try:
+        return hoje.replace(year=hoje.year - anos)
+    except ValueError:  # 29/02
+        return hoje.replace(year=hoje.year - anos, day=28)
+
+
+def _contar_se(condicao):
+    return func.sum(case((condicao, 1), else_=0))
+
+
+def _grupo_vazio():
+    return {
+        'quantidade': 0, 'com_valor': 0, 'sem_valor': 0, 'valor_aquisicao': 0.0, 'valor_estimado': 0.0,
+        'faixas_idade': dict.fromkeys(FAIXAS_IDADE + (FAIXA_SEM_DATA,), 0),
+    }
+
+
+class FinanceiroService:
+    """Totais financeiros agregados por setor, categoria e idade"""
+
+    @staticmethod
+    def consulta(setor=None, hoje=None):
+        """
+        Monta (sem executar) a consulta agrupada por setor e categoria
+
+        As faixas de idade são contagens condicionais acumuladas
+        (``data_aquisicao`` depois de cada data de corte), o que mantém o
+        GROUP BY na ordem do índice, sem ordenação temporária. Também é a
+        consulta usada no relatório de planos do migrate_db.
+
+        Args:
+            setor (str): Restringe a um setor (None = todos)
+            hoje (date): Data de referência das faixas de idade
+
+        Returns:
+            Query: Linhas (setor, categoria, quantidade, com_valor, soma_valor,
+            com_data, *recentes) — ``recentes`` traz uma contagem por limite
+            de LIMITES_FAIXAS
+        """
+        hoje = hoje or date.today()
+        data = Equipamento.data_aquisicao
+        tem_valor = Equipamento.valor_aquisicao > 0
+        consulta = db.session.query(
+            Equipamento.setor_category,
+            Equipamento.equipamento_category,
+            func.count(),
+            _contar_se(tem_valor),
+            func.sum(case((tem_valor, Equipamento.valor_aquisicao), else_=0)),
+            func.count(data),
+            *(_contar_se(data > _anos_atras(hoje, anos)) for anos in LIMITES_FAIXAS)
+        )
+        if setor:
+            consulta = consulta.filter(Equipamento.setor_category == setor)
+        return consulta.group_by(Equipamento.setor_category, Equipamento.equipamento_category)
+
+    @staticmethod
+    def agrupar(setor=None, hoje=None):
+        """Executa FinanceiroService.consulta e devolve a lista de tuplas"""
+        return FinanceiroService.consulta(setor, hoje).all()
+
+    @staticmethod
+    def resumo(setor=None, hoje=None):
+        """
+        Resumo financeiro com totais e quebras por setor e categoria
+
+        Args:
+            setor (str): Restringe a um setor (None = todos)
+            hoje (date): Data de referência das faixas de idade
+
+        Returns:
+            dict: {"totais", "por_setor", "por_categoria"}; cada grupo traz
+            quantidade, com_valor, sem_valor, valor_aquisicao (só valores
+            informados), valor_estimado (sem valor, pela categoria) e
+            faixas_idade (quantidade por faixa)
+        """
+        totais = _grupo_vazio()
+        por_setor = {}
+        por_categoria = {}
+
+        for setor_linha, categoria, quantidade, com_valor, soma, com_data, *recentes in \
+                FinanceiroService.agrupar(setor, hoje):
+            com_valor = int(com_valor or 0)
+            soma = float(soma or 0)
+            estimado = (quantidade - com_valor) * ESTIMATIVAS_CATEGORIA.get(categoria, ESTIMATIVA_PADRAO)
+            # Contagens acumuladas -> quantidade em cada faixa
+            acumulado = [int(n or 0) for n in recentes] + [com_data]
+            faixas = dict(zip(FAIXAS_IDADE, (n - anterior for n, anterior in zip(acumulado, [0] + acumulado))))
+            faixas[FAIXA_SEM_DATA] = quantidade - com_data
+
+            for destino in (
+                totais,
+                por_setor.setdefault(setor_linha or 'SEM_SETOR', _grupo_vazio()),
+                por_categoria.setdefault(categoria or 'SEM_CATEGORIA', _grupo_vazio()),
+            ):
+                destino['quantidade'] += quantidade
+                destino['com_valor'] += com_valor
+                destino['sem_valor'] += quantidade - com_valor
+                destino['valor_aquisicao'] += soma
+                destino['valor_estimado'] += estimado
+                for faixa, n in faixas.items():
+                    destino['faixas_idade'][faixa] += n
+
+        return {
+            'totais': totais,
+            'por_setor': por_setor,
+            'por_categoria': por_categoria,
+        }
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Importação em massa de equipamentos
+
+O arquivo é lido linha a linha (sem carregar tudo em memória), cada linha é
+validada contra as opções dos ``db.Enum`` do modelo e os nomes duplicados
+são descartados antes do INSERT, comparando com um conjunto carregado em
+uma única query. As linhas válidas são gravadas com ``bulk_insert_mappings``
+em lotes grandes (executemany).
+
+Planilhas .xlsx são lidas em modo streaming pelo openpyxl, com o mesmo
+cabeçalho do CSV. O resultado traz um relatório por linha com os erros
+encontrados.
+
+Uploads grandes viram jobs (``ImportacaoJob``) processados por um pool de
+threads local; o progresso (linhas processadas, erros, ETA) é gravado após
+cada lote e consultado pela página de acompanhamento. O pool vive no
+processo: se o worker é reiniciado, o job para de avançar e, passado
+IMPORT_JOB_TIMEOUT sem progresso, é marcado como FALHA (na inicialização e
+ao consultar o job).
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from datetime import datetime, timedelta, timezone
+import io
+import json
+import logging
+from pathlib import Path
+import uuid
+from zipfile import BadZipFile
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .autocomplete import autocomplete_index
+from .constants import IMPORT_JOB_TIMEOUT, IMPORT_MAX_ERROS_REGISTRADOS, IMPORT_WORKERS
+from .export_cache import incrementar_versao
+from .kpis import _chave, aplicar_deltas
+from .models import Equipamento, ImportacaoJob
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 5000
+
+# Cabeçalho do arquivo -> coluna do modelo (mesmo layout da exportação CSV)
+COLUNAS_IMPORTACAO = {
+    'Nome': 'name_response',
+    'Categoria': 'equipamento_category',
+    'Marca': 'marca_category',
+    'Setor': 'setor_category',
+    'Cargo': 'cargo_category',
+    'Emprestimo': 'emprestimo',
+    'Compartilhado': 'equipamento_compartilhado',
+    'AnyDesk': 'numero_anydesk',
+    'Observacoes': 'observacoes',
+}
+
+# Valores usados quando a coluna vem vazia
+_PADROES = {
+    'equipamento_category': 'NOTEBOOK',
+    'marca_category': 'Sem marca',
+    'emprestimo': 'DISPONIVEL',
+    'equipamento_compartilhado': 'NAO',
+}
+
+
+def _opcoes_enum(campo):
+    return frozenset(Equipamento.__table__.c[campo].type.enums)
+
+
+_ENUMS = {
+    campo: _opcoes_enum(campo)
+    for campo in ('setor_category', 'cargo_category', 'equipamento_category',
+                  'emprestimo', 'equipamento_compartilhado')
+}
+
+
+def _tamanho_maximo(campo):
+    return getattr(Equipamento.__table__.c[campo].type, 'length', None)
+
+
+_TAMANHOS = {
+    campo: _tamanho_maximo(campo)
+    for campo in ('name_response', 'marca_category', 'numero_anydesk')
+}
+
+
+class ResultadoImportacao:
+    """Totais e relatório de erros por linha de uma importação"""
+
+    def __init__(self):
+        self.importados = 0
+        self.processados = 0
+        self.erros = []
+
+    def adicionar_erro(self, linha, mensagem):
+        self.erros.append({'linha': linha, 'erro': mensagem})
+
+    @property
+    def mensagens_erro(self):
+        return [f"Linha {e['linha']}: {e['erro']}" for e in self.erros]
+
+    def to_dict(self):
+        return {
+            'importados': self.importados,
+            'processados': self.processados,
+            'erros': self.erros
+        }
+
+
+def ler_csv(stream):
+    """
+    Itera as linhas de um CSV como dicts, decodificando sob demanda
+
+    Aceita UTF-8 com ou sem BOM. Erros de encoding sobem como
+    UnicodeDecodeError durante a iteração.
+    """
+    texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.DictReader(texto)
+    finally:
+        texto.detach()
+
+
+def ler_xlsx(stream):
+    """
+    Itera as linhas da primeira planilha de um .xlsx como dicts
+
+    Usa o modo ``read_only`` do openpyxl, que lê as linhas sob demanda do
+    XML da planilha. A primeira linha é o cabeçalho.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        linhas = workbook.worksheets[0].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        cabecalho = [_texto(celula) for celula in cabecalho]
+        for valores in linhas:
+            yield dict(zip(cabecalho, valores))
+    finally:
+        workbook.close()
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    return str(valor).strip()
+
+
+def validar_linha(row):
+    """
+    Converte uma linha do arquivo em mapping de Equipamento
+
+    Returns:
+        tuple: (mapping, None) ou (None, mensagem de erro)
+    """
+    valores = {}
+    for cabecalho, campo in COLUNAS_IMPORTACAO.items():
+        valor = _texto(row.get(cabecalho))
+        if campo in _ENUMS:
+            valor = valor.upper()
+        valores[campo] = valor or _PADROES.get(campo)
+
+    if not valores['name_response']:
+        return None, "Nome é obrigatório"
+
+    for campo, opcoes in _ENUMS.items():
+        valor = valores[campo]
+        if valor is not None and valor not in opcoes:
+            return None, f"Valor inválido '{valor}' para {campo}"
+
+    for campo, tamanho in _TAMANHOS.items():
+        valor = valores[campo]
+        if tamanho and valor and len(valor) > tamanho:
+            return None, f"{campo} excede {tamanho} caracteres"
+
+    return valores, None
+
+
+def importar_equipamentos(linhas, usuario_id, batch_size=IMPORT_BATCH_SIZE, progresso=None):
+    """
+    Importa equipamentos a partir de um iterável de linhas (dicts)
+
+    Cada lote é confirmado separadamente; uma falha de banco em um lote
+    marca suas linhas como erro e a importação segue com os próximos.
+
+    Args:
+        linhas: Iterável de dicts com os cabeçalhos de COLUNAS_IMPORTACAO
+        usuario_id (int): Usuário registrado em created_by/updated_by
+        batch_size (int): Linhas por INSERT em massa
+        progresso (callable): Chamado com o resultado parcial após cada lote
+
+    Returns:
+        ResultadoImportacao: Totais e erros por linha
+    """
+    resultado = ResultadoImportacao()
+    existentes = {nome for (nome,) in db.session.query(Equipamento.name_response)}
+    lote = []
+
+    for row_num, row in enumerate(linhas, start=2):
+        if not any(_texto(valor) for valor in row.values()):
+            continue
+        resultado.processados += 1
+        mapping, erro = validar_linha(row)
+        if erro:
+            resultado.adicionar_erro(row_num, erro)
+            continue
+        if mapping['name_response'] in existentes:
+            resultado.adicionar_erro(row_num, f"Equipamento '{mapping['name_response']}' já existe")
+            continue
+
+        existentes.add(mapping['name_response'])
+        mapping['created_by'] = usuario_id
+        mapping['updated_by'] = usuario_id
+        lote.append((row_num, mapping))
+
+        if len(lote) >= batch_size:
+            _gravar_lote(lote, resultado)
+            lote = []
+            if progresso:
+                progresso(resultado)
+
+    if lote:
+        _gravar_lote(lote, resultado)
+    if progresso:
+        progresso(resultado)
+    return resultado
+
+
+def _gravar_lote(lote, resultado):
+    """Insere um lote e atualiza os contadores de KPI na mesma transação"""
+    mappings = [mapping for _, mapping in lote]
+    deltas = Counter(
+        _chave(m['setor_category'], m['equipamento_category'], m['emprestimo']) for m in mappings
+    )
+    try:
+        # bulk_insert_mappings não passa pelo flush: contadores, versão dos dados e autocomplete são tratados aqui
+        db.session.bulk_insert_mappings(Equipamento, mappings)
+        aplicar_deltas(db.session.connection(), deltas)
+        incrementar_versao(db.session.connection())
+        db.session.commit()
+        resultado.importados += len(mappings)
+        autocomplete_index.invalidar()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Erro ao gravar lote de importação: {str(e)}")
+        for row_num, _ in lote:
+            resultado.adicionar_erro(row_num, "Erro ao gravar no banco de dados")
+
+
+# =====================================================
+# JOBS EM SEGUNDO PLANO
+# =====================================================
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix='importacao')
+
+_LEITORES = {'.csv': ler_csv, '.xlsx': ler_xlsx}
+
+
+def _diretorio_uploads():
+    caminho = Path(current_app.instance_path) / current_app.config['UPLOAD_FOLDER'] / 'importacoes'
+    caminho.mkdir(parents=True, exist_ok=True)
+    return caminho
+
+
+def estimar_linhas(caminho):
+    """Estimativa barata do número de linhas de dados (para o ETA)"""
+    if caminho.suffix == '.xlsx':
+        from openpyxl import load_workbook
+        try:
+            workbook = load_workbook(caminho, read_only=True)
+        except (BadZipFile, OSError, KeyError):
+            return None
+        try:
+            max_row = workbook.worksheets[0].max_row
+        finally:
+            workbook.close()
+        return max(0, max_row - 1) if max_row else None
+
+    linhas = 0
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+            linhas += bloco.count(b'\n')
+    return max(0, linhas - 1)
+
+
+class ImportJobService:
+    """Submissão e execução de importações em segundo plano"""
+
+    @staticmethod
+    def submeter(file, usuario_id):
+        """
+        Salva o upload em disco, registra o job e o envia ao pool de workers
+
+        Args:
+            file: FileStorage com extensão .csv ou .xlsx
+            usuario_id (int): Administrador que enviou o arquivo
+
+        Returns:
+            ImportacaoJob: Job recém-criado (status PENDENTE)
+        """
+        extensao = Path(file.filename).suffix.lower()
+        caminho = _diretorio_uploads() / f"{uuid.uuid4().hex}{extensao}"
+        file.save(caminho)
+
+        job = ImportacaoJob(
+            arquivo_nome=file.filename,
+            arquivo=str(caminho),
+            status='PENDENTE',
+            criado_por=usuario_id
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        _executor.submit(_executar_job, current_app._get_current_object(), job.id)
+        logger.info(f"Importação {job.id} enfileirada: {file.filename}")
+        return job
+
+    @staticmethod
+    def erros(job):
+        """Linhas rejeitadas registradas no job"""
+        return json.loads(job.erros) if job.erros else []
+
+    @staticmethod
+    def marcar_abandonados(job_id=None, timeout=IMPORT_JOB_TIMEOUT):
+        """
+        Marca como FALHA os jobs não finalizados que não avançam há ``timeout`` segundos
+
+        Cobre workers reiniciados no meio da importação: o job fica em
+        PENDENTE/PROCESSANDO sem ninguém para terminá-lo. Usa o tempo sem
+        progresso (e não "todo job aberto") porque outros workers podem estar
+        processando os seus.
+
+        Args:
+            job_id (int): Verifica só este job (None = todos)
+            timeout (int): Segundos sem progresso
+
+        Returns:
+            int: Jobs marcados
+        """
+        # Colunas DateTime sem fuso (UTC)
+        limite = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=timeout)
+        consulta = ImportacaoJob.query.filter(
+            ImportacaoJob.status.in_(('PENDENTE', 'PROCESSANDO')),
+            db.func.coalesce(ImportacaoJob.atualizado_at, ImportacaoJob.created_at) < limite
+        )
+        if job_id is not None:
+            consulta = consulta.filter(ImportacaoJob.id == job_id)
+
+        jobs = consulta.all()
+        for job in jobs:
+            if job.arquivo:
+                Path(job.arquivo).unlink(missing_ok=True)
+            job.arquivo = None
+            job.status = 'FALHA'
+            job.erro_mensagem = "Importação interrompida: o servidor foi reiniciado antes de concluir. Envie o arquivo novamente"
+            job.concluido_at = datetime.now(timezone.utc)
+            logger.warning(f"Importação {job.id} abandonada (sem progresso há mais de {timeout}s)")
+        if jobs:
+            db.session.commit()
+        return len(jobs)
+
+
+def _executar_job(app, job_id):
+    with app.app_context():
+        job = db.session.get(ImportacaoJob, job_id)
+        if job is None or job.status != 'PENDENTE' or not job.arquivo:
+            # Já dado como abandonado enquanto esperava na fila
+            db.session.remove()
+            return
+        caminho = Path(job.arquivo)
+        try:
+            job.status = 'PROCESSANDO'
+            job.iniciado_at = datetime.now(timezone.utc)
+            job.total_estimado = estimar_linhas(caminho)
+            db.session.commit()
+
+            def progresso(resultado):
+                job.processados = resultado.processados
+                job.importados = resultado.importados
+                job.total_erros = len(resultado.erros)
+                db.session.commit()
+
+            with open(caminho, 'rb') as arquivo:
+                resultado = importar_equipamentos(
+                    _LEITORES[caminho.suffix](arquivo), job.criado_por, progresso=progresso
+                )
+
+            job.status = 'CONCLUIDO'
+            job.erros = json.dumps(resultado.erros[:IMPORT_MAX_ERROS_REGISTRADOS], ensure_ascii=False)
+            logger.info(f"Importação {job_id} concluída: {resultado.importados} importados, "
+                        f"{len(resultado.erros)} erros")
+        except Exception as e:
+            db.session.rollback()
+            if isinstance(e, UnicodeDecodeError):
+                job.erro_mensagem = "Erro ao ler arquivo: encoding inválido. Use UTF-8"
+                logger.warning(f"Importação {job_id} com encoding inválido")
+            elif isinstance(e, BadZipFile):
+                job.erro_mensagem = "Erro ao ler arquivo Excel: arquivo .xlsx inválido"
+                logger.warning(f"Importação {job_id} com arquivo .xlsx inválido")
+            else:
+                job.erro_mensagem = "Erro ao processar arquivo"
+                logger.error(f"Erro na importação {job_id}: {str(e)}", exc_info=True)
+            job.status = 'FALHA'
+        finally:
+            job.concluido_at = datetime.now(timezone.utc)
+            job.arquivo = None
+            db.session.commit()
+            caminho.unlink(missing_ok=True)
+            db.session.remove()
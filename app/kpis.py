@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+KPIs de equipamentos compartilhados entre dashboard, listagem, relatórios e manutenção
+
+Os totais por (setor, categoria, status) ficam materializados em
+``kpi_contadores`` e são atualizados na mesma transação de cada escrita em
+equipamentos (via eventos da sessão). Assim a leitura dos KPIs não depende
+do tamanho do inventário.
+
+Uso pela linha de comando:
+    python -m app.kpis verify    # compara contadores com a tabela de equipamentos
+    python -m app.kpis rebuild   # recalcula todos os contadores
+"""
+
+from collections import Counter
+from datetime import datetime, timezone
+import logging
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Equipamento, KpiContador
+
+logger = logging.getLogger(__name__)
+
+_CAMPOS_CHAVE = ('setor_category', 'equipamento_category', 'emprestimo')
+_DELTAS_KEY = 'kpi_contadores_deltas'
+
+
+def _chave(setor, categoria, status):
+    """Normaliza a chave do contador (NULL vira '' para caber na constraint única)"""
+    return (setor or '', categoria or '', status or '')
+
+
+def _valor_padrao(campo):
+    default = Equipamento.__table__.c[campo].default
+    return default.arg if default is not None and default.is_scalar else None
+
+
+def _chave_nova(eq):
+    """Chave de um equipamento pendente de INSERT, aplicando os defaults das colunas"""
+    valores = []
+    for campo in _CAMPOS_CHAVE:
+        valor = getattr(eq, campo)
+        valores.append(valor if valor is not None else _valor_padrao(campo))
+    return _chave(*valores)
+
+
+def _chave_anterior(eq):
+    """Chave do equipamento como está no banco (antes das alterações pendentes)"""
+    estado = inspect(eq)
+    valores = []
+    for campo in _CAMPOS_CHAVE:
+        historico = estado.attrs[campo].history
+        if historico.deleted:
+            valores.append(historico.deleted[0])
+        elif historico.unchanged:
+            valores.append(historico.unchanged[0])
+        else:
+            valores.append(getattr(eq, campo))
+    return _chave(*valores)
+
+
+def _chave_atual(eq):
+    return _chave(*(getattr(eq, campo) for campo in _CAMPOS_CHAVE))
+
+
+@event.listens_for(Session, "before_flush")
+def _calcular_deltas(session, flush_context, instances):
+    """Calcula as variações dos contadores enquanto o estado anterior ainda é conhecido"""
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Equipamento):
+            deltas[_chave_nova(obj)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Equipamento):
+            deltas[_chave_anterior(obj)] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Equipamento) and session.is_modified(obj, include_collections=False):
+            antes, depois = _chave_anterior(obj), _chave_atual(obj)
+            if antes != depois:
+                deltas[antes] -= 1
+                deltas[depois] += 1
+    if deltas:
+        session.info.setdefault(_DELTAS_KEY, Counter()).update(deltas)
+
+
+@event.listens_for(Session, "after_flush")
+def _aplicar_deltas_pendentes(session, flush_context):
+    """Aplica as variações na mesma transação do flush (rollback desfaz ambos)"""
+    deltas = session.info.pop(_DELTAS_KEY, None)
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_deltas(session):
+    session.info.pop(_DELTAS_KEY, None)
+
+
+def aplicar_deltas(connection, deltas):
+    """
+    Soma as variações aos contadores (upsert por chave)
+
+    Args:
+        connection: Conexão da transação corrente
+        deltas (dict): {(setor, categoria, status): variação}
+    """
+    tabela = KpiContador.__table__
+    agora = datetime.now(timezone.utc)
+    dialeto = connection.dialect.name
+
+    for (setor, categoria, status), delta in deltas.items():
+        if not delta:
+            continue
+        valores = dict(setor=setor, categoria=categoria, status=status, total=delta, updated_at=agora)
+
+        if dialeto in ('sqlite', 'postgresql'):
+            insert = sqlite.insert if dialeto == 'sqlite' else postgresql.insert
+            stmt = insert(tabela).values(**valores)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['setor', 'categoria', 'status'],
+                set_={'total': tabela.c.total + delta, 'updated_at': agora}
+            )
+            connection.execute(stmt)
+            continue
+
+        result = connection.execute(
+            tabela.update()
+            .where(tabela.c.setor == setor, tabela.c.categoria == categoria, tabela.c.status == status)
+            .values(total=tabela.c.total + delta, updated_at=agora)
+        )
+        if result.rowcount == 0:
+            connection.execute(tabela.insert().values(**valores))
+
+
+class KpiService:
+    """Serviço de indicadores agregados de equipamentos"""
+
+    @staticmethod
+    def contar_por_status(setor=None):
+        """
+        Conta equipamentos por status de empréstimo
+
+        Lê os contadores materializados; se ainda não houver contadores
+        (banco recém-migrado), recorre a uma única query agrupada.
+
+        Args:
+            setor (str): Restringe a contagem a um setor (None = todos)
+
+        Returns:
+            dict: {status: quantidade}
+        """
+        linhas = db.session.query(
+            KpiContador.setor, KpiContador.status, func.sum(KpiContador.total)
+        ).group_by(KpiContador.setor, KpiContador.status).all()
+
+        if linhas:
+            contagem = Counter()
+            for setor_linha, status, total in linhas:
+                if setor is None or setor_linha == setor:
+                    contagem[status or None] += int(total or 0)
+            return dict(contagem)
+
+        query = db.session.query(Equipamento.emprestimo, func.count(Equipamento.id))
+        if setor:
+            query = query.filter(Equipamento.setor_category == setor)
+        return {status: total for status, total in query.group_by(Equipamento.emprestimo).all()}
+
+    @staticmethod
+    def get_equipamento_kpis(setor=None):
+        """
+        Retorna total, em uso, quebrados e disponíveis
+
+        Disponíveis inclui tudo que não está em uso nem quebrado (inclusive
+        registros legados sem status), como a listagem sempre considerou.
+
+        Args:
+            setor (str): Restringe os KPIs a um setor (None = todos)
+
+        Returns:
+            dict: {"total", "em_uso", "quebrados", "disponiveis"}
+        """
+        contagem = KpiService.contar_por_status(setor)
+        total = sum(contagem.values())
+        em_uso = contagem.get('EM_USO', 0)
+        quebrados = contagem.get('QUEBRADO', 0)
+        return {
+            "total": total,
+            "em_uso": em_uso,
+            "quebrados": quebrados,
+            "disponiveis": total - em_uso - quebrados
+        }
+
+    @staticmethod
+    def setor_do_usuario(user):
+        """Setor ao qual os KPIs devem ser restritos para o usuário (None = todos)"""
+        if user.role != 'ADMIN' and user.setor:
+            return user.setor
+        return None
+
+    @staticmethod
+    def contagem_real():
+        """Contagem atual calculada diretamente na tabela de equipamentos"""
+        linhas = db.session.query(
+            Equipamento.setor_category,
+            Equipamento.equipamento_category,
+            Equipamento.emprestimo,
+            func.count(Equipamento.id)
+        ).group_by(
+            Equipamento.setor_category, Equipamento.equipamento_category, Equipamento.emprestimo
+        ).all()
+        contagem = Counter()
+        for setor, categoria, status, total in linhas:
+            contagem[_chave(setor, categoria, status)] += total
+        return contagem
+
+    @staticmethod
+    def zerar_contadores():
+        """Remove todos os contadores (usar na mesma transação de exclusões em massa)"""
+        db.session.execute(KpiContador.__table__.delete())
+
+    @staticmethod
+    def verificar_contadores():
+        """
+        Compara os contadores materializados com a tabela de equipamentos
+
+        Returns:
+            list: Divergências como dicts {setor, categoria, status, contador, real}
+        """
+        real = KpiService.contagem_real()
+        materializado = Counter()
+        for contador in KpiContador.query.all():
+            materializado[(contador.setor, contador.categoria, contador.status)] += contador.total
+
+        divergencias = []
+        for chave in sorted(set(real) | set(materializado)):
+            if real.get(chave, 0) != materializado.get(chave, 0):
+                setor, categoria, status = chave
+                divergencias.append({
+                    'setor': setor,
+                    'categoria': categoria,
+                    'status': status,
+                    'contador': materializado.get(chave, 0),
+                    'real': real.get(chave, 0)
+                })
+        return divergencias
+
+    @staticmethod
+    def reconstruir_contadores():
+        """Recalcula todos os contadores a partir da tabela de equipamentos"""
+        KpiService.zerar_contadores()
+        aplicar_deltas(db.session.connection(), KpiService.contagem_real())
+        db.session.commit()
+        logger.info("Contadores de KPI reconstruídos")
+
+
+def main(argv=None):
+    import sys
+    from . import create_app
+
+    argv = sys.argv[1:] if argv is None else argv
+    comando = argv[0] if argv else 'verify'
+    if comando not in ('verify', 'rebuild'):
+        print("Uso: python -m app.kpis [verify|rebuild]")
+        return 2
+
+    app = create_app()
+    with app.app_context():
+        if comando == 'rebuild':
+            KpiService.reconstruir_contadores()
+            print("Contadores reconstruídos.")
+            return 0
+
+        divergencias = KpiService.verificar_contadores()
+        if not divergencias:
+            print("Contadores consistentes.")
+            return 0
+        for d in divergencias:
+            print(f"{d['setor'] or '-'} / {d['categoria'] or '-'} / {d['status'] or '-'}: "
+                  f"contador={d['contador']} real={d['real']}")
+        print(f"{len(divergencias)} divergência(s). Execute: python -m app.kpis rebuild")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
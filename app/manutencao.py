@@ -7,8 +7,9 @@ from flask import Blueprint, render_template, request, jsonify, flash, redirect,
 from flask_login import login_required, current_user
 from . import db
 from .models import Equipamento, Manutencao, Administrador
+from .kpis import KpiService
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, extract
 import logging
 
 logger = logging.getLogger(__name__)
@@ -101,7 +102,7 @@ def index():
         return redirect(url_for('dashboard.index'))
 
     # Estatísticas de manutenção
-    total_equipamentos = Equipamento.query.count()
+    total_equipamentos = KpiService.get_equipamento_kpis()['total']
     total_manutencoes = Manutencao.query.count()
 
     # Manutenções vencidas
@@ -112,13 +113,17 @@ def index():
 
     # Manutenções por mês (últimos 6 meses)
     seis_meses_atras = datetime.now() - timedelta(days=180)
-    manutencoes_por_mes = db.session.query(
-        func.strftime('%Y-%m', Manutencao.data_manutencao).label('mes'),
-        func.count(Manutencao.id).label('total')
-    ).filter(Manutencao.data_manutencao >= seis_meses_atras)\
-     .group_by(func.strftime('%Y-%m', Manutencao.data_manutencao))\
-     .order_by(func.strftime('%Y-%m', Manutencao.data_manutencao))\
-     .all()
+    # extract() funciona em SQLite e PostgreSQL (strftime é exclusivo do SQLite)
+    ano = extract('year', Manutencao.data_manutencao)
+    mes = extract('month', Manutencao.data_manutencao)
+    manutencoes_por_mes = [
+        (f"{int(a):04d}-{int(m):02d}", total)
+        for a, m, total in db.session.query(ano, mes, func.count(Manutencao.id))
+        .filter(Manutencao.data_manutencao >= seis_meses_atras)
+        .group_by(ano, mes)
+        .order_by(ano, mes)
+        .all()
+    ]
 
     return render_template('manutencao/index.html',
                          total_equipamentos=total_equipamentos,
@@ -5,11 +5,138 @@ Execute este script após atualizar os modelos
 """
 
 import logging
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import func, inspect, select, tuple_
 from . import create_app, db
-from .models import Administrador, Equipamento
+from .financeiro import FinanceiroService
+from .models import Administrador, Equipamento, Emprestimo, Notificacao, AuditLog, Manutencao, Backup
 
 logger = logging.getLogger(__name__)
 
+def criar_indices():
+    """
+    Cria em bancos existentes os índices declarados nos modelos (idempotente)
+
+    db.create_all() não adiciona índices a tabelas que já existem.
+
+    Returns:
+        list: Nomes dos índices criados nesta execução
+    """
+    inspector = inspect(db.engine)
+    tabelas = set(inspector.get_table_names())
+    criados = []
+    for tabela in db.metadata.sorted_tables:
+        if tabela.name not in tabelas:
+            continue
+        existentes = {ix['name'] for ix in inspector.get_indexes(tabela.name)}
+        for indice in tabela.indexes:
+            if indice.name not in existentes:
+                indice.create(bind=db.engine, checkfirst=True)
+                criados.append(indice.name)
+    return criados
+
+def adicionar_colunas():
+    """
+    Adiciona em tabelas existentes as colunas novas dos modelos (idempotente)
+
+    db.create_all() não altera tabelas que já existem. Só colunas anuláveis
+    sem restrições são adicionadas (ALTER TABLE ... ADD COLUMN).
+
+    Returns:
+        list: "tabela.coluna" adicionadas nesta execução
+    """
+    inspector = inspect(db.engine)
+    tabelas = set(inspector.get_table_names())
+    adicionadas = []
+    with db.engine.begin() as conexao:
+        for tabela in db.metadata.sorted_tables:
+            if tabela.name not in tabelas:
+                continue
+            existentes = {coluna['name'] for coluna in inspector.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name in existentes or not coluna.nullable or coluna.foreign_keys:
+                    continue
+                tipo = coluna.type.compile(dialect=db.engine.dialect)
+                conexao.exec_driver_sql(f'ALTER TABLE "{tabela.name}" ADD COLUMN "{coluna.name}" {tipo}')
+                adicionadas.append(f'{tabela.name}.{coluna.name}')
+    return adicionadas
+
+def _consultas_principais():
+    """Consultas representativas das rotas, usadas no relatório de planos"""
+    agora = datetime.now()
+    return {
+        'equipamentos: filtro por status': select(Equipamento)
+            .where(Equipamento.emprestimo == 'EM_USO').order_by(Equipamento.id).limit(11),
+        'equipamentos: filtro por categoria': select(Equipamento)
+            .where(Equipamento.equipamento_category == 'NOTEBOOK').order_by(Equipamento.id).limit(11),
+        'equipamentos: KPIs por setor': select(Equipamento.emprestimo, func.count(Equipamento.id))
+            .where(Equipamento.setor_category == 'TI').group_by(Equipamento.emprestimo),
+        # A mesma consulta executada pelo resumo financeiro (não uma aproximação)
+        'equipamentos: resumo financeiro': FinanceiroService.consulta(hoje=agora.date()).statement,
+        'equipamentos: resumo financeiro por setor': FinanceiroService.consulta('TI', agora.date()).statement,
+        'emprestimos: atrasados': select(Emprestimo)
+            .where(Emprestimo.status == 'ATIVO', Emprestimo.data_prevista_devolucao < agora),
+        'notificacoes: não lidas do usuário': select(Notificacao)
+            .where(Notificacao.usuario_id == 1, Notificacao.lida.is_(False))
+            .order_by(Notificacao.created_at.desc()),
+        'auditoria: últimos 30 dias': select(AuditLog)
+            .where(AuditLog.created_at >= agora - timedelta(days=30)),
+        'auditoria: página por usuário': select(AuditLog.id, AuditLog.created_at)
+            .where(AuditLog.user_id == 1, tuple_(AuditLog.created_at, AuditLog.id) < (agora, 10 ** 9))
+            .order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(51),
+        'auditoria: página por ação': select(AuditLog.id, AuditLog.created_at)
+            .where(AuditLog.action == 'DELETE')
+            .order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(51),
+        'manutencao: última do equipamento': select(Manutencao)
+            .where(Manutencao.equipamento_id == 1).order_by(Manutencao.data_manutencao.desc()).limit(1),
+        'backups: mais recentes': select(Backup).order_by(Backup.created_at.desc()),
+    }
+
+def _planos(conexao_sqlite):
+    """Executa EXPLAIN QUERY PLAN em uma conexão sqlite3 (DB-API)"""
+    dialeto = db.engine.dialect
+    planos = {}
+    for nome, consulta in _consultas_principais().items():
+        sql = str(consulta.compile(dialect=dialeto, compile_kwargs={'literal_binds': True}))
+        linhas = conexao_sqlite.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        planos[nome] = [linha[-1] for linha in linhas]
+    return planos
+
+def relatorio_plano_consultas():
+    """
+    Mostra o EXPLAIN QUERY PLAN das consultas principais sem e com os índices declarados
+
+    O "antes" é obtido em uma cópia em memória do banco (API de backup do
+    sqlite3) da qual os índices são removidos, então o banco real não é alterado.
+
+    Returns:
+        dict: {consulta: {'antes': [...], 'depois': [...]}}
+    """
+    import sqlite3
+
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError("Relatório de planos disponível apenas para SQLite")
+
+    raw = db.engine.raw_connection()
+    try:
+        origem = getattr(raw, 'driver_connection', None) or raw.connection
+        depois = _planos(origem)
+
+        copia = sqlite3.connect(':memory:')
+        try:
+            origem.backup(copia)
+            for tabela in db.metadata.sorted_tables:
+                for indice in tabela.indexes:
+                    copia.execute(f'DROP INDEX IF EXISTS "{indice.name}"')
+            antes = _planos(copia)
+        finally:
+            copia.close()
+    finally:
+        raw.close()
+
+    return {nome: {'antes': antes[nome], 'depois': depois[nome]} for nome in depois}
+
 def migrate_database():
     app = create_app()
     
@@ -20,6 +147,18 @@ def migrate_database():
             logger.info("Tabelas criadas com sucesso")
             print("Tabelas criadas!")
             
+            # Colunas novas em tabelas existentes
+            colunas_adicionadas = adicionar_colunas()
+            if colunas_adicionadas:
+                logger.info(f"Colunas adicionadas: {', '.join(colunas_adicionadas)}")
+                print(f"Colunas adicionadas: {len(colunas_adicionadas)}")
+            
+            # Índices declarados nos modelos (bancos criados antes deles)
+            indices_criados = criar_indices()
+            if indices_criados:
+                logger.info(f"Índices criados: {', '.join(indices_criados)}")
+                print(f"Indices criados: {len(indices_criados)}")
+            
             # Verificar se já existe um administrador
             admin_exists = Administrador.query.first()
             if not admin_exists:
@@ -59,5 +198,16 @@ def migrate_database():
             db.session.rollback()
             return False
 
+def imprimir_relatorio_planos():
+    app = create_app()
+    with app.app_context():
+        for nome, planos in relatorio_plano_consultas().items():
+            print(f"\n== {nome}")
+            print("  antes : " + " | ".join(planos['antes']))
+            print("  depois: " + " | ".join(planos['depois']))
+
 if __name__ == "__main__":
-    migrate_database()
\ No newline at end of file
+    if "--explain" in sys.argv:
+        imprimir_relatorio_planos()
+    else:
+        migrate_database()
\ No newline at end of file
@@ -2,6 +2,8 @@ from . import db, login_manager
 from flask_login import UserMixin
 from datetime import datetime, timezone
 
+# Enums usam native_enum=False: viram VARCHAR tanto no SQLite quanto no PostgreSQL
+
 class AuditLog(db.Model):
     __tablename__ = "audit_logs"
     id = db.Column(db.Integer, primary_key=True)
@@ -15,6 +17,14 @@ class AuditLog(db.Model):
     user_agent = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        db.Index('ix_audit_logs_created_at', 'created_at'),
+        # Filtros do navegador de auditoria, já na ordem (created_at, id)
+        db.Index('ix_audit_logs_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_audit_logs_action_created', 'action', 'created_at', 'id'),
+        db.Index('ix_audit_logs_table_record_created', 'table_name', 'record_id', 'created_at', 'id'),
+    )
+
 class Administrador(UserMixin, db.Model):
     __tablename__ = "administrador"
     id = db.Column(db.Integer, primary_key=True)
@@ -22,8 +32,8 @@ class Administrador(UserMixin, db.Model):
     user_password = db.Column(db.String(255), nullable=False)
     name_user = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100))
-    status = db.Column(db.Enum('ATIVO', 'INATIVO'), default='ATIVO')
-    role = db.Column(db.Enum('ADMIN', 'GERENTE', 'USUARIO', 'VISUALIZADOR'), default='USUARIO')
+    status = db.Column(db.Enum('ATIVO', 'INATIVO', native_enum=False), default='ATIVO')
+    role = db.Column(db.Enum('ADMIN', 'GERENTE', 'USUARIO', 'VISUALIZADOR', native_enum=False), default='USUARIO')
     setor = db.Column(db.String(50))
     cargo = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -80,24 +90,27 @@ class Equipamento(db.Model):
     setor_category = db.Column(db.Enum(
         'CJ', 'CCA', 'CEI', 'ADMINISTRATIVO', 'RH', 'TI',
         'COMUNICACAO', 'SOCIAL', 'FINANCEIRO', 'BAZAR',
-        'ARRASTART', 'ENFERMARIA', 'COZINHA', 'MANUTENCAO', 'ADMINISTRADOR'
+        'ARRASTART', 'ENFERMARIA', 'COZINHA', 'MANUTENCAO', 'ADMINISTRADOR',
+        native_enum=False
     ), nullable=True)
 
     cargo_category = db.Column(db.Enum(
         'GERENTE', 'COORDENADOR', 'ASSISTENTE', 'AUXILIAR',
-        'ANALISTA', 'EDUCADOR', 'DIRETORIA', 'ENFERMEIRA', 'RH'
+        'ANALISTA', 'EDUCADOR', 'DIRETORIA', 'ENFERMEIRA', 'RH',
+        native_enum=False
     ), nullable=True)
 
     equipamento_category = db.Column(db.Enum(
         'NOTEBOOK', 'DESKTOP', 'ACCESS POINT', 'ROTEADOR',
         'IMPRESSORA', 'TABLET', 'TV', 'PROJETOR', 'CELULAR',
-        'CAIXA DE SOM', 'PERIFERICOS'
+        'CAIXA DE SOM', 'PERIFERICOS',
+        native_enum=False
     ), nullable=False)
 
     marca_category = db.Column(db.String(255), nullable=False)
 
-    equipamento_compartilhado = db.Column(db.Enum('SIM','NAO'), default='NAO')
-    emprestimo = db.Column(db.Enum('DISPONIVEL','EM_USO','QUEBRADO'), default='DISPONIVEL')
+    equipamento_compartilhado = db.Column(db.Enum('SIM','NAO', native_enum=False), default='NAO')
+    emprestimo = db.Column(db.Enum('DISPONIVEL','EM_USO','QUEBRADO', native_enum=False), default='DISPONIVEL')
 
     serial_number = db.Column(db.String(100))
     data_aquisicao = db.Column(db.Date)
@@ -113,6 +126,36 @@ class Equipamento(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey("administrador.id", ondelete="SET NULL"), nullable=True)
     updated_by = db.Column(db.Integer, db.ForeignKey("administrador.id", onupdate="CASCADE"), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_equipamentos_emprestimo', 'emprestimo'),
+        db.Index('ix_equipamentos_setor_emprestimo', 'setor_category', 'emprestimo'),
+        db.Index('ix_equipamentos_categoria', 'equipamento_category'),
+        # Cobre a agregação do resumo financeiro (lida só pelo índice)
+        db.Index('ix_equipamentos_financeiro', 'setor_category', 'equipamento_category',
+                 'data_aquisicao', 'valor_aquisicao'),
+    )
+
+class KpiContador(db.Model):
+    """Contadores materializados de equipamentos por setor, categoria e status"""
+    __tablename__ = "kpi_contadores"
+    id = db.Column(db.Integer, primary_key=True)
+    setor = db.Column(db.String(50), nullable=False, default='')  # '' = sem setor
+    categoria = db.Column(db.String(50), nullable=False, default='')
+    status = db.Column(db.String(20), nullable=False, default='')
+    total = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        db.UniqueConstraint('setor', 'categoria', 'status', name='uq_kpi_contadores_chave'),
+    )
+
+class VersaoDados(db.Model):
+    """Contador incrementado a cada escrita em equipamentos, empréstimos ou manutenções"""
+    __tablename__ = "versao_dados"
+    id = db.Column(db.Integer, primary_key=True)  # linha única (id = 1)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
 class Emprestimo(db.Model):
     __tablename__ = "emprestimos"
     id = db.Column(db.Integer, primary_key=True)
@@ -122,17 +165,21 @@ class Emprestimo(db.Model):
     data_emprestimo = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     data_prevista_devolucao = db.Column(db.DateTime)
     data_devolucao = db.Column(db.DateTime)
-    status = db.Column(db.Enum('ATIVO', 'DEVOLVIDO', 'ATRASADO'), default='ATIVO')
+    status = db.Column(db.Enum('ATIVO', 'DEVOLVIDO', 'ATRASADO', native_enum=False), default='ATIVO')
     observacoes = db.Column(db.Text)
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        db.Index('ix_emprestimos_status_prevista', 'status', 'data_prevista_devolucao'),
+    )
+
 class Notificacao(db.Model):
     __tablename__ = "notificacoes"
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey("administrador.id"), nullable=False)
     titulo = db.Column(db.String(200), nullable=False)
     mensagem = db.Column(db.Text, nullable=False)
-    tipo = db.Column(db.Enum('INFO', 'WARNING', 'ERROR', 'SUCCESS'), default='INFO')
+    tipo = db.Column(db.Enum('INFO', 'WARNING', 'ERROR', 'SUCCESS', native_enum=False), default='INFO')
     lida = db.Column(db.Boolean, default=False)
     relacionada_tabela = db.Column(db.String(50))  # 'emprestimos', 'equipamentos', etc.
     relacionada_id = db.Column(db.Integer)  # ID do registro relacionado
@@ -142,6 +189,10 @@ class Notificacao(db.Model):
 
     usuario = db.relationship("Administrador", backref="notificacoes")
 
+    __table_args__ = (
+        db.Index('ix_notificacoes_usuario_lida', 'usuario_id', 'lida', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -160,9 +211,11 @@ class Backup(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
     arquivo = db.Column(db.String(255), nullable=False)  # Caminho do arquivo
-    tamanho = db.Column(db.Integer, nullable=False)  # Tamanho em bytes
-    tipo = db.Column(db.Enum('MANUAL', 'AUTOMATICO'), default='MANUAL')
-    status = db.Column(db.Enum('SUCESSO', 'FALHA', 'EXECUTANDO'), default='EXECUTANDO')
+    tamanho = db.Column(db.Integer, nullable=False)  # Tamanho armazenado (comprimido) em bytes
+    tamanho_original = db.Column(db.BigInteger, nullable=True)  # Tamanho do banco copiado, sem compressão
+    tipo = db.Column(db.Enum('MANUAL', 'AUTOMATICO', native_enum=False), default='MANUAL')
+    status = db.Column(db.Enum('SUCESSO', 'FALHA', 'EXECUTANDO', native_enum=False), default='EXECUTANDO')
+    progresso = db.Column(db.Integer, nullable=True, default=0)  # Percentual copiado (0-100)
     criado_por = db.Column(db.Integer, db.ForeignKey("administrador.id"), nullable=True)
     erro_mensagem = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -171,20 +224,81 @@ class Backup(db.Model):
     # Relacionamento
     administrador = db.relationship("Administrador", backref="backups")
 
+    __table_args__ = (
+        db.Index('ix_backups_created_at', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
             'nome': self.nome,
             'arquivo': self.arquivo,
             'tamanho': self.tamanho,
+            'tamanho_original': self.tamanho_original,
             'tipo': self.tipo,
             'status': self.status,
+            'progresso': self.progresso,
             'criado_por': self.criado_por,
             'erro_mensagem': self.erro_mensagem,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'concluido_at': self.concluido_at.isoformat() if self.concluido_at else None
         }
 
+class ImportacaoJob(db.Model):
+    """Importação de equipamentos processada em segundo plano"""
+    __tablename__ = "importacao_jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    arquivo_nome = db.Column(db.String(255), nullable=False)  # Nome original do upload
+    arquivo = db.Column(db.String(255), nullable=True)  # Cópia temporária (removida ao concluir)
+    status = db.Column(db.Enum('PENDENTE', 'PROCESSANDO', 'CONCLUIDO', 'FALHA', native_enum=False), default='PENDENTE')
+    total_estimado = db.Column(db.Integer, nullable=True)
+    processados = db.Column(db.Integer, default=0)
+    importados = db.Column(db.Integer, default=0)
+    total_erros = db.Column(db.Integer, default=0)
+    erros = db.Column(db.Text, nullable=True)  # JSON com as primeiras linhas rejeitadas
+    erro_mensagem = db.Column(db.Text, nullable=True)
+    criado_por = db.Column(db.Integer, db.ForeignKey("administrador.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    iniciado_at = db.Column(db.DateTime, nullable=True)
+    concluido_at = db.Column(db.DateTime, nullable=True)
+    # Renovado a cada gravação do job (progresso): detecta jobs abandonados
+    atualizado_at = db.Column(db.DateTime, nullable=True, default=lambda: datetime.now(timezone.utc),
+                              onupdate=lambda: datetime.now(timezone.utc))
+
+    administrador = db.relationship("Administrador", backref="importacoes")
+
+    @property
+    def finalizado(self):
+        return self.status in ('CONCLUIDO', 'FALHA')
+
+    @property
+    def eta_segundos(self):
+        """Estimativa do tempo restante pela taxa de linhas processadas até agora"""
+        if self.status != 'PROCESSANDO' or not self.iniciado_at or not self.processados or not self.total_estimado:
+            return None
+        iniciado = self.iniciado_at
+        if iniciado.tzinfo is None:
+            iniciado = iniciado.replace(tzinfo=timezone.utc)
+        decorrido = (datetime.now(timezone.utc) - iniciado).total_seconds()
+        restantes = max(0, self.total_estimado - self.processados)
+        return round(restantes * decorrido / self.processados)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'arquivo_nome': self.arquivo_nome,
+            'status': self.status,
+            'total_estimado': self.total_estimado,
+            'processados': self.processados,
+            'importados': self.importados,
+            'total_erros': self.total_erros,
+            'erro_mensagem': self.erro_mensagem,
+            'eta_segundos': self.eta_segundos,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'iniciado_at': self.iniciado_at.isoformat() if self.iniciado_at else None,
+            'concluido_at': self.concluido_at.isoformat() if self.concluido_at else None
+        }
+
 class Manutencao(db.Model):
     """Modelo para gestão de manutenção preventiva"""
     __tablename__ = "manutencao"
@@ -195,7 +309,8 @@ class Manutencao(db.Model):
     # Tipo de manutenção
     tipo_manutencao = db.Column(db.Enum(
         'PREVENTIVA', 'CORRETIVA', 'PREDITIVA', 'CALIBRACAO',
-        'LIMPEZA', 'ATUALIZACAO', 'SUBSTITUICAO', 'OUTROS'
+        'LIMPEZA', 'ATUALIZACAO', 'SUBSTITUICAO', 'OUTROS',
+        native_enum=False
     ), nullable=False)
 
     # Descrição e detalhes
@@ -215,7 +330,8 @@ class Manutencao(db.Model):
     # Responsável e status
     responsavel = db.Column(db.String(100))
     status = db.Column(db.Enum(
-        'AGENDADA', 'EM_ANDAMENTO', 'CONCLUIDA', 'CANCELADA'
+        'AGENDADA', 'EM_ANDAMENTO', 'CONCLUIDA', 'CANCELADA',
+        native_enum=False
     ), default='AGENDADA')
 
     # Controle de criação/modificação
@@ -227,6 +343,10 @@ class Manutencao(db.Model):
     criador = db.relationship("Administrador", foreign_keys=[created_by], backref="manutencoes_criadas")
     atualizador = db.relationship("Administrador", foreign_keys=[updated_by], backref="manutencoes_atualizadas")
 
+    __table_args__ = (
+        db.Index('ix_manutencao_equipamento_data', 'equipamento_id', 'data_manutencao'),
+    )
+
     def to_dict(self):
         """Converte o objeto para dicionário"""
         return {
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Paginação de consultas
+
+Suporta dois modos:
+- offset: ``?page=N``, simples e adequado para tabelas pequenas
+- keyset: ``?after=<cursor>`` / ``?before=<cursor>``, custo constante por
+  página independente da profundidade (usa o índice da chave de ordenação)
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from math import ceil
+
+from sqlalchemy import tuple_
+
+from .constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, KEYSET_THRESHOLD
+
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """
+    Normaliza o tamanho de página recebido na query string
+
+    Args:
+        value: Valor bruto (str, int ou None)
+        default (int): Tamanho usado quando o valor é inválido
+
+    Returns:
+        int: Tamanho entre 1 e MAX_PAGE_SIZE
+    """
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    """Serializa os valores da chave de ordenação em um cursor opaco"""
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Converte um cursor de volta para os valores da chave de ordenação
+
+    Returns:
+        list | None: Valores tipados conforme as colunas, ou None se o cursor for inválido
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+
+    decoded = []
+    for column, value in zip(columns, values):
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = None
+        try:
+            if value is None:
+                decoded.append(None)
+            elif python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            elif python_type is date:
+                decoded.append(date.fromisoformat(value))
+            elif python_type is int:
+                decoded.append(int(value))
+            else:
+                decoded.append(value)
+        except (TypeError, ValueError):
+            return None
+    return decoded
+
+
+class Page:
+    """Resultado paginado compatível com os templates (items, page, pages, has_next...)"""
+
+    def __init__(self, items, page, per_page, total, has_prev, has_next,
+                 columns=(), use_keyset=False, base_args=None):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        if total is None:
+            self.pages = None
+        else:
+            self.pages = max(1, ceil(total / per_page)) if per_page else 1
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_num = page - 1 if has_prev else None
+        self.next_num = page + 1 if has_next else None
+        self.use_keyset = use_keyset
+        self.base_args = dict(base_args or {})
+        self._columns = columns
+
+    def _cursor_for(self, item):
+        return encode_cursor([getattr(item, column.key) for column in self._columns])
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.items:
+            return None
+        return self._cursor_for(self.items[-1])
+
+    @property
+    def prev_cursor(self):
+        if not self.has_prev or not self.items:
+            return None
+        return self._cursor_for(self.items[0])
+
+    @property
+    def next_args(self):
+        """Parâmetros de URL para a próxima página (filtros preservados)"""
+        args = dict(self.base_args, page=self.next_num, per_page=self.per_page)
+        if self.use_keyset:
+            args['after'] = self.next_cursor
+        return args
+
+    @property
+    def prev_args(self):
+        """Parâmetros de URL para a página anterior (filtros preservados)"""
+        args = dict(self.base_args, page=self.prev_num, per_page=self.per_page)
+        if self.use_keyset:
+            args['before'] = self.prev_cursor
+        return args
+
+
+def _keyset_condition(columns, values, greater):
+    if len(columns) == 1:
+        column, value = columns[0], values[0]
+        return column > value if greater else column < value
+    left, right = tuple_(*columns), tuple_(*values)
+    return left > right if greater else left < right
+
+
+def paginate(query, columns, page=1, per_page=DEFAULT_PAGE_SIZE, after=None, before=None,
+             descending=False, base_args=None, with_total=True, keyset=True):
+    """
+    Pagina uma query em modo offset ou keyset
+
+    Args:
+        query: Query SQLAlchemy já filtrada; um order_by existente (ex.: relevância)
+            vem antes da chave, e só faz sentido com keyset=False
+        columns (tuple): Colunas da chave de ordenação; a última deve ser única (ex.: id)
+        page (int): Número da página (modo offset e exibição)
+        per_page (int): Itens por página
+        after (str): Cursor da última linha da página anterior
+        before (str): Cursor da primeira linha da página seguinte
+        descending (bool): Ordenação decrescente
+        base_args (dict): Filtros atuais, preservados em next_args/prev_args
+        with_total (bool): Conta o total de linhas; sem ele (total=None) o custo
+            por página não depende do tamanho da tabela e o modo é sempre keyset
+        keyset (bool): False força o modo offset e ignora cursores (ordenações
+            sem cursor, como a relevância da busca)
+
+    Returns:
+        Page: Itens da página e metadados de navegação
+    """
+    per_page = get_page_size(per_page)
+    page = max(1, page or 1)
+    columns = tuple(columns)
+
+    if with_total:
+        total = query.order_by(None).count()
+        use_keyset = keyset and total > KEYSET_THRESHOLD
+    else:
+        total = None
+        use_keyset = keyset
+
+    after_values = decode_cursor(after, columns) if keyset else None
+    before_values = decode_cursor(before, columns) if keyset else None
+
+    def ordering(reverse):
+        desc = descending != reverse
+        return [column.desc() if desc else column.asc() for column in columns]
+
+    if after_values is not None:
+        rows = (query.filter(_keyset_condition(columns, after_values, not descending))
+                .order_by(*ordering(False)).limit(per_page + 1).all())
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = True
+    elif before_values is not None:
+        rows = (query.filter(_keyset_condition(columns, before_values, descending))
+                .order_by(*ordering(True)).limit(per_page + 1).all())
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+        if not has_prev:
+            page = 1
+    else:
+        offset = (page - 1) * per_page
+        rows = query.order_by(*ordering(False)).offset(offset).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = page > 1
+
+    return Page(items, page, per_page, total, has_prev, has_next,
+                columns=columns, use_keyset=use_keyset, base_args=base_args)
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
 from . import db
-from .models import Equipamento, Administrador, Emprestimo, AuditLog
+from .models import Equipamento, Administrador, Emprestimo
 from .audit import AuditManager
+from .audit_archive import AuditArchive
+from .export_cache import ExportCache
+from .financeiro import FinanceiroService
+from .kpis import KpiService
+from . import report_engine
 from flask_login import login_required, current_user
 from sqlalchemy import func, extract, and_, or_
 from sqlalchemy.exc import SQLAlchemyError
@@ -26,16 +31,12 @@ relatorios_bp = Blueprint(
 @login_required
 def index():
     try:
-        # Aplicar filtro por setor se usuário não for ADMIN
-        base_query = Equipamento.query
-        if current_user.role != 'ADMIN' and current_user.setor:
-            base_query = base_query.filter_by(setor_category=current_user.setor)
-        
-        # 1. Status dos Equipamentos
-        total_equipamentos = base_query.count()
-        em_uso = base_query.filter_by(emprestimo="EM_USO").count()
-        quebrados = base_query.filter_by(emprestimo="QUEBRADO").count()
-        disponivel = total_equipamentos - em_uso - quebrados
+        # 1. Status dos Equipamentos (filtrado por setor se usuário não for ADMIN)
+        kpis = KpiService.get_equipamento_kpis(KpiService.setor_do_usuario(current_user))
+        total_equipamentos = kpis["total"]
+        em_uso = kpis["em_uso"]
+        quebrados = kpis["quebrados"]
+        disponivel = kpis["disponiveis"]
         
         if total_equipamentos == 0:
             status_data = {
@@ -250,10 +251,13 @@ def gerar_relatorio(tipo):
             end_date = datetime.now(timezone.utc)
             start_date = end_date - timedelta(days=30)
             
-            # Buscar logs de auditoria
-            audit_logs = AuditLog.query.filter(
-                AuditLog.created_at >= start_date
-            ).order_by(AuditLog.created_at.desc()).limit(100).all()
+            # Buscar logs de auditoria (via AuditArchive: alcança meses já arquivados)
+            audit_logs = AuditArchive.recentes(start_date, 100)
+            ids_usuarios = {log['user_id'] for log in audit_logs if log['user_id']}
+            nomes = dict(
+                Administrador.query.with_entities(Administrador.id, Administrador.name_user)
+                .filter(Administrador.id.in_(ids_usuarios)).all()
+            ) if ids_usuarios else {}
             
             # Análise dos dados
             actions_by_type = {}
@@ -262,24 +266,23 @@ def gerar_relatorio(tipo):
             
             for log in audit_logs:
                 # Contar por tipo
-                actions_by_type[log.action] = actions_by_type.get(log.action, 0) + 1
+                actions_by_type[log['action']] = actions_by_type.get(log['action'], 0) + 1
                 
                 # Contar por usuário
-                user_name = 'Sistema' if not log.user_id else 'Usuário Desconhecido'
-                if log.user_id:
-                    user = Administrador.query.get(log.user_id)
-                    if user:
-                        user_name = user.name_user
+                if not log['user_id']:
+                    user_name = 'Sistema'
+                else:
+                    user_name = nomes.get(log['user_id'], 'Usuário Desconhecido')
                 actions_by_user[user_name] = actions_by_user.get(user_name, 0) + 1
                 
                 # Ações críticas
-                if log.action in ['DELETE', 'CLEAR_ALL', 'EXPORT']:
+                if log['action'] in ['DELETE', 'CLEAR_ALL', 'EXPORT']:
                     critical_actions.append({
-                        'action': log.action,
+                        'action': log['action'],
                         'user': user_name,
-                        'timestamp': log.created_at.strftime('%d/%m/%Y %H:%M'),
-                        'table': log.table_name,
-                        'record_id': log.record_id
+                        'timestamp': log['created_at'].strftime('%d/%m/%Y %H:%M'),
+                        'table': log['table_name'],
+                        'record_id': log['record_id']
                     })
             
             # Calcular score de compliance
@@ -329,6 +332,7 @@ def gerar_relatorio(tipo):
             data = {
                 "tipo": titulo,
                 "data_geracao": data_geracao,
+                "resumo": FinanceiroService.resumo(KpiService.setor_do_usuario(current_user)),
                 "message": "Relatório financeiro disponível para exportação em Excel"
             }
             
@@ -354,411 +358,56 @@ def gerar_relatorio(tipo):
     except Exception as e:
         return {"error": str(e)}
 
+@relatorios_bp.route("/financeiro/resumo", methods=["GET"])
+@login_required
+def resumo_financeiro():
+    """Totais financeiros por setor, categoria e faixa de idade (agregados no banco)"""
+    setor = request.args.get('setor')
+    setor_usuario = KpiService.setor_do_usuario(current_user)
+    if setor_usuario:
+        if setor and setor != setor_usuario:
+            return jsonify({"error": "Acesso negado ao setor solicitado"}), 403
+        setor = setor_usuario
+    
+    try:
+        return jsonify(FinanceiroService.resumo(setor))
+    except SQLAlchemyError as e:
+        import logging
+        logging.error(f"Erro ao calcular resumo financeiro: {str(e)}")
+        return jsonify({"error": "Erro ao calcular resumo financeiro"}), 500
+
 @relatorios_bp.route("/exportar/<formato>", methods=["GET"])
 @login_required
 def exportar_relatorio(formato):
-    from flask import send_file, make_response
-    import io
-    import csv
-    from werkzeug.utils import secure_filename
-    
-    if formato not in ["pdf", "excel", "csv"]:
+    if formato not in report_engine.ESCRITORES:
         return jsonify({"error": "Formato inválido"}), 400
     
     tipo = request.args.get('tipo', 'inventario')
     setor = request.args.get('setor')
     
     try:
-        if tipo == 'financeiro':
-            return _exportar_financeiro(formato)
-        elif tipo == 'auditoria':
-            return _exportar_auditoria(formato)
-        elif tipo == 'manutencao':
-            return _exportar_manutencao(formato)
-        elif tipo == 'emprestimos':
-            return _exportar_emprestimos(formato)
-        elif tipo == 'localizacao' and setor:
-            return _exportar_localizacao(formato, setor)
+        if tipo == 'auditoria':
+            # Não depende da versão dos dados de patrimônio (janela móvel de 30 dias)
+            return report_engine.exportar(tipo, formato)
+        
+        if tipo == 'localizacao' and setor:
+            setor_exportado = setor
         else:
-            return _exportar_inventario(formato)
+            if tipo not in report_engine.RELATORIOS or tipo == 'localizacao':
+                tipo = 'inventario'
+            setor_exportado = KpiService.setor_do_usuario(current_user)
+        
+        # A permissão é verificada aqui, antes do cache: um acerto no cache
+        # não executa o gerador, então nenhum controle de acesso pode ficar nele
+        setor_usuario = KpiService.setor_do_usuario(current_user)
+        if setor_usuario and setor_exportado != setor_usuario:
+            return jsonify({"error": "Acesso negado ao setor solicitado"}), 403
+        
+        return ExportCache.servir(
+            formato, tipo, setor_exportado, lambda: report_engine.exportar(tipo, formato, setor_exportado)
+        )
             
     except Exception as e:
         import logging
         logging.error(f"Erro ao exportar relatório: {str(e)}", exc_info=True)
         return jsonify({"error": "Erro ao exportar relatório"}), 500
-
-def _exportar_financeiro(formato):
-    """Export específico para relatório financeiro"""
-    from flask import make_response
-    import io, csv
-    from werkzeug.utils import secure_filename
-    
-    query = Equipamento.query
-    if current_user.role != 'ADMIN' and current_user.setor:
-        query = query.filter_by(setor_category=current_user.setor)
-    
-    equipamentos = query.all()
-    
-    if formato == "excel":
-        html = '''<html><head><meta charset="utf-8"><style>
-        table { border-collapse: collapse; width: 100%; }
-        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-        th { background-color: #f2f2f2; font-weight: bold; }
-        .total-row { background-color: #e8f4fd; font-weight: bold; }
-        .currency { text-align: right; }
-        .status-disponivel { color: #10b981; }
-        .status-em-uso { color: #f59e0b; }
-        .status-quebrado { color: #ef4444; }
-        </style></head><body>
-        <h2>Relatório Financeiro - Patrimônio</h2>
-        <p><strong>Gerado em:</strong> ''' + datetime.now().strftime("%d/%m/%Y %H:%M") + '''</p>
-        <p><strong>Total de equipamentos:</strong> ''' + str(len(equipamentos)) + '''</p>
-        <table>
-        <tr><th>ID</th><th>Nome</th><th>Categoria</th><th>Marca</th><th>Setor</th><th>Valor Aquisição</th><th>Data Aquisição</th><th>Idade (anos)</th><th>Valor Atual</th><th>Depreciação</th><th>% Depreciação</th><th>Status</th></tr>'''
-        
-        total_aquisicao = 0
-        total_atual = 0
-        equipamentos_com_valor = 0
-        equipamentos_sem_valor = 0
-        
-        for eq in equipamentos:
-            # Usar valor real se disponível, senão estimar baseado na categoria
-            if eq.valor_aquisicao and float(eq.valor_aquisicao) > 0:
-                valor_aquisicao = float(eq.valor_aquisicao)
-                equipamentos_com_valor += 1
-            else:
-                # Estimativas por categoria
-                estimativas = {
-                    'NOTEBOOK': 3500.0,
-                    'DESKTOP': 2500.0,
-                    'IMPRESSORA': 800.0,
-                    'TABLET': 1200.0,
-                    'TV': 2000.0,
-                    'PROJETOR': 3000.0,
-                    'CELULAR': 1500.0,
-                    'ACCESS POINT': 300.0,
-                    'ROTEADOR': 400.0,
-                    'CAIXA DE SOM': 200.0,
-                    'PERIFERICOS': 150.0
-                }
-                valor_aquisicao = estimativas.get(eq.equipamento_category, 1000.0)
-                equipamentos_sem_valor += 1
-            
-            # Calcular idade e depreciação
-            if eq.data_aquisicao:
-                anos_uso = max(0, (datetime.now().date() - eq.data_aquisicao).days / 365.25)
-                data_aquisicao_str = eq.data_aquisicao.strftime('%d/%m/%Y')
-            else:
-                anos_uso = 2.0  # Assumir 2 anos se não há data
-                data_aquisicao_str = 'Não informado'
-            
-            # Depreciação: 20% ao ano, mínimo 10% do valor original
-            taxa_depreciacao = min(0.9, anos_uso * 0.2)  # Máximo 90% de depreciação
-            valor_atual = valor_aquisicao * (1 - taxa_depreciacao)
-            valor_atual = max(valor_atual, valor_aquisicao * 0.1)  # Mínimo 10% do valor original
-            depreciacao = valor_aquisicao - valor_atual
-            percentual_depreciacao = (depreciacao / valor_aquisicao) * 100
-            
-            total_aquisicao += valor_aquisicao
-            total_atual += valor_atual
-            
-            # Determinar classe CSS do status
-            if eq.emprestimo == 'EM_USO':
-                status_text = 'Em Uso'
-                status_class = 'status-em-uso'
-            elif eq.emprestimo == 'QUEBRADO':
-                status_text = 'Quebrado'
-                status_class = 'status-quebrado'
-            else:
-                status_text = 'Disponível'
-                status_class = 'status-disponivel'
-            
-            # Indicar se o valor é estimado
-            valor_display = f"R$ {valor_aquisicao:,.2f}"
-            if not (eq.valor_aquisicao and float(eq.valor_aquisicao) > 0):
-                valor_display += " (est.)"
-            
-            html += f'''<tr>
-                <td>{eq.id}</td>
-                <td>{eq.name_response or ''}</td>
-                <td>{eq.equipamento_category or ''}</td>
-                <td>{eq.marca_category or ''}</td>
-                <td>{eq.setor_category or 'N/A'}</td>
-                <td class="currency">{valor_display}</td>
-                <td>{data_aquisicao_str}</td>
-                <td>{anos_uso:.1f}</td>
-                <td class="currency">R$ {valor_atual:,.2f}</td>
-                <td class="currency">R$ {depreciacao:,.2f}</td>
-                <td class="currency">{percentual_depreciacao:.1f}%</td>
-                <td class="{status_class}">{status_text}</td>
-            </tr>'''
-        
-        # Calcular estatísticas
-        depreciacao_total = total_aquisicao - total_atual
-        percentual_depreciacao_total = (depreciacao_total / total_aquisicao * 100) if total_aquisicao > 0 else 0
-        
-        html += f'''<tr class="total-row">
-            <td colspan="5"><strong>TOTAIS</strong></td>
-            <td class="currency"><strong>R$ {total_aquisicao:,.2f}</strong></td>
-            <td>-</td>
-            <td>-</td>
-            <td class="currency"><strong>R$ {total_atual:,.2f}</strong></td>
-            <td class="currency"><strong>R$ {depreciacao_total:,.2f}</strong></td>
-            <td class="currency"><strong>{percentual_depreciacao_total:.1f}%</strong></td>
-            <td>-</td>
-        </tr></table>
-        
-        <h3>Resumo Financeiro</h3>
-        <table style="width: 50%;">
-            <tr><td><strong>Valor Total Investido:</strong></td><td class="currency"><strong>R$ {total_aquisicao:,.2f}</strong></td></tr>
-            <tr><td><strong>Valor Atual do Patrimônio:</strong></td><td class="currency"><strong>R$ {total_atual:,.2f}</strong></td></tr>
-            <tr><td><strong>Depreciação Total:</strong></td><td class="currency"><strong>R$ {depreciacao_total:,.2f}</strong></td></tr>
-            <tr><td><strong>Percentual de Depreciação:</strong></td><td class="currency"><strong>{percentual_depreciacao_total:.1f}%</strong></td></tr>
-            <tr><td>Equipamentos com valor informado:</td><td>{equipamentos_com_valor}</td></tr>
-            <tr><td>Equipamentos com valor estimado:</td><td>{equipamentos_sem_valor}</td></tr>
-        </table>
-        
-        <p><em>Nota: Valores marcados com "(est.)" são estimativas baseadas na categoria do equipamento. Para maior precisão, cadastre os valores reais de aquisição.</em></p>
-        </body></html>'''
-        
-        response = make_response(html)
-        response.headers['Content-Type'] = 'application/vnd.ms-excel'
-        response.headers['Content-Disposition'] = 'attachment; filename=relatorio_financeiro.xls'
-        return response
-    
-    return jsonify({"error": "Formato não suportado para relatório financeiro"}), 400
-
-def _exportar_auditoria(formato):
-    """Export específico para relatório de auditoria"""
-    from flask import make_response
-    
-    end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(days=30)
-    
-    audit_logs = AuditLog.query.filter(
-        AuditLog.created_at >= start_date
-    ).order_by(AuditLog.created_at.desc()).limit(200).all()
-    
-    if formato == "excel":
-        html = '''<html><head><meta charset="utf-8"></head><body>
-        <h2>Relatório de Auditoria</h2>
-        <p>Período: ''' + start_date.strftime("%d/%m/%Y") + ''' a ''' + end_date.strftime("%d/%m/%Y") + '''</p>
-        <p>Total de ações: ''' + str(len(audit_logs)) + '''</p>
-        <table border="1">
-        <tr><th>Data/Hora</th><th>Usuário</th><th>Ação</th><th>Tabela</th><th>Registro ID</th><th>IP</th><th>Detalhes</th></tr>'''
-        
-        for log in audit_logs:
-            user_name = 'Sistema'
-            if log.user_id:
-                user = Administrador.query.get(log.user_id)
-                user_name = user.name_user if user else 'Usuário Desconhecido'
-            
-            html += f'''<tr>
-                <td>{log.created_at.strftime('%d/%m/%Y %H:%M:%S')}</td>
-                <td>{user_name}</td>
-                <td>{log.action}</td>
-                <td>{log.table_name}</td>
-                <td>{log.record_id or 'N/A'}</td>
-                <td>{log.ip_address or 'N/A'}</td>
-                <td>{log.new_values[:100] if log.new_values else 'N/A'}...</td>
-            </tr>'''
-        
-        html += '</table></body></html>'
-        
-        response = make_response(html)
-        response.headers['Content-Type'] = 'application/vnd.ms-excel'
-        response.headers['Content-Disposition'] = 'attachment; filename=relatorio_auditoria.xls'
-        return response
-    
-    return jsonify({"error": "Formato não suportado para relatório de auditoria"}), 400
-
-def _exportar_manutencao(formato):
-    """Export específico para relatório de manutenção"""
-    from flask import make_response
-    
-    query = Equipamento.query
-    if current_user.role != 'ADMIN' and current_user.setor:
-        query = query.filter_by(setor_category=current_user.setor)
-    
-    # Equipamentos quebrados que precisam de manutenção
-    quebrados = query.filter_by(emprestimo='QUEBRADO').all()
-    # Equipamentos antigos (mais de 3 anos) que podem precisar de manutenção preventiva
-    data_limite = datetime.now().date() - timedelta(days=1095)  # 3 anos
-    antigos = query.filter(Equipamento.data_aquisicao < data_limite).all()
-    
-    if formato == "excel":
-        html = '''<html><head><meta charset="utf-8"></head><body>
-        <h2>Relatório de Manutenção</h2>
-        <p>Gerado em: ''' + datetime.now().strftime("%d/%m/%Y %H:%M") + '''</p>
-        
-        <h3>Equipamentos Quebrados (Manutenção Corretiva)</h3>
-        <table border="1">
-        <tr><th>ID</th><th>Nome</th><th>Categoria</th><th>Marca</th><th>Setor</th><th>Data Cadastro</th><th>Prioridade</th></tr>'''
-        
-        for eq in quebrados:
-            dias_quebrado = (datetime.now().date() - eq.data_cadastro.date()).days if eq.data_cadastro else 0
-            prioridade = "ALTA" if dias_quebrado > 7 else "MÉDIA" if dias_quebrado > 3 else "NORMAL"
-            
-            html += f'''<tr>
-                <td>{eq.id}</td>
-                <td>{eq.name_response or ''}</td>
-                <td>{eq.equipamento_category or ''}</td>
-                <td>{eq.marca_category or ''}</td>
-                <td>{eq.setor_category or 'N/A'}</td>
-                <td>{eq.data_cadastro.strftime('%d/%m/%Y') if eq.data_cadastro else 'N/A'}</td>
-                <td>{prioridade}</td>
-            </tr>'''
-        
-        html += '''</table>
-        
-        <h3>Equipamentos para Manutenção Preventiva (Mais de 3 anos)</h3>
-        <table border="1">
-        <tr><th>ID</th><th>Nome</th><th>Categoria</th><th>Marca</th><th>Setor</th><th>Data Aquisição</th><th>Idade (anos)</th><th>Status</th></tr>'''
-        
-        for eq in antigos:
-            if eq.data_aquisicao:
-                idade = (datetime.now().date() - eq.data_aquisicao).days / 365
-                html += f'''<tr>
-                    <td>{eq.id}</td>
-                    <td>{eq.name_response or ''}</td>
-                    <td>{eq.equipamento_category or ''}</td>
-                    <td>{eq.marca_category or ''}</td>
-                    <td>{eq.setor_category or 'N/A'}</td>
-                    <td>{eq.data_aquisicao.strftime('%d/%m/%Y')}</td>
-                    <td>{idade:.1f}</td>
-                    <td>{'Em Uso' if eq.emprestimo == 'EM_USO' else 'Quebrado' if eq.emprestimo == 'QUEBRADO' else 'Disponível'}</td>
-                </tr>'''
-        
-        html += f'''</table>
-        <p><strong>Resumo:</strong></p>
-        <ul>
-            <li>Equipamentos quebrados: {len(quebrados)}</li>
-            <li>Equipamentos para manutenção preventiva: {len(antigos)}</li>
-            <li>Total que requer atenção: {len(quebrados) + len(antigos)}</li>
-        </ul>
-        </body></html>'''
-        
-        response = make_response(html)
-        response.headers['Content-Type'] = 'application/vnd.ms-excel'
-        response.headers['Content-Disposition'] = 'attachment; filename=relatorio_manutencao.xls'
-        return response
-    
-    return jsonify({"error": "Formato não suportado para relatório de manutenção"}), 400
-
-def _exportar_emprestimos(formato):
-    """Export específico para relatório de empréstimos"""
-    from flask import make_response
-    
-    query = Equipamento.query.filter_by(emprestimo="EM_USO")
-    if current_user.role != 'ADMIN' and current_user.setor:
-        query = query.filter_by(setor_category=current_user.setor)
-    
-    equipamentos = query.all()
-    
-    if formato == "excel":
-        html = '''<html><head><meta charset="utf-8"></head><body>
-        <h2>Relatório de Empréstimos</h2>
-        <p>Gerado em: ''' + datetime.now().strftime("%d/%m/%Y %H:%M") + '''</p>
-        <table border="1">
-        <tr><th>ID</th><th>Nome</th><th>Categoria</th><th>Marca</th><th>Setor</th><th>Cargo</th><th>Compartilhado</th><th>AnyDesk</th><th>Observações</th></tr>'''
-        
-        for eq in equipamentos:
-            html += f'''<tr>
-                <td>{eq.id}</td>
-                <td>{eq.name_response or ''}</td>
-                <td>{eq.equipamento_category or ''}</td>
-                <td>{eq.marca_category or ''}</td>
-                <td>{eq.setor_category or 'N/A'}</td>
-                <td>{eq.cargo_category or 'N/A'}</td>
-                <td>{'Sim' if eq.equipamento_compartilhado == 'SIM' else 'Não'}</td>
-                <td>{eq.numero_anydesk or 'N/A'}</td>
-                <td>{eq.observacoes[:50] if eq.observacoes else 'N/A'}...</td>
-            </tr>'''
-        
-        html += f'''</table>
-        <p><strong>Total de equipamentos em uso: {len(equipamentos)}</strong></p>
-        </body></html>'''
-        
-        response = make_response(html)
-        response.headers['Content-Type'] = 'application/vnd.ms-excel'
-        response.headers['Content-Disposition'] = 'attachment; filename=relatorio_emprestimos.xls'
-        return response
-    
-    return jsonify({"error": "Formato não suportado para relatório de empréstimos"}), 400
-
-def _exportar_localizacao(formato, setor):
-    """Export específico para relatório de localização"""
-    from flask import make_response
-    
-    if current_user.role != 'ADMIN' and current_user.setor and setor != current_user.setor:
-        return jsonify({"error": "Acesso negado ao setor solicitado"}), 403
-    
-    equipamentos = Equipamento.query.filter_by(setor_category=setor).all()
-    
-    if formato == "excel":
-        html = f'''<html><head><meta charset="utf-8"></head><body>
-        <h2>Relatório de Localização - Setor {setor}</h2>
-        <p>Gerado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}</p>
-        <table border="1">
-        <tr><th>ID</th><th>Nome</th><th>Categoria</th><th>Marca</th><th>Status</th><th>Cargo</th><th>Compartilhado</th><th>AnyDesk</th></tr>'''
-        
-        for eq in equipamentos:
-            status = 'Em Uso' if eq.emprestimo == 'EM_USO' else 'Quebrado' if eq.emprestimo == 'QUEBRADO' else 'Disponível'
-            html += f'''<tr>
-                <td>{eq.id}</td>
-                <td>{eq.name_response or ''}</td>
-                <td>{eq.equipamento_category or ''}</td>
-                <td>{eq.marca_category or ''}</td>
-                <td>{status}</td>
-                <td>{eq.cargo_category or 'N/A'}</td>
-                <td>{'Sim' if eq.equipamento_compartilhado == 'SIM' else 'Não'}</td>
-                <td>{eq.numero_anydesk or 'N/A'}</td>
-            </tr>'''
-        
-        html += f'''</table>
-        <p><strong>Total de equipamentos no setor {setor}: {len(equipamentos)}</strong></p>
-        </body></html>'''
-        
-        response = make_response(html)
-        response.headers['Content-Type'] = 'application/vnd.ms-excel'
-        response.headers['Content-Disposition'] = f'attachment; filename=relatorio_localizacao_{setor}.xls'
-        return response
-    
-    return jsonify({"error": "Formato não suportado para relatório de localização"}), 400
-
-def _exportar_inventario(formato):
-    """Export padrão para inventário geral"""
-    from flask import make_response
-    
-    query = Equipamento.query
-    if current_user.role != 'ADMIN' and current_user.setor:
-        query = query.filter_by(setor_category=current_user.setor)
-    
-    equipamentos = query.all()
-    
-    if formato == "excel":
-        html = '''<html><head><meta charset="utf-8"></head><body>
-        <h2>Inventário Geral</h2>
-        <p>Gerado em: ''' + datetime.now().strftime("%d/%m/%Y %H:%M") + '''</p>
-        <table border="1">
-        <tr><th>ID</th><th>Nome</th><th>Categoria</th><th>Marca</th><th>Status</th><th>Setor</th></tr>'''
-        
-        for eq in equipamentos:
-            status = 'Em Uso' if eq.emprestimo == 'EM_USO' else 'Quebrado' if eq.emprestimo == 'QUEBRADO' else 'Disponível'
-            html += f'''<tr>
-                <td>{eq.id}</td>
-                <td>{eq.name_response or ''}</td>
-                <td>{eq.equipamento_category or ''}</td>
-                <td>{eq.marca_category or ''}</td>
-                <td>{status}</td>
-                <td>{eq.setor_category or 'N/A'}</td>
-            </tr>'''
-        
-        html += '</table></body></html>'
-        
-        response = make_response(html)
-        response.headers['Content-Type'] = 'application/vnd.ms-excel'
-        response.headers['Content-Disposition'] = 'attachment; filename=relatorio_inventario.xls'
-        return response
-    
-    return jsonify({"error": "Formato não suportado para inventário"}), 400
@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de relatórios exportáveis
+
+Cada tipo de relatório declara uma vez sua consulta e suas colunas; os
+escritores (CSV, XLSX, PDF, JSON lines) consomem o mesmo iterador
+preguiçoso de linhas, alimentado por um cursor em fluxo. Nenhum formato
+precisa carregar o relatório inteiro em memória.
+
+Totais que dependem de todas as linhas (ex.: valor do patrimônio) são
+acumulados durante a iteração e ficam em ``resumo`` quando ela termina.
+"""
+
+from datetime import datetime, timedelta, timezone
+import json
+import tempfile
+
+from flask import Response, send_file, stream_with_context
+from reportlab.lib.pagesizes import A4, landscape
+
+from .audit_archive import AuditArchive
+from .depreciacao import BaseAtivos, Cenario, calcular
+from .exports import SPOOL_MAX, STATUS_LABELS, consultar_em_fluxo, gerar_csv, gerar_pdf, gerar_xlsx
+from .models import Administrador, AuditLog, Equipamento
+
+PDF_MAX_CARACTERES = 30
+# Linhas por bloco no cálculo vetorizado de depreciação
+FINANCEIRO_BLOCO = 5000
+
+def _status(emprestimo):
+    return STATUS_LABELS.get(emprestimo, 'Disponível')
+
+
+def _sim_nao(valor):
+    return 'Sim' if valor == 'SIM' else 'Não'
+
+
+def _data(valor, formato='%d/%m/%Y'):
+    return valor.strftime(formato) if valor else 'N/A'
+
+
+def _moeda(valor):
+    return f"R$ {valor:,.2f}"
+
+
+class Relatorio:
+    """
+    Base dos relatórios: subclasses definem ``colunas``, ``consulta`` e ``formatar``
+
+    ``colunas`` é uma sequência de (chave, título); a chave nomeia o campo
+    no JSON lines e o título vai para o cabeçalho dos demais formatos.
+    """
+
+    tipo = None
+    titulo = None
+    colunas = ()
+
+    def __init__(self, setor=None):
+        self.setor = setor
+        self.resumo = []
+
+    @property
+    def titulo_completo(self):
+        return f"{self.titulo} - Setor {self.setor}" if self.setor else self.titulo
+
+    @property
+    def nome_arquivo(self):
+        return f"relatorio_{self.tipo}"
+
+    @property
+    def cabecalho(self):
+        return [titulo for _, titulo in self.colunas]
+
+    @property
+    def chaves(self):
+        return [chave for chave, _ in self.colunas]
+
+    def _filtrar_setor(self, consulta):
+        if self.setor:
+            consulta = consulta.filter(Equipamento.setor_category == self.setor)
+        return consulta
+
+    def consulta(self):
+        raise NotImplementedError
+
+    def formatar(self, linha):
+        return list(linha)
+
+    def finalizar(self, total):
+        """Preenche ``resumo`` depois da última linha (padrão: total de registros)"""
+        self.resumo = [("Total de registros", total)]
+
+    def linhas(self):
+        total = 0
+        for linha in self.consulta():
+            total += 1
+            yield self.formatar(linha)
+        self.finalizar(total)
+
+
+class RelatorioInventario(Relatorio):
+    tipo = 'inventario'
+    titulo = 'Inventário Geral'
+    colunas = (
+        ('id', 'ID'), ('nome', 'Nome'), ('categoria', 'Categoria'),
+        ('marca', 'Marca'), ('status', 'Status'), ('setor', 'Setor'),
+    )
+
+    def consulta(self):
+        return self._filtrar_setor(consultar_em_fluxo(
+            Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+            Equipamento.marca_category, Equipamento.emprestimo, Equipamento.setor_category
+        )).order_by(Equipamento.id)
+
+    def formatar(self, linha):
+        id_, nome, categoria, marca, emprestimo, setor = linha
+        return [id_, nome or '', categoria or '', marca or '', _status(emprestimo), setor or 'N/A']
+
+
+class RelatorioEmprestimos(Relatorio):
+    tipo = 'emprestimos'
+    titulo = 'Relatório de Empréstimos'
+    colunas = (
+        ('id', 'ID'), ('nome', 'Nome'), ('categoria', 'Categoria'), ('marca', 'Marca'),
+        ('setor', 'Setor'), ('cargo', 'Cargo'), ('compartilhado', 'Compartilhado'),
+        ('anydesk', 'AnyDesk'), ('observacoes', 'Observações'),
+    )
+
+    def consulta(self):
+        return self._filtrar_setor(consultar_em_fluxo(
+            Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+            Equipamento.marca_category, Equipamento.setor_category, Equipamento.cargo_category,
+            Equipamento.equipamento_compartilhado, Equipamento.numero_anydesk, Equipamento.observacoes
+        ).filter(Equipamento.emprestimo == 'EM_USO')).order_by(Equipamento.id)
+
+    def formatar(self, linha):
+        id_, nome, categoria, marca, setor, cargo, compartilhado, anydesk, observacoes = linha
+        return [id_, nome or '', categoria or '', marca or '', setor or 'N/A', cargo or 'N/A',
+                _sim_nao(compartilhado), anydesk or 'N/A', observacoes[:50] if observacoes else 'N/A']
+
+    def finalizar(self, total):
+        self.resumo = [("Total de equipamentos em uso", total)]
+
+
+class RelatorioLocalizacao(Relatorio):
+    tipo = 'localizacao'
+    titulo = 'Relatório de Localização'
+    colunas = (
+        ('id', 'ID'), ('nome', 'Nome'), ('categoria', 'Categoria'), ('marca', 'Marca'),
+        ('status', 'Status'), ('cargo', 'Cargo'), ('compartilhado', 'Compartilhado'),
+        ('anydesk', 'AnyDesk'),
+    )
+
+    @property
+    def nome_arquivo(self):
+        return f"relatorio_localizacao_{self.setor}"
+
+    def consulta(self):
+        return consultar_em_fluxo(
+            Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+            Equipamento.marca_category, Equipamento.emprestimo, Equipamento.cargo_category,
+            Equipamento.equipamento_compartilhado, Equipamento.numero_anydesk
+        ).filter(Equipamento.setor_category == self.setor).order_by(Equipamento.id)
+
+    def formatar(self, linha):
+        id_, nome, categoria, marca, emprestimo, cargo, compartilhado, anydesk = linha
+        return [id_, nome or '', categoria or '', marca or '', _status(emprestimo),
+                cargo or 'N/A', _sim_nao(compartilhado), anydesk or 'N/A']
+
+    def finalizar(self, total):
+        self.resumo = [(f"Total de equipamentos no setor {self.setor}", total)]
+
+
+class RelatorioManutencao(Relatorio):
+    """Quebrados (manutenção corretiva) seguidos dos com mais de 3 anos (preventiva)"""
+
+    tipo = 'manutencao'
+    titulo = 'Relatório de Manutenção'
+    colunas = (
+        ('tipo', 'Tipo'), ('id', 'ID'), ('nome', 'Nome'), ('categoria', 'Categoria'),
+        ('marca', 'Marca'), ('setor', 'Setor'), ('data', 'Data'), ('detalhe', 'Prioridade/Idade'),
+        ('status', 'Status'),
+    )
+
+    def _base(self):
+        return self._filtrar_setor(consultar_em_fluxo(
+            Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+            Equipamento.marca_category, Equipamento.setor_category, Equipamento.data_cadastro,
+            Equipamento.data_aquisicao, Equipamento.emprestimo
+        ))
+
+    def consulta(self):
+        self._contagem = {'Corretiva': 0, 'Preventiva': 0}
+        data_limite = datetime.now().date() - timedelta(days=1095)  # 3 anos
+        quebrados = self._base().filter(Equipamento.emprestimo == 'QUEBRADO').order_by(Equipamento.id)
+        antigos = self._base().filter(Equipamento.data_aquisicao < data_limite).order_by(Equipamento.id)
+        for linha in quebrados:
+            yield ('Corretiva',) + tuple(linha)
+        for linha in antigos:
+            yield ('Preventiva',) + tuple(linha)
+
+    def formatar(self, linha):
+        tipo, id_, nome, categoria, marca, setor, cadastro, aquisicao, emprestimo = linha
+        self._contagem[tipo] += 1
+        hoje = datetime.now().date()
+        if tipo == 'Corretiva':
+            dias_quebrado = (hoje - cadastro.date()).days if cadastro else 0
+            detalhe = "ALTA" if dias_quebrado > 7 else "MÉDIA" if dias_quebrado > 3 else "NORMAL"
+            data = _data(cadastro)
+        else:
+            detalhe = f"{(hoje - aquisicao).days / 365:.1f} anos"
+            data = _data(aquisicao)
+        return [tipo, id_, nome or '', categoria or '', marca or '', setor or 'N/A', data, detalhe, _status(emprestimo)]
+
+    def finalizar(self, total):
+        self.resumo = [
+            ("Equipamentos quebrados", self._contagem['Corretiva']),
+            ("Equipamentos para manutenção preventiva", self._contagem['Preventiva']),
+            ("Total que requer atenção", total),
+        ]
+
+
+class RelatorioFinanceiro(Relatorio):
+    tipo = 'financeiro'
+    titulo = 'Relatório Financeiro - Patrimônio'
+    colunas = (
+        ('id', 'ID'), ('nome', 'Nome'), ('categoria', 'Categoria'), ('marca', 'Marca'),
+        ('setor', 'Setor'), ('valor_aquisicao', 'Valor Aquisição'), ('data_aquisicao', 'Data Aquisição'),
+        ('idade_anos', 'Idade (anos)'), ('valor_atual', 'Valor Atual'), ('depreciacao', 'Depreciação'),
+        ('percentual_depreciacao', '% Depreciação'), ('status', 'Status'),
+    )
+
+    def consulta(self):
+        return self._filtrar_setor(consultar_em_fluxo(
+            Equipamento.id, Equipamento.name_response, Equipamento.equipamento_category,
+            Equipamento.marca_category, Equipamento.setor_category, Equipamento.valor_aquisicao,
+            Equipamento.data_aquisicao, Equipamento.emprestimo
+        )).order_by(Equipamento.id)
+
+    def linhas(self):
+        """Calcula a depreciação em blocos de FINANCEIRO_BLOCO linhas (ver ``depreciacao``)"""
+        self._totais = {'aquisicao': 0.0, 'atual': 0.0, 'com_valor': 0, 'sem_valor': 0}
+        self._cenario = Cenario(data_referencia=datetime.now().date())
+        total = 0
+        bloco = []
+        for linha in self.consulta():
+            bloco.append(linha)
+            if len(bloco) >= FINANCEIRO_BLOCO:
+                total += len(bloco)
+                yield from self._formatar_bloco(bloco)
+                bloco = []
+        if bloco:
+            total += len(bloco)
+            yield from self._formatar_bloco(bloco)
+        self.finalizar(total)
+
+    def _formatar_bloco(self, bloco):
+        _, _, categorias, _, setores, valores, datas, _ = zip(*bloco)
+        resultado = calcular(BaseAtivos(valores, datas, categorias, setores), self._cenario)
+
+        self._totais['aquisicao'] += float(resultado['valor_aquisicao'].sum())
+        self._totais['atual'] += float(resultado['valor_atual'].sum())
+        estimados = int(resultado['estimado'].sum())
+        self._totais['sem_valor'] += estimados
+        self._totais['com_valor'] += len(bloco) - estimados
+
+        colunas = zip(
+            resultado['valor_aquisicao'].tolist(), resultado['estimado'].tolist(),
+            resultado['anos_uso'].tolist(), resultado['valor_atual'].tolist(),
+            resultado['depreciacao'].tolist(), resultado['percentual'].tolist()
+        )
+        for linha, (valor, estimado, anos_uso, valor_atual, depreciacao, percentual) in zip(bloco, colunas):
+            id_, nome, categoria, marca, setor, _, data_aquisicao, emprestimo = linha
+            valor_display = _moeda(valor)
+            if estimado:
+                valor_display += " (est.)"
+            yield [
+                id_, nome or '', categoria or '', marca or '', setor or 'N/A', valor_display,
+                _data(data_aquisicao) if data_aquisicao else 'Não informado',
+                f"{anos_uso:.1f}", _moeda(valor_atual), _moeda(depreciacao),
+                f"{percentual:.1f}%", _status(emprestimo)
+            ]
+
+    def finalizar(self, total):
+        aquisicao, atual = self._totais['aquisicao'], self._totais['atual']
+        depreciacao = aquisicao - atual
+        self.resumo = [
+            ("Total de equipamentos", total),
+            ("Valor Total Investido", _moeda(aquisicao)),
+            ("Valor Atual do Patrimônio", _moeda(atual)),
+            ("Depreciação Total", _moeda(depreciacao)),
+            ("Percentual de Depreciação", f"{(depreciacao / aquisicao * 100) if aquisicao else 0:.1f}%"),
+            ("Equipamentos com valor informado", self._totais['com_valor']),
+            ("Equipamentos com valor estimado", self._totais['sem_valor']),
+        ]
+
+
+class RelatorioAuditoria(Relatorio):
+    """Últimas 200 ações dos últimos 30 dias (nome do usuário vem no mesmo SELECT)"""
+
+    tipo = 'auditoria'
+    titulo = 'Relatório de Auditoria'
+    colunas = (
+        ('data_hora', 'Data/Hora'), ('usuario', 'Usuário'), ('acao', 'Ação'), ('tabela', 'Tabela'),
+        ('registro_id', 'Registro ID'), ('ip', 'IP'), ('detalhes', 'Detalhes'),
+    )
+    limite = 200
+    dias = 30
+
+    @property
+    def titulo_completo(self):
+        return self.titulo
+
+    def consulta(self):
+        fim = datetime.now(timezone.utc)
+        self._periodo = (fim - timedelta(days=self.dias), fim)
+        if not AuditArchive.tabela_cobre(self._periodo[0]):
+            return self._consulta_arquivada()
+        return consultar_em_fluxo(
+            AuditLog.created_at, AuditLog.user_id, Administrador.name_user, AuditLog.action,
+            AuditLog.table_name, AuditLog.record_id, AuditLog.ip_address, AuditLog.new_values
+        ).outerjoin(Administrador, Administrador.id == AuditLog.user_id).filter(
+            AuditLog.created_at >= self._periodo[0]
+        ).order_by(AuditLog.created_at.desc()).limit(self.limite)
+
+    def _consulta_arquivada(self):
+        """Mesmas linhas da consulta SQL, lidas via AuditArchive quando o período alcança meses arquivados"""
+        registros = AuditArchive.recentes(self._periodo[0], self.limite)
+        ids = {r['user_id'] for r in registros if r['user_id']}
+        nomes = dict(
+            Administrador.query.with_entities(Administrador.id, Administrador.name_user)
+            .filter(Administrador.id.in_(ids)).all()
+        ) if ids else {}
+        return [
+            (r['created_at'], r['user_id'], nomes.get(r['user_id']), r['action'], r['table_name'],
+             r['record_id'], r['ip_address'], r['new_values'])
+            for r in registros
+        ]
+
+    def formatar(self, linha):
+        criado, user_id, nome_usuario, acao, tabela, registro_id, ip, novos = linha
+        usuario = 'Sistema' if not user_id else (nome_usuario or 'Usuário Desconhecido')
+        return [_data(criado, '%d/%m/%Y %H:%M:%S'), usuario, acao, tabela,
+                registro_id or 'N/A', ip or 'N/A', novos[:100] if novos else 'N/A']
+
+    def finalizar(self, total):
+        inicio, fim = self._periodo
+        self.resumo = [
+            ("Período", f"{inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"),
+            ("Total de ações", total),
+        ]
+
+
+RELATORIOS = {
+    relatorio.tipo: relatorio
+    for relatorio in (RelatorioInventario, RelatorioEmprestimos, RelatorioLocalizacao,
+                      RelatorioManutencao, RelatorioFinanceiro, RelatorioAuditoria)
+}
+
+
+# =====================================================
+# ESCRITORES
+# =====================================================
+def _linhas_com_resumo(relatorio):
+    """Linhas do relatório seguidas de uma linha em branco e do resumo"""
+    yield from relatorio.linhas()
+    if relatorio.resumo:
+        yield []
+        for rotulo, valor in relatorio.resumo:
+            yield [rotulo, valor]
+
+
+def _anexo(relatorio, extensao):
+    return f'attachment; filename={relatorio.nome_arquivo}.{extensao}'
+
+
+def escrever_csv(relatorio):
+    return Response(
+        stream_with_context(gerar_csv(relatorio.cabecalho, _linhas_com_resumo(relatorio))),
+        mimetype='text/csv',
+        headers={'Content-Disposition': _anexo(relatorio, 'csv')}
+    )
+
+
+def escrever_jsonl(relatorio):
+    def gerar():
+        chaves = relatorio.chaves
+        for linha in relatorio.linhas():
+            yield json.dumps(dict(zip(chaves, linha)), ensure_ascii=False, default=str) + '\n'
+        yield json.dumps({'resumo': dict(relatorio.resumo)}, ensure_ascii=False, default=str) + '\n'
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': _anexo(relatorio, 'jsonl')}
+    )
+
+
+def escrever_xlsx(relatorio):
+    arquivo = gerar_xlsx(relatorio.cabecalho, _linhas_com_resumo(relatorio), titulo=relatorio.tipo.capitalize())
+    return send_file(
+        arquivo,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f'{relatorio.nome_arquivo}.xlsx'
+    )
+
+
+def escrever_pdf(relatorio):
+    def celulas():
+        for linha in relatorio.linhas():
+            yield [str(valor)[:PDF_MAX_CARACTERES] for valor in linha]
+
+    def rodape():
+        return " | ".join(f"{rotulo}: {valor}" for rotulo, valor in relatorio.resumo)
+
+    arquivo = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    pagesize = landscape(A4) if len(relatorio.colunas) > 6 else A4
+    gerar_pdf(celulas(), rodape, arquivo, titulo=relatorio.titulo_completo,
+              cabecalho=relatorio.cabecalho, colunas=None, pagesize=pagesize)
+    arquivo.seek(0)
+    return send_file(
+        arquivo,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'{relatorio.nome_arquivo}.pdf'
+    )
+
+
+ESCRITORES = {
+    'csv': escrever_csv,
+    'excel': escrever_xlsx,
+    'pdf': escrever_pdf,
+    'jsonl': escrever_jsonl,
+}
+
+
+def exportar(tipo, formato, setor=None):
+    """
+    Gera a resposta de download de um relatório
+
+    Args:
+        tipo (str): Chave em RELATORIOS
+        formato (str): Chave em ESCRITORES
+        setor (str): Filtro de setor (obrigatório para localização)
+
+    Returns:
+        Response: Download em streaming ou arquivo temporário
+    """
+    relatorio = RELATORIOS[tipo](setor=setor)
+    return ESCRITORES[formato](relatorio)
@@ -7,7 +7,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 class SystemScheduler:
-    """Scheduler para executar tarefas automáticas do sistema (notificações e backups)"""
+    """Scheduler para executar tarefas automáticas do sistema (notificações, backups e retenção da auditoria)"""
 
     def __init__(self, app):
         self.app = app
@@ -47,6 +47,11 @@ class SystemScheduler:
                     # Aguardar alguns segundos para evitar múltiplas execuções no mesmo minuto
                     time.sleep(60)
 
+                # Arquivar meses antigos da auditoria diariamente às 3:00 AM
+                if now.hour == 3 and now.minute == 0:
+                    self._executar_retencao_auditoria()
+                    time.sleep(60)
+
                 # Aguardar 1 minuto antes da próxima verificação
                 time.sleep(60)
 
@@ -75,6 +80,19 @@ class SystemScheduler:
         except Exception as e:
             logger.error(f"Erro ao executar backup automático: {str(e)}", exc_info=True)
 
+    def _executar_retencao_auditoria(self):
+        """Move para arquivos gzip os meses de auditoria além da retenção e exporta os meses fechados para o formato colunar"""
+        try:
+            with self.app.app_context():
+                from .audit_archive import AuditArchive
+                from .audit_colunar import AuditColunar
+                arquivados = AuditArchive.arquivar_antigos()
+                logger.info(f"Retenção de auditoria executada: {arquivados or 'nada a arquivar'}")
+                exportados = AuditColunar.exportar_fechados()
+                logger.info(f"Arquivo colunar de auditoria atualizado: {exportados or 'nada a exportar'}")
+        except Exception as e:
+            logger.error(f"Erro ao executar retenção de auditoria: {str(e)}", exc_info=True)
+
     def executar_backup_agora(self):
         """Executa backup imediatamente (para testes)"""
         try:
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Busca textual de equipamentos
+
+Em SQLite usa um índice FTS5 (``equipamentos_fts``) com conteúdo externo
+apontando para ``equipamentos``, mantido por triggers (cobre também
+inserções/exclusões em massa). Os resultados são ordenados por BM25 e cada
+termo digitado é tratado como prefixo. Em outros bancos, ou se o SQLite não
+tiver FTS5, cai para ``ilike`` nas mesmas colunas.
+
+Uso pela linha de comando:
+    python -m app.search rebuild   # recria e reindexa o índice
+"""
+
+import logging
+import re
+
+from flask import current_app
+from sqlalchemy import column, func, literal_column, or_, table, text
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .models import Equipamento
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'equipamentos_fts'
+
+# Colunas indexadas e peso de cada uma no BM25 (nome pesa mais que observações)
+FTS_COLUMNS = (
+    ('name_response', 10.0),
+    ('marca_category', 4.0),
+    ('equipamento_category', 3.0),
+    ('serial_number', 6.0),
+    ('numero_anydesk', 6.0),
+    ('observacoes', 1.0),
+)
+
+_fts = table(FTS_TABLE, column('rowid'))
+
+
+def _ddl():
+    colunas = ', '.join(nome for nome, _ in FTS_COLUMNS)
+    novos = ', '.join(f'new.{nome}' for nome, _ in FTS_COLUMNS)
+    antigos = ', '.join(f'old.{nome}' for nome, _ in FTS_COLUMNS)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{colunas}, content='equipamentos', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON equipamentos BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {colunas}) VALUES (new.id, {novos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON equipamentos BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {colunas}) VALUES ('delete', old.id, {antigos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON equipamentos BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {colunas}) VALUES ('delete', old.id, {antigos}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {colunas}) VALUES (new.id, {novos}); END",
+    ]
+
+
+class SearchIndex:
+    """Índice de busca textual de equipamentos"""
+
+    @staticmethod
+    def garantir_indice(app):
+        """
+        Cria o índice FTS5 e os triggers se ainda não existirem (idempotente)
+
+        Em bancos existentes o índice é populado na criação. O resultado
+        fica em ``app.extensions['busca_fts']`` para as consultas.
+        """
+        disponivel = False
+        if db.engine.dialect.name == 'sqlite':
+            try:
+                with db.engine.begin() as conn:
+                    existia = conn.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nome"),
+                        {'nome': FTS_TABLE}
+                    ).first() is not None
+                    for comando in _ddl():
+                        conn.execute(text(comando))
+                    if not existia:
+                        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                        logger.info("Índice de busca FTS5 criado")
+                disponivel = True
+            except OperationalError as e:
+                logger.warning(f"FTS5 indisponível, busca usará ilike: {str(e)}")
+        app.extensions['busca_fts'] = disponivel
+        return disponivel
+
+    @staticmethod
+    def reconstruir():
+        """Reindexa todos os equipamentos"""
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        db.session.commit()
+        logger.info("Índice de busca reconstruído")
+
+    @staticmethod
+    def disponivel():
+        return bool(current_app.extensions.get('busca_fts'))
+
+    @staticmethod
+    def montar_consulta(termo):
+        """
+        Converte o texto digitado em uma expressão MATCH de prefixos
+
+        "dell 5" -> '"dell"* "5"*' (todos os termos precisam casar)
+        """
+        tokens = re.findall(r'\w+', termo or '', re.UNICODE)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    @staticmethod
+    def aplicar(query, termo, ranquear=False):
+        """
+        Filtra uma query de Equipamento pelo termo de busca
+
+        Args:
+            query: Query de Equipamento
+            termo (str): Texto digitado pelo usuário
+            ranquear (bool): Ordenar por relevância (BM25)
+
+        Returns:
+            Query filtrada (inalterada se o termo não tiver palavras)
+        """
+        if not termo:
+            return query
+
+        if not SearchIndex.disponivel():
+            like = f'%{termo}%'
+            return query.filter(or_(
+                Equipamento.name_response.ilike(like),
+                Equipamento.marca_category.ilike(like),
+                Equipamento.equipamento_category.ilike(like),
+                Equipamento.serial_number.ilike(like),
+                Equipamento.numero_anydesk.ilike(like),
+                Equipamento.observacoes.ilike(like)
+            ))
+
+        consulta = SearchIndex.montar_consulta(termo)
+        if not consulta:
+            return query
+
+        query = query.join(_fts, _fts.c.rowid == Equipamento.id).filter(
+            text(f"{FTS_TABLE} MATCH :consulta_fts").bindparams(consulta_fts=consulta)
+        )
+        if ranquear:
+            pesos = [peso for _, peso in FTS_COLUMNS]
+            query = query.order_by(func.bm25(literal_column(FTS_TABLE), *pesos), Equipamento.id)
+        return query
+
+
+def main(argv=None):
+    import sys
+    from . import create_app
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ['rebuild']:
+        print("Uso: python -m app.search rebuild")
+        return 2
+
+    app = create_app()
+    with app.app_context():
+        if not SearchIndex.disponivel():
+            print("Índice FTS5 indisponível neste banco.")
+            return 1
+        SearchIndex.reconstruir()
+        print("Índice de busca reconstruído.")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
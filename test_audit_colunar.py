@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do arquivo colunar da auditoria (app.audit_colunar)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from app import db
+from app.audit_archive import AuditArchive
+from app.audit_colunar import AuditAnalytics, AuditColunar
+from app.models import Administrador, AuditLog
+
+AGORA = datetime(2025, 4, 10, 12, 0, 0)
+
+REGISTROS = [
+    # (criado, usuário, ação, tabela)
+    (datetime(2025, 1, 5, 9, 0), 1, 'CREATE', 'equipamentos'),
+    (datetime(2025, 1, 5, 18, 30), 1, 'UPDATE', 'equipamentos'),
+    (datetime(2025, 1, 31, 23, 59), None, 'LOGIN', 'administrador'),
+    (datetime(2025, 2, 1, 0, 0), 2, 'DELETE', 'equipamentos'),
+    (datetime(2025, 2, 14, 10, 0), 1, 'DELETE', 'emprestimos'),
+    (datetime(2025, 3, 3, 8, 0), 3, 'CREATE', 'equipamentos'),
+    (datetime(2025, 4, 9, 8, 0), 1, 'CREATE', 'equipamentos'),  # mês corrente: não exportado
+]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Administrador.__table__.insert(), [
+            dict(id=1, user_name='ana', user_password='x', name_user='Ana'),
+            dict(id=2, user_name='bia', user_password='x', name_user='Bia'),
+        ])
+        db.session.execute(AuditLog.__table__.insert(), [
+            dict(created_at=criado, user_id=usuario, action=acao, table_name=tabela)
+            for criado, usuario, acao, tabela in REGISTROS
+        ])
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def test_exporta_so_meses_fechados(app):
+    assert AuditColunar.exportar_fechados(agora=AGORA) == {'2025-01': 3, '2025-02': 2, '2025-03': 1}
+    assert AuditColunar.exportar_fechados(agora=AGORA) == {}
+    assert AuditColunar.exportar_fechados(agora=AGORA, forcar=True)['2025-02'] == 2
+
+
+def test_contagens_por_dimensao(app):
+    AuditColunar.exportar_fechados(agora=AGORA)
+
+    por_acao = AuditAnalytics.contar('action')
+    assert por_acao['contagens'] == {'CREATE': 2, 'DELETE': 2, 'LOGIN': 1, 'UPDATE': 1}
+    assert por_acao['total'] == 6
+    assert por_acao['meses'] == ['2025-01', '2025-02', '2025-03']
+
+    # Usuário 3 não existe: rótulo de reserva; sem usuário = Sistema
+    assert AuditAnalytics.contar('user')['contagens'] == {'Ana': 3, 'Bia': 1, 'Sistema': 1, 'User_3': 1}
+    assert AuditAnalytics.contar('table')['contagens'] == {
+        'administrador': 1, 'emprestimos': 1, 'equipamentos': 4,
+    }
+    assert AuditAnalytics.contar('day')['contagens'] == {
+        '2025-01-05': 2, '2025-01-31': 1, '2025-02-01': 1, '2025-02-14': 1, '2025-03-03': 1,
+    }
+
+
+def test_filtros(app):
+    AuditColunar.exportar_fechados(agora=AGORA)
+
+    fevereiro = AuditAnalytics.contar('day', inicio=datetime(2025, 1, 31, 23, 59), fim=datetime(2025, 2, 14))
+    assert fevereiro['contagens'] == {'2025-01-31': 1, '2025-02-01': 1}
+    assert fevereiro['meses'] == ['2025-01', '2025-02']
+
+    assert AuditAnalytics.contar('table', acao='DELETE')['contagens'] == {'emprestimos': 1, 'equipamentos': 1}
+    assert AuditAnalytics.contar('action', usuario_id=1)['contagens'] == {'CREATE': 1, 'DELETE': 1, 'UPDATE': 1}
+    assert AuditAnalytics.contar('action', acao='INEXISTENTE')['total'] == 0
+
+
+def test_inclui_meses_ja_arquivados(app):
+    AuditArchive.arquivar_antigos(meses=2, agora=AGORA)
+    assert AuditLog.query.filter(AuditLog.created_at < datetime(2025, 2, 1)).count() == 0
+
+    AuditColunar.exportar_fechados(agora=AGORA)
+    assert AuditAnalytics.contar('action')['total'] == 6
+
+
+def test_dimensao_invalida(app):
+    with pytest.raises(ValueError):
+        AuditAnalytics.contar('ip')
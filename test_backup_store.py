@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do armazenamento comprimido de backups (app.backup_store)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+
+import pytest
+
+from app.backup_store import BackupStore
+from app.constants import BACKUP_CHUNK_SIZE
+
+
+def _bruto(caminho, conteudo):
+    caminho.write_bytes(conteudo)
+    return caminho
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BackupStore(tmp_path)
+
+
+@pytest.fixture
+def conteudo():
+    # Quatro blocos distintos e pouco compressíveis
+    return os.urandom(4 * BACKUP_CHUNK_SIZE)
+
+
+def test_gzip_ida_e_volta(store, tmp_path):
+    conteudo = b'pagina do sqlite ' * 50000
+    bruto = _bruto(tmp_path / 'backup_1.db', conteudo)
+    destino = tmp_path / 'backup_1.db.gz'
+
+    armazenado, original = store.guardar(bruto, destino, 'gzip')
+
+    assert not bruto.exists()
+    assert original == len(conteudo)
+    assert armazenado == destino.stat().st_size < original
+    assert b''.join(store.ler(destino)) == conteudo
+    assert store.tamanho_original(destino) is None
+
+
+def test_chunks_ida_e_volta(store, tmp_path, conteudo):
+    bruto = _bruto(tmp_path / 'backup_1.db', conteudo + b'fim')
+    destino = tmp_path / 'backup_1.db.chunks'
+
+    armazenado, original = store.guardar(bruto, destino, 'chunks')
+
+    assert not bruto.exists()
+    assert original == len(conteudo) + 3
+    assert len(json.loads(destino.read_text())['chunks']) == 5
+    assert armazenado == sum(c.stat().st_size for c in store.diretorio_chunks.glob('*/*'))
+    assert b''.join(store.ler(destino)) == conteudo + b'fim'
+    assert store.tamanho_original(destino) == original
+
+    store.extrair(destino, tmp_path / 'restaurado.db')
+    assert (tmp_path / 'restaurado.db').read_bytes() == conteudo + b'fim'
+
+
+def test_chunks_deduplicados_entre_backups(store, tmp_path, conteudo):
+    alterado = conteudo[:BACKUP_CHUNK_SIZE] + os.urandom(BACKUP_CHUNK_SIZE) + conteudo[2 * BACKUP_CHUNK_SIZE:]
+    store.guardar(_bruto(tmp_path / 'a.db', conteudo), tmp_path / 'a.db.chunks', 'chunks')
+    store.guardar(_bruto(tmp_path / 'b.db', alterado), tmp_path / 'b.db.chunks', 'chunks')
+
+    # Só o bloco alterado ocupa disco novo
+    assert len(list(store.diretorio_chunks.glob('*/*'))) == 5
+    assert b''.join(store.ler(tmp_path / 'b.db.chunks')) == alterado
+
+
+def test_bloco_ausente(store, tmp_path, conteudo):
+    destino = tmp_path / 'a.db.chunks'
+    store.guardar(_bruto(tmp_path / 'a.db', conteudo), destino, 'chunks')
+    next(store.diretorio_chunks.glob('*/*')).unlink()
+    with pytest.raises(FileNotFoundError):
+        b''.join(store.ler(destino))
+
+
+def test_backup_antigo_sem_compressao(store, tmp_path):
+    antigo = _bruto(tmp_path / 'backup_0.dump', b'-- dump')
+    assert b''.join(store.ler(antigo)) == b'-- dump'
+    assert store.tamanho_original(antigo) == 7
+
+
+@pytest.mark.parametrize('arquivo, formato, extensao', [
+    ('backup.db.gz', 'gzip', '.db'),
+    ('backup.dump.chunks', 'chunks', '.dump'),
+    ('backup.db', None, '.db'),
+])
+def test_formato_e_extensao(arquivo, formato, extensao):
+    assert BackupStore.formato_do_arquivo(arquivo) == formato
+    assert BackupStore.extensao_original(arquivo) == extensao
+
+
+def test_formato_invalido(store, tmp_path):
+    bruto = _bruto(tmp_path / 'a.db', b'x')
+    with pytest.raises(ValueError):
+        store.guardar(bruto, tmp_path / 'a.db.zip', 'zip')
+    assert bruto.exists()
+
+
+def test_coleta_remove_so_blocos_orfaos(store, tmp_path, conteudo):
+    alterado = conteudo[:3 * BACKUP_CHUNK_SIZE] + os.urandom(BACKUP_CHUNK_SIZE)
+    store.guardar(_bruto(tmp_path / 'a.db', conteudo), tmp_path / 'a.db.chunks', 'chunks')
+    store.guardar(_bruto(tmp_path / 'b.db', alterado), tmp_path / 'b.db.chunks', 'chunks')
+    store.remover(tmp_path / 'a.db.chunks')
+
+    # Órfão recente (backup possivelmente em gravação) é mantido
+    assert store.coletar_chunks() == (0, 0)
+
+    removidos, liberados = store.coletar_chunks(0)
+    assert removidos == 1 and liberados > 0
+    assert len(list(store.diretorio_chunks.glob('*/*'))) == 4
+    assert b''.join(store.ler(tmp_path / 'b.db.chunks')) == alterado
+
+
+def test_coleta_com_manifesto_invalido_nao_apaga(store, tmp_path, conteudo):
+    store.guardar(_bruto(tmp_path / 'a.db', conteudo), tmp_path / 'a.db.chunks', 'chunks')
+    store.remover(tmp_path / 'a.db.chunks')
+    (tmp_path / 'b.db.chunks').write_text('{')
+
+    assert store.coletar_chunks(0) == (0, 0)
+    assert len(list(store.diretorio_chunks.glob('*/*'))) == 4
+
+
+def test_coleta_sem_diretorio_de_blocos(store):
+    assert store.coletar_chunks(0) == (0, 0)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da paginação offset/keyset (app.pagination)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from app.pagination import decode_cursor, encode_cursor, get_page_size, paginate
+
+Base = declarative_base()
+
+INICIO = datetime(2025, 1, 1, 8, 0, 0)
+
+
+class Item(Base):
+    __tablename__ = 'itens'
+    id = Column(Integer, primary_key=True)
+    nome = Column(String(50))
+    criado = Column(DateTime)
+
+
+@pytest.fixture
+def sessao():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        # Dois itens por instante: a chave (criado, id) desempata
+        session.add_all(
+            Item(id=i, nome=f'Item {i:02d}', criado=INICIO + timedelta(minutes=i // 2))
+            for i in range(1, 26)
+        )
+        session.commit()
+        yield session
+
+
+def _ids(page):
+    return [item.id for item in page.items]
+
+
+def test_cursor_ida_e_volta():
+    colunas = (Item.criado, Item.id)
+    valores = [datetime(2025, 3, 4, 5, 6, 7, 891011), 42]
+    cursor = encode_cursor(valores)
+    assert '=' not in cursor
+    assert decode_cursor(cursor, colunas) == valores
+
+
+@pytest.mark.parametrize('cursor', [
+    'nao-e-base64!!',
+    encode_cursor([1]),                    # quantidade de valores errada
+    encode_cursor(['ontem', 3]),           # data inválida
+    encode_cursor([INICIO, 'x']),          # id não numérico
+    'eyJhIjoxfQ',                          # JSON que não é lista
+])
+def test_cursor_invalido(cursor):
+    assert decode_cursor(cursor, (Item.criado, Item.id)) is None
+
+
+def test_cursor_vazio():
+    assert decode_cursor('', (Item.id,)) is None
+    assert decode_cursor(None, (Item.id,)) is None
+
+
+def test_tamanho_de_pagina():
+    assert get_page_size('abc', default=7) == 7
+    assert get_page_size('0') == 1
+    assert get_page_size(10 ** 6) == get_page_size(10 ** 7)
+
+
+def test_offset(sessao):
+    pagina = paginate(sessao.query(Item), (Item.id,), page=2, per_page=10)
+    assert _ids(pagina) == list(range(11, 21))
+    assert (pagina.total, pagina.pages) == (25, 3)
+    assert pagina.has_prev and pagina.has_next
+    assert not pagina.use_keyset
+
+
+def test_keyset_avanca_e_volta_ate_a_primeira_pagina(sessao):
+    colunas = (Item.criado, Item.id)
+    query = sessao.query(Item)
+
+    primeira = paginate(query, colunas, per_page=10)
+    segunda = paginate(query, colunas, page=2, per_page=10, after=primeira.next_cursor)
+    terceira = paginate(query, colunas, page=3, per_page=10, after=segunda.next_cursor)
+    assert _ids(segunda) == list(range(11, 21))
+    assert _ids(terceira) == list(range(21, 26))
+    assert not terceira.has_next
+
+    volta = paginate(query, colunas, page=2, per_page=10, before=terceira.prev_cursor)
+    assert _ids(volta) == _ids(segunda)
+    assert volta.has_prev and volta.has_next
+
+    inicio = paginate(query, colunas, page=9, per_page=10, before=volta.prev_cursor)
+    assert _ids(inicio) == list(range(1, 11))
+    assert inicio.page == 1
+    assert not inicio.has_prev
+
+
+def test_keyset_decrescente(sessao):
+    colunas = (Item.criado, Item.id)
+    query = sessao.query(Item)
+    primeira = paginate(query, colunas, per_page=10, descending=True)
+    segunda = paginate(query, colunas, per_page=10, descending=True, after=primeira.next_cursor)
+    assert _ids(primeira) == list(range(25, 15, -1))
+    assert _ids(segunda) == list(range(15, 5, -1))
+
+
+def test_cursor_invalido_volta_para_offset(sessao):
+    pagina = paginate(sessao.query(Item), (Item.id,), per_page=10, after='lixo')
+    assert _ids(pagina) == list(range(1, 11))
+
+
+def test_sem_total(sessao):
+    query = sessao.query(Item)
+    primeira = paginate(query, (Item.id,), per_page=10, with_total=False)
+    assert primeira.total is None and primeira.pages is None
+    assert primeira.use_keyset
+    assert primeira.next_args['after'] == primeira.next_cursor
+
+    ultima = paginate(query, (Item.id,), per_page=20, after=primeira.next_cursor, with_total=False)
+    assert _ids(ultima) == list(range(11, 26))
+    assert not ultima.has_next
+    assert ultima.next_cursor is None
+
+
+def test_base_args_preservados(sessao):
+    pagina = paginate(sessao.query(Item), (Item.id,), per_page=5, base_args={'search': 'x'})
+    assert pagina.next_args == {'search': 'x', 'page': 2, 'per_page': 5}
+
+
+def test_offset_forcado_preserva_ordenacao(sessao):
+    query = sessao.query(Item).order_by(Item.nome.desc())
+    pagina = paginate(query, (Item.id,), per_page=5, after=encode_cursor([3]), keyset=False)
+    assert _ids(pagina) == [25, 24, 23, 22, 21]
+    assert not pagina.use_keyset
+    assert 'after' not in pagina.next_args
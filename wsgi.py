@@ -13,15 +13,14 @@ app = create_app()
 
 # Configurar para produção
 if os.environ.get('RENDER'):
-    # Forçar SQLite para evitar problemas com PostgreSQL
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+    # O banco vem de DATABASE_URL (SQLite local quando não definido), ver app/config.py
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'production-secret-key-change-me')
     
     # Criar tabelas se não existirem
     with app.app_context():
         from app import db
         try:
-            print("Configurando banco SQLite...")
+            print(f"Configurando banco de dados ({db.engine.dialect.name})...")
             db.create_all()
             print("Tabelas criadas com sucesso!")
             